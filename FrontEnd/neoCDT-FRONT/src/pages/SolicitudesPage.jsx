@@ -1,6 +1,7 @@
-import React, { useEffect, useState, useCallback } from "react";
+import React, { useEffect, useState, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import solicitudesService from "../services/solicitudesService";
+import eventosService from "../services/eventosService";
 import FilterBar from "../components/FilterBar";
 import SolicitudesTable from "../components/SolicitudesTable";
 import SolicitudForm from "../components/SolicitudForm";
@@ -47,6 +48,21 @@ export default function SolicitudesPage() {
     fetchSolicitudes();
   }, [fetchSolicitudes]);
 
+  // Cambios en tiempo real: el listado es paginado y filtrado en el backend,
+  // así que ante cualquier cambio propio se vuelve a pedir la página actual.
+  // Una sola suscripción; la ref apunta siempre a la página y filtros vigentes.
+  const recargarRef = useRef(fetchSolicitudes);
+  useEffect(() => {
+    recargarRef.current = fetchSolicitudes;
+  }, [fetchSolicitudes]);
+
+  useEffect(() => {
+    return eventosService.suscribirEventos({
+      onCambio: () => recargarRef.current(),
+      onReiniciar: () => recargarRef.current(),
+    });
+  }, []);
+
   // ===============================
   // 🚪 Cerrar sesión
   // ===============================
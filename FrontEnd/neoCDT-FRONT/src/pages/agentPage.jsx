@@ -1,6 +1,7 @@
 import React, { useEffect, useState, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import agenteService from "../services/agenteService";
+import eventosService from "../services/eventosService";
 import "../css/agentePage.css";
 
 /**
@@ -498,6 +499,21 @@ export default function AgenteDashboard() {
     fetchSolicitudes();
   }, [fetchSolicitudes]);
 
+  // Cambios en tiempo real (reemplaza recargar la cola a mano)
+  useEffect(() => {
+    const ESTADOS_COLA = ["en_validacion", "aprobada", "rechazada"];
+    return eventosService.suscribirEventos({
+      onCambio: (solicitud) => {
+        setSolicitudes(prev => {
+          const resto = prev.filter(s => s.id !== solicitud.id);
+          if (!ESTADOS_COLA.includes(solicitud.estado)) return resto;
+          return [...resto, agenteService.transformarSolicitud(solicitud)];
+        });
+      },
+      onReiniciar: fetchSolicitudes,
+    });
+  }, [fetchSolicitudes]);
+
   // Aplicar filtros
   const applyFilters = useCallback(() => {
     let filtered = [...solicitudes];
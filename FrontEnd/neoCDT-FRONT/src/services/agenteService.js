@@ -97,23 +97,7 @@ const getSolicitudesPendientes = async () => {
     // Transformar datos del backend al formato esperado en el frontend
     const transformedData = data.map(solicitud => {
       console.log("🔄 Transforming solicitud:", solicitud);
-      
-      return {
-        id: solicitud.id,
-        cliente_nombre: solicitud.usuario_id, // Temporal, hasta tener nombre real
-        usuario_id: solicitud.usuario_id,
-        monto: solicitud.monto,
-        plazo_dias: solicitud.plazo_meses * 30, // Convertir meses a días
-        plazo_meses: solicitud.plazo_meses,
-        tasa_interes: solicitud.tasa,
-        tasa: solicitud.tasa,
-        estado: mapEstadoBackendToFrontend(solicitud.estado),
-        fecha_creacion: solicitud.fechaCreacion,
-        fecha: solicitud.fechaCreacion,
-        fechaCreacion: solicitud.fechaCreacion,
-        fechaActualizacion: solicitud.fechaActualizacion,
-        historial: solicitud.historial || []
-      };
+      return transformarSolicitud(solicitud);
     });
     
     console.log("✅ Transformed data:", transformedData);
@@ -182,6 +166,29 @@ const rechazarSolicitud = async (solicitudId, motivo) => {
 // 🔄 FUNCIONES AUXILIARES
 // ===============================
 
+/**
+ * Transformar una solicitud del backend (forma de la cola del agente,
+ * también la de los eventos SSE) al formato esperado en el frontend
+ * @param {Object} solicitud - Solicitud tal como la envía el backend
+ * @returns {Object}
+ */
+const transformarSolicitud = (solicitud) => ({
+  id: solicitud.id,
+  cliente_nombre: solicitud.usuario_id, // Temporal, hasta tener nombre real
+  usuario_id: solicitud.usuario_id,
+  monto: solicitud.monto,
+  plazo_dias: solicitud.plazo_meses * 30, // Convertir meses a días
+  plazo_meses: solicitud.plazo_meses,
+  tasa_interes: solicitud.tasa,
+  tasa: solicitud.tasa,
+  estado: mapEstadoBackendToFrontend(solicitud.estado),
+  fecha_creacion: solicitud.fechaCreacion,
+  fecha: solicitud.fechaCreacion,
+  fechaCreacion: solicitud.fechaCreacion,
+  fechaActualizacion: solicitud.fechaActualizacion,
+  historial: solicitud.historial || []
+});
+
 /**
  * Mapear estados del backend (snake_case) al frontend (capitalizado)
  * @param {string} estadoBackend - Estado en formato backend
@@ -226,6 +233,7 @@ const agenteService = {
   rechazarSolicitud,
   
   // Utilidades
+  transformarSolicitud,
   mapEstadoBackendToFrontend,
   mapEstadoFrontendToBackend,
 };
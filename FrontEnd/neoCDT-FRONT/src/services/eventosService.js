@@ -0,0 +1,109 @@
+/**
+ * 📡 SERVICIO DE EVENTOS EN TIEMPO REAL (SSE)
+ *
+ * Se suscribe a /solicitudes/eventos para recibir los cambios de
+ * solicitudes sin hacer polling. Un cliente recibe las suyas; un agente
+ * recibe todas.
+ *
+ * EventSource no puede enviar la cabecera Authorization, así que primero
+ * se pide un token corto a POST /solicitudes/eventos/token y se abre el
+ * stream con ?token=. Ese token solo se valida al conectar: si la conexión
+ * se cae cuando ya venció, se pide uno nuevo y se vuelve a abrir.
+ */
+
+// ===============================
+// 🔧 CONFIGURACIÓN
+// ===============================
+const API_BASE_URL = "http://localhost:8000";
+const REINTENTO_MS = 3000;
+
+/**
+ * Pedir el token de corta duración para el stream
+ * @returns {Promise<string>}
+ */
+const obtenerTokenEventos = async () => {
+  const token = localStorage.getItem("token");
+  if (!token) {
+    throw new Error("No hay sesión activa. Por favor, inicia sesión.");
+  }
+  const response = await fetch(`${API_BASE_URL}/solicitudes/eventos/token`, {
+    method: "POST",
+    headers: { "Authorization": `Bearer ${token}` },
+  });
+  if (!response.ok) {
+    const error = new Error(`Error ${response.status}: ${response.statusText}`);
+    error.status = response.status;
+    throw error;
+  }
+  const data = await response.json();
+  return data.token;
+};
+
+/**
+ * Suscribirse a los cambios de solicitudes
+ * @param {Object} handlers
+ * @param {Function} handlers.onCambio - recibe la solicitud creada o modificada
+ * @param {Function} handlers.onReiniciar - se perdieron eventos: volver a pedir el listado
+ * @returns {Function} cancelar la suscripción
+ */
+const suscribirEventos = ({ onCambio = () => {}, onReiniciar = () => {} } = {}) => {
+  // Entornos sin EventSource (pruebas con jsdom, SSR): no hay tiempo real
+  if (typeof EventSource === "undefined") {
+    return () => {};
+  }
+
+  let fuente = null;
+  let temporizador = null;
+  let cancelado = false;
+
+  const conectar = async (esReconexion) => {
+    try {
+      const token = await obtenerTokenEventos();
+      if (cancelado) return;
+      fuente = new EventSource(
+        `${API_BASE_URL}/solicitudes/eventos?token=${encodeURIComponent(token)}`
+      );
+    } catch (error) {
+      console.error("❌ No se pudo abrir el stream de eventos:", error);
+      // Sin sesión no tiene sentido reintentar
+      if (error.status !== 401 && !cancelado) {
+        temporizador = setTimeout(() => conectar(true), REINTENTO_MS);
+      }
+      return;
+    }
+
+    // Lo ocurrido mientras no había conexión no llegó por el stream
+    if (esReconexion) onReiniciar();
+
+    fuente.addEventListener("solicitud", (evento) => {
+      onCambio(JSON.parse(evento.data));
+    });
+    fuente.addEventListener("reiniciar", () => onReiniciar());
+    fuente.onerror = () => {
+      // CONNECTING: el navegador reintenta solo (con Last-Event-ID).
+      // CLOSED: p. ej. 401 porque el token ya venció; se pide otro.
+      if (fuente.readyState === EventSource.CLOSED && !cancelado) {
+        fuente = null;
+        temporizador = setTimeout(() => conectar(true), REINTENTO_MS);
+      }
+    };
+  };
+
+  conectar(false);
+
+  return () => {
+    cancelado = true;
+    clearTimeout(temporizador);
+    if (fuente) fuente.close();
+  };
+};
+
+// ===============================
+// 📤 EXPORTAR SERVICIO
+// ===============================
+const eventosService = {
+  obtenerTokenEventos,
+  suscribirEventos,
+};
+
+export default eventosService;
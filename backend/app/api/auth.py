@@ -1,35 +1,43 @@
 # api/auth.py
-from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from jose import JWTError, jwt
 from datetime import timedelta
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from app.core.cache import cache_respuestas, etiqueta_usuario
 from app.core.database import get_database
 from app.core.config import settings
-from app.schemas.auth import LoginRequest, RegisterRequest, Token, TokenData, UsuarioPublico
+from app.core.limites import ip_cliente, limitador_login
+from app.core.security import obtener_principal
+from app.schemas.auth import LoginRequest, Principal, RegisterRequest, Token, UsuarioPublico
 from app.services.auth import (
     register_user,
-    verify_password,
+    verify_password_async,
     create_access_token,
     find_user_by_correo,
+    find_user_by_id,
     serialize_user,
 )
+from app.services.serializadores import a_json
 
 router = APIRouter(prefix="/auth", tags=["autenticacion"])
 
 @router.post("/login", response_model=Token)
-async def login(payload: LoginRequest, db: AsyncIOMotorDatabase = Depends(get_database)):
+async def login(payload: LoginRequest, request: Request, db: AsyncIOMotorDatabase = Depends(get_database)):
+    # Antes de tocar la base de datos o bcrypt
+    await limitador_login.verificar(db, ip_cliente(request), payload.correo)
+
     user = await find_user_by_correo(db, payload.correo)
     if not user:
+        await limitador_login.registrar_fallo(db, payload.correo)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
 
     if not user.get("activo", True):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuario inactivo")
 
-    if not verify_password(payload.contraseña, user.get("contraseña", "")):
+    if not await verify_password_async(payload.contraseña, user.get("contraseña", "")):
+        await limitador_login.registrar_fallo(db, payload.correo)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
 
     subject = {"sub": str(user["_id"]), "correo": user["correo"],"rol": user.get("rol", "cliente")}
@@ -38,37 +46,30 @@ async def login(payload: LoginRequest, db: AsyncIOMotorDatabase = Depends(get_da
 
 # (opcional) soporte a OAuth2PasswordRequestForm (por si pruebas con Swagger)
 @router.post("/token", response_model=Token, include_in_schema=False)
-async def token(form: OAuth2PasswordRequestForm = Depends(), db: AsyncIOMotorDatabase = Depends(get_database)):
+async def token(request: Request, form: OAuth2PasswordRequestForm = Depends(),
+                db: AsyncIOMotorDatabase = Depends(get_database)):
+    await limitador_login.verificar(db, ip_cliente(request), form.username)
     user = await find_user_by_correo(db, form.username)
-    if not user or not verify_password(form.password, user.get("contraseña", "")) or not user.get("activo", True):
+    if not user or not await verify_password_async(form.password, user.get("contraseña", "")) or not user.get("activo", True):
+        await limitador_login.registrar_fallo(db, form.username)
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
     subject = {"sub": str(user["_id"]), "correo": user["correo"],"rol": user.get("rol", "cliente")}
     token = create_access_token(subject)
     return Token(access_token=token)
 
-# (opcional) endpoint para validar/leer el token
-from fastapi import Header
-from app.schemas.auth import TokenData
-
+# (opcional) endpoint para leer el usuario del token
 @router.get("/me", response_model=UsuarioPublico)
-async def me(authorization: str = Header(...), db: AsyncIOMotorDatabase = Depends(get_database)):
+async def me(principal: Principal = Depends(obtener_principal), db: AsyncIOMotorDatabase = Depends(get_database)):
     """
     Espera: Authorization: Bearer <token>
     """
-    if not authorization.lower().startswith("bearer "):
-        raise HTTPException(status_code=401, detail="Falta Bearer token")
-    token = authorization.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id = payload.get("sub")
-        correo = payload.get("correo")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Token inválido")
+    async def calcular():
+        user = await find_user_by_id(db, principal.id)
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        return a_json(serialize_user(user)), {}
 
-    user = await db["usuarios"].find_one({"_id": ObjectId(user_id)}) or await db["agentes"].find_one({"_id": ObjectId(user_id)}, {"_id": 1, "nombre": 1, "correo": 1, "activo": 1, "rol": 1})
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    return serialize_user(user)
+    return await cache_respuestas.respuesta(f"me:{principal.id}", [etiqueta_usuario(principal.id)], calcular)
 @router.post("/register", response_model=UsuarioPublico, status_code=201)
 async def register(payload: RegisterRequest, db: AsyncIOMotorDatabase = Depends(get_database)):
     # ¿Correo ya existe?
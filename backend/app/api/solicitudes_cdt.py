@@ -1,51 +1,162 @@
 # app/api/solicitudes_cdt.py
-from fastapi import APIRouter, Depends, HTTPException, status, Security, Query
+import logging
+from datetime import datetime, timezone
+
+from bson import ObjectId, errors as bson_errors
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Security, status, Query
 from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from jose import jwt, JWTError
+from pymongo import ReturnDocument
 from typing import List, Optional
 
+from app.core.cache import cache_respuestas, etiqueta_usuario, invalidar_solicitudes
 from app.core.config import settings
 from app.core.database import get_database
-from app.core.security import bearer_scheme
-from app.schemas.solicitudes_cdt import SolicitudCreate, SolicitudUpdate, SolicitudDB
+from app.core.idempotencia import idempotencia
+from app.core.security import (
+    bearer_scheme,
+    crear_token_eventos,
+    obtener_principal,
+    obtener_usuario_id,
+    verificar_token,
+    verificar_token_eventos,
+)
+from app.schemas.auth import Principal
+from app.schemas.solicitudes_cdt import (
+    CotizacionRequest,
+    SolicitudCreate,
+    SolicitudUpdate,
+    SolicitudDB,
+    SolicitudesLoteRequest,
+)
 from app.services.solicitudes_cdt import (
     crear_solicitud,
+    crear_solicitudes,
     listar_solicitudes,
     actualizar_solicitud,
     cancelar_solicitud,
     enviar_a_validacion,
+    ORDEN_LISTADO,
+    codificar_cursor,
+    filtro_desde_cursor,
+    filtro_listado,
+    cotizar_ndjson,
 )
+from app.services.estadisticas import registrar_eliminacion
+from app.services.eventos import difusor, flujo_sse
+from app.services.tasas import registro_tasas
+from app.services.serializadores import a_json, solicitud_normalizada
+from app.services.transiciones import transicionar_o_error
 
 router = APIRouter(prefix="/solicitudes", tags=["solicitudes CDT"])
+logger = logging.getLogger(__name__)
 
-# --- Decodifica el JWT y obtiene el ID del usuario ---
-def obtener_usuario_id(
-    credentials: HTTPAuthorizationCredentials = Security(bearer_scheme)
-) -> str:
-    if credentials is None:
-        raise HTTPException(status_code=401, detail="Falta Bearer token")
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Token no contiene user_id")
-        return user_id
-    except JWTError as e:
-        raise HTTPException(status_code=401, detail=f"Token inválido: {str(e)}")
+# Tope del conteo "estimado": por encima de este valor solo se reporta que hay más
+TOPE_CONTEO_ESTIMADO = 1000
 
 # --- Crear nueva solicitud ---
 @router.post("/", status_code=201)
 async def crear_nueva_solicitud(
     payload: SolicitudCreate,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    user_id: str = Depends(obtener_usuario_id),
+):
+    logger.debug("POST /solicitudes usuario=%s payload=%s", user_id, payload)
+
+    # Con Idempotency-Key un reintento devuelve la misma solicitud en vez de crear otra
+    async def calcular():
+        solicitud = await crear_solicitud(db, user_id, payload)
+        return a_json(serialize_solicitud_normalizada(solicitud))
+
+    return await idempotencia.respuesta(request, db, user_id, calcular, status_code=201)
+
+# --- Crear varias solicitudes en una sola petición ---
+@router.post("/lote", status_code=207)
+async def crear_solicitudes_lote(
+    payload: SolicitudesLoteRequest,
+    request: Request,
     db: AsyncIOMotorDatabase = Depends(get_database),
     user_id: str = Depends(obtener_usuario_id),
 ):
-    print(f"Creating solicitud for user: {user_id}")
-    print(f"Payload: {payload}")
-    solicitud = await crear_solicitud(db, user_id, payload)
-    return serialize_solicitud_normalizada(solicitud)
+    """
+    Crea hasta MAX_ITEMS_LOTE solicitudes con un único insert_many.
+    Responde un resultado por elemento, en el mismo orden del payload.
+    """
+    async def calcular():
+        resultados = await crear_solicitudes(db, user_id, payload.solicitudes)
+        for r in resultados:
+            if "solicitud" in r:
+                r["solicitud"] = solicitud_normalizada(r["solicitud"])
+        return a_json({
+            "creadas": sum(r["estado"] == 201 for r in resultados),
+            "resultados": resultados,
+        })
+
+    return await idempotencia.respuesta(request, db, user_id, calcular, status_code=207)
+
+# --- Cotizar muchas combinaciones monto × plazo (simulador / canales aliados) ---
+@router.post("/cotizar")
+async def cotizar_solicitudes(
+    payload: CotizacionRequest,
+    user_id: str = Depends(obtener_usuario_id),
+):
+    """
+    Devuelve una línea JSON por fila: {"monto", "plazo_meses", "tasa"}.
+    Acepta hasta 100000 filas; la tasa es la misma que asignaría crear_solicitud.
+    La cabecera X-Tasa-Version indica la versión de la tabla de tasas usada.
+    """
+    montos, plazos = payload.filas()
+    tabla = registro_tasas.tabla
+    # Generador síncrono: Starlette lo itera en el threadpool, fuera del event loop
+    return StreamingResponse(
+        cotizar_ndjson(montos, plazos, tabla=tabla),
+        media_type="application/x-ndjson",
+        headers={"X-Tasa-Version": str(tabla.version)},
+    )
+
+# --- Cambios en tiempo real (reemplaza el polling del listado y de la cola) ---
+@router.post("/eventos/token")
+async def token_eventos(principal: Principal = Depends(obtener_principal)):
+    """
+    Token de corta duración para abrir /solicitudes/eventos?token=... desde
+    un EventSource del navegador, que no puede enviar Authorization. Solo
+    sirve para ese endpoint y se valida al conectar.
+    """
+    return {"token": crear_token_eventos(principal), "expira_en": settings.EVENTOS_TOKEN_SEGUNDOS}
+
+async def _principal_eventos(
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(bearer_scheme),
+    token: Optional[str] = Query(None, description="Token de POST /solicitudes/eventos/token"),
+) -> Principal:
+    if token:
+        return verificar_token_eventos(token)
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Falta Bearer token")
+    return verificar_token(credentials.credentials)
+
+@router.get("/eventos")
+async def eventos_solicitudes(
+    principal: Principal = Depends(_principal_eventos),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events con cada solicitud creada o modificada. Un cliente
+    recibe las suyas; agentes y administradores reciben todas. Al reconectar
+    se envía Last-Event-ID para recuperar lo perdido; el evento `reiniciar`
+    indica que hay que volver a pedir el listado.
+
+    Autenticación: cabecera Authorization (clientes con fetch) o ?token= con
+    el token de POST /solicitudes/eventos/token (EventSource del navegador).
+    """
+    es_agente = principal.rol in ["agente", "administrador"]
+    suscriptor = difusor.suscribir(None if es_agente else principal.id, last_event_id)
+    return StreamingResponse(
+        flujo_sse(suscriptor, difusor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # --- Listar solicitudes con paginación y filtros ---
 @router.get("/")
@@ -59,59 +170,65 @@ async def listar_mis_solicitudes(
     hasta: Optional[str] = None,
     montoMin: Optional[int] = None,
     q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    conteo: str = Query("exacto", pattern="^(exacto|estimado|ninguno)$"),
 ):
     """
     Lista las solicitudes del usuario con paginación y filtros.
-    Devuelve formato: {items: [...], total: X}
+    Devuelve formato: {items: [...], total: X, next_cursor: "..."}
+
+    - Sin `cursor` se pagina por `page`/`limit` (contrato original del frontend).
+    - Con `cursor` (el `next_cursor` de la respuesta anterior) se pagina por
+      keyset sobre (fechaCreacion, _id) y `page` se ignora.
+    - `conteo`: "exacto" cuenta todo, "estimado" cuenta hasta TOPE_CONTEO_ESTIMADO
+      y "ninguno" omite el conteo (total = null).
     """
-    from bson import ObjectId
-    from datetime import datetime
-
-    filtro = {"usuario_id": ObjectId(user_id)}
-
-    if estado:
-        filtro["estado"] = estado.lower()
-
-    if desde:
-        try:
-            fecha_desde = datetime.fromisoformat(desde.replace("Z", "+00:00"))
-            filtro["fechaCreacion"] = {"$gte": fecha_desde}
-        except ValueError:
-            pass
-
-    if hasta:
-        try:
-            fecha_hasta = datetime.fromisoformat(hasta.replace("Z", "+00:00"))
-            if "fechaCreacion" in filtro:
-                filtro["fechaCreacion"]["$lte"] = fecha_hasta
-            else:
-                filtro["fechaCreacion"] = {"$lte": fecha_hasta}
-        except ValueError:
-            pass
-
-    if montoMin:
-        filtro["monto"] = {"$gte": montoMin}
-
-    if q:
-        filtro["$or"] = [
-            {"estado": {"$regex": q, "$options": "i"}},
-        ]
-
-    total = await db["solicitudes_cdt"].count_documents(filtro)
-    skip = (page - 1) * limit
-
-    cursor = (
-        db["solicitudes_cdt"]
-        .find(filtro)
-        .sort("fechaCreacion", -1)
-        .skip(skip)
-        .limit(limit)
+    async def calcular():
+        filtro = filtro_listado(ObjectId(user_id), estado, desde, hasta, montoMin, q)
+
+        total = None
+        total_estimado = False
+        if conteo == "exacto":
+            total = await db["solicitudes_cdt"].count_documents(filtro)
+        elif conteo == "estimado":
+            total = await db["solicitudes_cdt"].count_documents(filtro, limit=TOPE_CONTEO_ESTIMADO)
+            total_estimado = total >= TOPE_CONTEO_ESTIMADO
+
+        if cursor:
+            filtro = {"$and": [filtro, filtro_desde_cursor(cursor)]}
+            skip = 0
+        else:
+            skip = (page - 1) * limit
+
+        # Se pide un documento extra para saber si existe una página siguiente
+        resultados = (
+            db["solicitudes_cdt"]
+            .find(filtro)
+            .sort(ORDEN_LISTADO)
+            .skip(skip)
+            .limit(limit + 1)
+        )
+        docs = [doc async for doc in resultados]
+        hay_mas = len(docs) > limit
+        docs = docs[:limit]
+
+        items = [solicitud_normalizada(doc) for doc in docs]
+        next_cursor = codificar_cursor(docs[-1]) if hay_mas else None
+
+        return a_json({
+            "items": items,
+            "total": total,
+            "total_estimado": total_estimado,
+            "page": page,
+            "limit": limit,
+            "next_cursor": next_cursor,
+        }), {}
+
+    # Peticiones repetidas (refrescos, pestañas) se sirven desde la caché hasta que el usuario escribe
+    parametros = a_json([page, limit, estado, desde, hasta, montoMin, q, cursor, conteo]).decode()
+    return await cache_respuestas.respuesta(
+        f"listado:{user_id}:{parametros}", [etiqueta_usuario(user_id)], calcular
     )
-    items = []
-    async for doc in cursor:
-        items.append(serialize_solicitud_normalizada(doc))
-
-    return {"items": items, "total": total, "page": page, "limit": limit}
 
 # --- Actualizar solicitud en borrador ---
 @router.put("/{solicitud_id}")
@@ -121,10 +238,7 @@ async def actualizar_solicitud_existente(
     db: AsyncIOMotorDatabase = Depends(get_database),
     user_id: str = Depends(obtener_usuario_id),
 ):
-    from bson import ObjectId, errors as bson_errors
-
-    print(f"Updating solicitud {solicitud_id} for user: {user_id}")
-    print(f"Payload: {payload}")
+    logger.debug("PUT /solicitudes/%s usuario=%s payload=%s", solicitud_id, user_id, payload)
 
     # Validar ID
     try:
@@ -149,17 +263,20 @@ async def actualizar_solicitud_existente(
     return serialize_solicitud_normalizada(updated)
 
 # --- Cambiar estado de solicitud (cancelar, enviar a validación, etc.) ---
+MENSAJES_TRANSICION_CLIENTE = {
+    "en_validacion": "Solo se pueden enviar solicitudes en borrador",
+    "cancelada": "No se puede cancelar esta solicitud",
+}
+
 @router.patch("/{solicitud_id}/estado")
 async def cambiar_estado_solicitud(
     solicitud_id: str,
     estado: str,
+    request: Request,
     razon: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_database),
     user_id: str = Depends(obtener_usuario_id),
 ):
-    from bson import ObjectId, errors as bson_errors
-    from datetime import datetime, timezone
-
     # Validar ID
     try:
         obj_id = ObjectId(solicitud_id)
@@ -167,49 +284,24 @@ async def cambiar_estado_solicitud(
     except bson_errors.InvalidId:
         raise HTTPException(status_code=400, detail="ID de solicitud inválido")
 
-    # Verificar pertenencia
-    solicitud = await db["solicitudes_cdt"].find_one(
-        {"_id": obj_id, "usuario_id": user_obj}
-    )
-    if not solicitud:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-
     estado_normalizado = estado.lower()
-    estado_actual = solicitud["estado"]
-
-    if estado_normalizado == "en_validacion":
-        if estado_actual != "borrador":
-            raise HTTPException(
-                status_code=400, detail="Solo se pueden enviar solicitudes en borrador"
-            )
-        await db["solicitudes_cdt"].update_one(
-            {"_id": obj_id},
-            {
-                "$set": {
-                    "estado": "en_validacion",
-                    "fechaActualizacion": datetime.now(timezone.utc),
-                }
-            },
-        )
-
-    elif estado_normalizado == "cancelada":
-        if estado_actual not in ["borrador", "en_validacion"]:
-            raise HTTPException(status_code=400, detail="No se puede cancelar esta solicitud")
-
-        update_data = {
-            "estado": "cancelada",
-            "fechaActualizacion": datetime.now(timezone.utc),
-        }
-        if razon:
-            update_data["razon_cancelacion"] = razon
+    if estado_normalizado not in MENSAJES_TRANSICION_CLIENTE:
+        raise HTTPException(status_code=400, detail=f"Estado '{estado}' no válido")
 
-        await db["solicitudes_cdt"].update_one({"_id": obj_id}, {"$set": update_data})
+    campos = {"razon_cancelacion": razon} if estado_normalizado == "cancelada" and razon else None
 
-    else:
-        raise HTTPException(status_code=400, detail=f"Estado '{estado}' no válido")
+    async def calcular():
+        # Pertenencia y estado de origen se verifican en la misma operación
+        resultado = await transicionar_o_error(
+            db,
+            {"_id": obj_id, "usuario_id": user_obj},
+            estado_normalizado,
+            detalle=MENSAJES_TRANSICION_CLIENTE[estado_normalizado],
+            campos=campos,
+        )
+        return a_json(serialize_solicitud_normalizada(resultado.solicitud))
 
-    solicitud_actualizada = await db["solicitudes_cdt"].find_one({"_id": obj_id})
-    return serialize_solicitud_normalizada(solicitud_actualizada)
+    return await idempotencia.respuesta(request, db, user_id, calcular)
 
 # --- Eliminar solicitud (lógico) - ya maneja InvalidId ---
 @router.delete("/{solicitud_id}")
@@ -222,10 +314,7 @@ async def eliminar_solicitud(
     Elimina lógicamente una solicitud (marca como eliminada).
     Retorna la solicitud actualizada.
     """
-    from bson import ObjectId
-    from datetime import datetime, timezone
-
-    print(f"🗑️ DELETE endpoint called for solicitud_id: {solicitud_id}, user_id: {user_id}")
+    logger.debug("DELETE /solicitudes/%s usuario=%s", solicitud_id, user_id)
 
     try:
         solicitud_obj_id = ObjectId(solicitud_id)
@@ -233,19 +322,21 @@ async def eliminar_solicitud(
     except Exception:
         raise HTTPException(status_code=400, detail="ID de solicitud inválido")
 
-    solicitud = await db["solicitudes_cdt"].find_one(
-        {"_id": solicitud_obj_id, "usuario_id": user_obj}
-    )
-    if not solicitud:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-
     update_data = {"eliminada": True, "fechaEliminacion": datetime.now(timezone.utc)}
-    result = await db["solicitudes_cdt"].update_one(
-        {"_id": solicitud_obj_id}, {"$set": update_data}
+    # El documento previo dice si ya estaba eliminada (para no contarla dos veces)
+    anterior = await db["solicitudes_cdt"].find_one_and_update(
+        {"_id": solicitud_obj_id, "usuario_id": user_obj},
+        {"$set": update_data},
+        return_document=ReturnDocument.BEFORE,
     )
-    print(f"✅ Deletion modified: {result.modified_count}")
+    if not anterior:
+        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+    if not anterior.get("eliminada"):
+        await registrar_eliminacion(db)
+        await invalidar_solicitudes([user_id])
+    solicitud_actualizada = {**anterior, **update_data}
+    logger.info("Solicitud %s eliminada lógicamente", solicitud_id)
 
-    solicitud_actualizada = await db["solicitudes_cdt"].find_one({"_id": solicitud_obj_id})
     return {
         "success": True,
         "message": "Solicitud eliminada correctamente",
@@ -254,36 +345,5 @@ async def eliminar_solicitud(
     }
 
 # --- Serializador normalizado para el frontend ---
-def serialize_solicitud_normalizada(doc: dict) -> dict:
-    """
-    Serializa una solicitud con estados en formato capitalizado
-    para coincidir con el frontend
-    """
-    from datetime import datetime
-
-    estado_map = {
-        "borrador": "Borrador",
-        "en_validacion": "En validación",
-        "aprobada": "Aprobada",
-        "rechazada": "Rechazada",
-        "cancelada": "Cancelada",
-    }
-
-    def format_fecha(fecha):
-        if fecha is None:
-            return None
-        if isinstance(fecha, datetime):
-            return fecha.isoformat()
-        return str(fecha)
-
-    return {
-        "id": str(doc["_id"]),
-        "usuario_id": str(doc["usuario_id"]),
-        "monto": int(doc.get("monto", 0)),
-        "plazo_meses": int(doc.get("plazo_meses", 0)),
-        "tasa": float(doc.get("tasa", 0.0)),
-        "estado": estado_map.get(doc.get("estado", "").lower(), doc.get("estado", "Desconocido")),
-        "fechaCreacion": format_fecha(doc.get("fechaCreacion")),
-        "fechaActualizacion": format_fecha(doc.get("fechaActualizacion")),
-        "razon_cancelacion": doc.get("razon_cancelacion"),
-    }
+# Se conserva el nombre: la implementación vive en services/serializadores.py
+serialize_solicitud_normalizada = solicitud_normalizada
@@ -1,71 +1,167 @@
 # api/solicitudes_cdt_agente.py
-from fastapi import APIRouter, Depends, HTTPException, status, Security
-from fastapi.security import HTTPAuthorizationCredentials
+from datetime import datetime
+from bson import ObjectId, errors as bson_errors
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from jose import jwt, JWTError
-from typing import List
+from typing import List, Optional
 
-from app.core.config import settings
+from app.core.cache import ETIQUETA_COLA, cache_respuestas
 from app.core.database import get_database
-from app.core.security import bearer_scheme
+from app.core.idempotencia import idempotencia
+from app.core.security import obtener_principal
+from app.schemas.auth import Principal
 from app.schemas.solicitudes_cdt_agente import (
     SolicitudAgenteDB,
     RechazoRequest,
     SolicitudCambioEstado,
+    DecisionesLoteRequest,
+    ResultadoDecision,
 )
+from app.services.estadisticas import obtener_resumen
+from app.services.exportacion import FORMATOS, exportar_solicitudes
+from app.services.serializadores import a_json
+from app.services.solicitudes_cdt import filtro_listado
 from app.services.solicitudes_cdt_agente import (
     listar_pendientes,
     aprobar_solicitud,
     rechazar_solicitud,
+    decidir_lote,
 )
 
 router = APIRouter(prefix="/solicitudes/agente", tags=["solicitudes CDT - Agente"])
 
-# --- Extraer datos del token ---
-def obtener_datos_token(
-    credentials: HTTPAuthorizationCredentials = Security(bearer_scheme)
-) -> dict:
-    if credentials is None:
-        raise HTTPException(status_code=401, detail="Falta Bearer token")
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return {
-            "user_id": payload.get("sub"),
-            "rol": payload.get("rol", "cliente"),
-        }
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Token inválido")
-
 # --- Listar solicitudes en validación ---
 @router.get("/pendientes", response_model=List[SolicitudAgenteDB])
 async def obtener_solicitudes_pendientes(
     db: AsyncIOMotorDatabase = Depends(get_database),
-    datos_token: dict = Depends(obtener_datos_token),
+    principal: Principal = Depends(obtener_principal),
+    page: Optional[int] = Query(None, ge=1),
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    estado: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+):
+    """
+    Cola del agente, más antiguas primero.
+    Sin page ni limit devuelve la cola completa (contrato del panel actual);
+    con cualquiera de los dos pagina (limit por defecto 50) y la cabecera
+    X-Has-More indica si existe una página siguiente.
+    Los documentos ya vienen con la forma de SolicitudAgenteDB (ver
+    services/serializadores.py), por eso se responde sin revalidarlos.
+    """
+    if principal.rol not in ["agente", "administrador"]:
+        raise HTTPException(status_code=403, detail="Acceso restringido a agentes o administradores")
+    async def calcular():
+        if page is None and limit is None:
+            solicitudes, hay_mas = await listar_pendientes(db, 1, None, estado, desde, hasta)
+        else:
+            solicitudes, hay_mas = await listar_pendientes(db, page or 1, limit or 50, estado, desde, hasta)
+        return a_json(solicitudes), {"X-Has-More": "true" if hay_mas else "false"}
+
+    # La cola es la misma para todos los agentes: comparten la entrada de caché
+    parametros = a_json([page, limit, estado, desde, hasta]).decode()
+    return await cache_respuestas.respuesta(f"pendientes:{parametros}", [ETIQUETA_COLA], calcular)
+
+# --- Exportar solicitudes (reportes) ---
+@router.get("/exportar")
+async def exportar_solicitudes_cdt(
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    principal: Principal = Depends(obtener_principal),
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    usuario_id: Optional[str] = None,
+    estado: Optional[str] = None,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    montoMin: Optional[int] = None,
+    q: Optional[str] = None,
+):
+    """
+    Exporta toda la colección (o lo que coincida con los filtros de
+    listar_mis_solicitudes) sin cargarla en memoria.
+    """
+    if principal.rol not in ["agente", "administrador"]:
+        raise HTTPException(status_code=403, detail="Acceso restringido a agentes o administradores")
+    try:
+        usuario = ObjectId(usuario_id) if usuario_id else None
+    except bson_errors.InvalidId:
+        raise HTTPException(status_code=400, detail="usuario_id inválido")
+
+    filtro = filtro_listado(usuario, estado, desde, hasta, montoMin, q)
+    nombre = f"solicitudes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return StreamingResponse(
+        exportar_solicitudes(db, filtro, formato),
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'},
+    )
+
+# --- Estadísticas (tablero) ---
+@router.get("/estadisticas")
+async def obtener_estadisticas(
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    principal: Principal = Depends(obtener_principal),
+    meses: int = Query(12, ge=1, le=120),
 ):
-    if datos_token["rol"] not in ["agente", "administrador"]:
+    """
+    Conteo por estado, monto total y tasa promedio (global y por mes de
+    creación). Lee los contadores pre-agregados: no recorre solicitudes_cdt.
+    """
+    if principal.rol not in ["agente", "administrador"]:
         raise HTTPException(status_code=403, detail="Acceso restringido a agentes o administradores")
-    return await listar_pendientes(db)
+    return await obtener_resumen(db, meses)
 
 # --- Aprobar solicitud ---
 @router.put("/{solicitud_id}/aprobar", response_model=SolicitudCambioEstado)
 async def aprobar_solicitud_cdt(
     solicitud_id: str,
+    request: Request,
     db: AsyncIOMotorDatabase = Depends(get_database),
-    datos_token: dict = Depends(obtener_datos_token),
+    principal: Principal = Depends(obtener_principal),
 ):
-    if datos_token["rol"] not in ["agente", "administrador"]:
+    if principal.rol not in ["agente", "administrador"]:
         raise HTTPException(status_code=403, detail="Solo agentes o administradores pueden aprobar solicitudes")
-    return await aprobar_solicitud(db, solicitud_id, datos_token["user_id"])
+
+    async def calcular():
+        cambio = await aprobar_solicitud(db, solicitud_id, principal.id)
+        return a_json(SolicitudCambioEstado(**cambio).model_dump())
+
+    return await idempotencia.respuesta(request, db, principal.id, calcular)
 
 # --- Rechazar solicitud ---
 @router.put("/{solicitud_id}/rechazar", response_model=SolicitudCambioEstado)
 async def rechazar_solicitud_cdt(
     solicitud_id: str,
     payload: RechazoRequest,
+    request: Request,
     db: AsyncIOMotorDatabase = Depends(get_database),
-    datos_token: dict = Depends(obtener_datos_token),
+    principal: Principal = Depends(obtener_principal),
 ):
-    if datos_token["rol"] not in ["agente", "administrador"]:
+    if principal.rol not in ["agente", "administrador"]:
         raise HTTPException(status_code=403, detail="Solo agentes o administradores pueden rechazar solicitudes")
-    return await rechazar_solicitud(db, solicitud_id, datos_token["user_id"], payload)
+
+    async def calcular():
+        cambio = await rechazar_solicitud(db, solicitud_id, principal.id, payload)
+        return a_json(SolicitudCambioEstado(**cambio).model_dump())
+
+    return await idempotencia.respuesta(request, db, principal.id, calcular)
+
+# --- Aprobar / rechazar por lote ---
+@router.post("/decisiones", status_code=207, response_model=List[ResultadoDecision])
+async def decidir_solicitudes_lote(
+    payload: DecisionesLoteRequest,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    principal: Principal = Depends(obtener_principal),
+):
+    """
+    Aplica hasta MAX_ITEMS_LOTE decisiones con un único bulk_write.
+    Cada elemento trae el código que habría devuelto el endpoint individual.
+    """
+    if principal.rol not in ["agente", "administrador"]:
+        raise HTTPException(status_code=403, detail="Solo agentes o administradores pueden decidir solicitudes")
+
+    async def calcular():
+        resultados = await decidir_lote(db, payload.decisiones, principal.id)
+        return a_json([ResultadoDecision(**r).model_dump() for r in resultados])
+
+    return await idempotencia.respuesta(request, db, principal.id, calcular, status_code=207)
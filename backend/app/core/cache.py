@@ -0,0 +1,218 @@
+# core/cache.py
+"""
+Caché de respuestas con TTL corto y coalescencia de peticiones (single-flight)
+para los endpoints de lectura más consultados.
+
+- La clave la arma el endpoint (principal + parámetros); el valor es el
+  cuerpo ya serializado y sus cabeceras, así que un acierto no toca la
+  base de datos ni vuelve a serializar.
+- Peticiones idénticas concurrentes comparten un único cálculo.
+- Invalidación por etiquetas ("usuario:<id>", "cola"): cada etiqueta tiene
+  una versión que forma parte de la clave. Invalidar sube la versión, así
+  que lo guardado antes (o calculado mientras tanto) deja de encontrarse y
+  expira solo por TTL.
+
+Backends: "memoria" (LRU por proceso; la invalidación es local y el TTL
+acota lo que otra réplica puede servir desactualizado) o "redis" (cualquier
+servidor compatible; versiones y entradas compartidas entre réplicas).
+Si el backend falla la caché se salta y se consulta la base de datos.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi.responses import Response
+
+from app.core.config import settings
+from app.core.metrics import registro
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - redis es opcional
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+# (cuerpo, cabeceras)
+Entrada = Tuple[bytes, Dict[str, str]]
+
+ETIQUETA_COLA = "cola"
+
+def etiqueta_usuario(usuario_id) -> str:
+    return f"usuario:{usuario_id}"
+
+cache_consultas = registro.contador(
+    "response_cache_requests_total", "Lecturas de la caché de respuestas", ("resultado",))
+
+# --- Backends ---
+class BackendMemoria:
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._datos: "OrderedDict[str, Tuple[Entrada, float]]" = OrderedDict()
+        # etiqueta -> (versión, momento de la invalidación)
+        self._versiones: Dict[str, Tuple[int, float]] = {}
+        self._contador = 0
+
+    async def versiones(self, etiquetas: Sequence[str]) -> List[int]:
+        return [self._versiones.get(e, (0, 0.0))[0] for e in etiquetas]
+
+    async def obtener(self, clave: str) -> Optional[Entrada]:
+        registro_ = self._datos.get(clave)
+        if registro_ is None:
+            return None
+        entrada, expira = registro_
+        if expira <= time.monotonic():
+            del self._datos[clave]
+            return None
+        self._datos.move_to_end(clave)
+        return entrada
+
+    async def guardar(self, clave: str, entrada: Entrada, ttl: float) -> None:
+        self._datos[clave] = (entrada, time.monotonic() + ttl)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+
+    async def invalidar(self, etiquetas: Iterable[str], ttl: float) -> None:
+        ahora = time.monotonic()
+        for etiqueta in etiquetas:
+            self._contador += 1   # contador global: una versión nunca se repite
+            self._versiones[etiqueta] = (self._contador, ahora)
+        if len(self._versiones) > self.max_entradas:
+            # Tras 2 TTL ya expiró todo lo guardado con versiones anteriores
+            limite = ahora - 2 * ttl
+            self._versiones = {e: v for e, v in self._versiones.items() if v[1] > limite}
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def limpiar(self) -> None:
+        self._datos.clear()
+        self._versiones.clear()
+
+class BackendRedis:
+    """Redis (o compatible: Valkey, KeyDB, Dragonfly) vía redis.asyncio."""
+
+    def __init__(self, url: str, prefijo: str = "neocdt:cache:"):
+        if redis_asyncio is None:
+            raise RuntimeError("CACHE_BACKEND=redis requiere el paquete 'redis'")
+        self.cliente = redis_asyncio.from_url(url)
+        self.prefijo = prefijo
+
+    async def versiones(self, etiquetas: Sequence[str]) -> List[int]:
+        if not etiquetas:
+            return []
+        valores = await self.cliente.mget([f"{self.prefijo}v:{e}" for e in etiquetas])
+        return [int(v) if v is not None else 0 for v in valores]
+
+    async def obtener(self, clave: str) -> Optional[Entrada]:
+        crudo = await self.cliente.get(self.prefijo + clave)
+        if crudo is None:
+            return None
+        cabeceras, _, cuerpo = crudo.partition(b"\n")
+        return cuerpo, json.loads(cabeceras)
+
+    async def guardar(self, clave: str, entrada: Entrada, ttl: float) -> None:
+        cuerpo, cabeceras = entrada
+        crudo = json.dumps(cabeceras, separators=(",", ":")).encode() + b"\n" + cuerpo
+        await self.cliente.set(self.prefijo + clave, crudo, px=max(1, int(ttl * 1000)))
+
+    async def invalidar(self, etiquetas: Iterable[str], ttl: float) -> None:
+        async with self.cliente.pipeline(transaction=False) as pipe:
+            for etiqueta in etiquetas:
+                pipe.incr(f"{self.prefijo}v:{etiqueta}")
+            await pipe.execute()
+
+    def __len__(self) -> int:
+        return 0   # las entradas viven en el servidor
+
+    def limpiar(self) -> None:
+        pass
+
+# --- Caché ---
+class CacheRespuestas:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._en_vuelo: Dict[str, asyncio.Task] = {}
+
+    async def obtener_o_calcular(
+        self,
+        clave: str,
+        etiquetas: Sequence[str],
+        calcular: Callable[[], Awaitable[Entrada]],
+    ) -> Tuple[Entrada, str]:
+        """Devuelve la entrada y de dónde salió: "hit", "coalesced", "miss" o "bypass"."""
+        if self.ttl <= 0:
+            return await calcular(), "bypass"
+        try:
+            versiones = await self.backend.versiones(etiquetas)
+            clave = f"{clave}|{','.join(map(str, versiones))}"
+            entrada = await self.backend.obtener(clave)
+        except Exception as exc:
+            logger.warning("Caché de respuestas no disponible: %s", exc)
+            cache_consultas.inc(resultado="error")
+            return await calcular(), "bypass"
+        if entrada is not None:
+            cache_consultas.inc(resultado="hit")
+            return entrada, "hit"
+
+        tarea = self._en_vuelo.get(clave)
+        if tarea is not None:
+            cache_consultas.inc(resultado="coalesced")
+            # shield: si una petición se cancela, las demás siguen esperando el mismo cálculo
+            return await asyncio.shield(tarea), "coalesced"
+
+        cache_consultas.inc(resultado="miss")
+        tarea = asyncio.ensure_future(self._calcular_y_guardar(clave, calcular))
+        self._en_vuelo[clave] = tarea
+        tarea.add_done_callback(lambda _: self._en_vuelo.pop(clave, None))
+        return await asyncio.shield(tarea), "miss"
+
+    async def _calcular_y_guardar(self, clave: str, calcular: Callable[[], Awaitable[Entrada]]) -> Entrada:
+        entrada = await calcular()
+        try:
+            await self.backend.guardar(clave, entrada, self.ttl)
+        except Exception as exc:
+            logger.warning("No se pudo guardar en la caché de respuestas: %s", exc)
+        return entrada
+
+    async def invalidar(self, *etiquetas: str) -> None:
+        if self.ttl <= 0 or not etiquetas:
+            return
+        try:
+            await self.backend.invalidar(etiquetas, self.ttl)
+        except Exception as exc:
+            # Sin invalidación lo guardado vence igual por TTL
+            logger.warning("No se pudo invalidar la caché de respuestas: %s", exc)
+
+    def limpiar(self) -> None:
+        self.backend.limpiar()
+        self._en_vuelo.clear()
+
+    async def respuesta(
+        self,
+        clave: str,
+        etiquetas: Sequence[str],
+        calcular: Callable[[], Awaitable[Entrada]],
+    ) -> Response:
+        (cuerpo, cabeceras), origen = await self.obtener_o_calcular(clave, etiquetas, calcular)
+        return Response(cuerpo, media_type="application/json", headers={**cabeceras, "X-Cache": origen.upper()})
+
+def crear_cache() -> CacheRespuestas:
+    backend = BackendMemoria(settings.CACHE_MAX_ENTRADAS)
+    if settings.CACHE_BACKEND == "redis":
+        try:
+            backend = BackendRedis(settings.CACHE_REDIS_URL)
+        except RuntimeError as exc:
+            logger.warning("%s; se usa la caché en memoria", exc)
+    return CacheRespuestas(backend, settings.CACHE_TTL_SEGUNDOS)
+
+cache_respuestas = crear_cache()
+
+async def invalidar_solicitudes(usuario_ids: Iterable) -> None:
+    """Lo que cambia una solicitud: el listado de su dueño y la cola de los agentes."""
+    await cache_respuestas.invalidar(ETIQUETA_COLA, *sorted({etiqueta_usuario(u) for u in usuario_ids}))
@@ -0,0 +1,124 @@
+# core/calentamiento.py
+"""
+Calentamiento al arrancar. Sin él, la primera petición real después de un
+despliegue o de escalar paga varios costos a la vez:
+- la resolución DNS (SRV de Atlas) y el handshake TLS;
+- el crecimiento del pool de Motor;
+- la carga del backend de bcrypt en passlib y los hilos/procesos del pool;
+- la preparación del algoritmo de JWT en jose.
+
+Pasos (cada uno medido en `preparacion.pasos`):
+    ping         primer comando: DNS, TLS, selección de servidor
+    conexiones   CALENTAMIENTO_CONEXIONES pings concurrentes; el pool abre
+                 hasta esa cantidad (MONGODB_MIN_POOL_SIZE las mantiene luego)
+    bcrypt       una verificación por worker del pool de hash
+    jwt          firmar y verificar un token
+
+La instancia queda lista (`/ready` responde 200) si el ping a MongoDB
+funcionó. Los demás pasos solo se registran si fallan. Mientras no esté
+lista, cada consulta a `/ready` vuelve a intentar el ping.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+from jose import jwt
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.core.metrics import pool_abiertas
+from app.core.workers import PoolAcotado
+
+logger = logging.getLogger(__name__)
+
+# bcrypt de "calentamiento" con el mismo costo que los hashes reales (12)
+HASH_CALENTAMIENTO = "$2b$12$T8qKAxQLaTvmAtZtEKystOqPQML/7vhW6dCuBgNNzq/upb1hIBvmG"
+
+@dataclass
+class Preparacion:
+    listo: bool = False
+    terminado: bool = False
+    cerrando: bool = False
+    duracion_ms: Optional[float] = None
+    pasos: Dict[str, dict] = field(default_factory=dict)   # paso -> {"ms": ..., "error": ...}
+
+    def resumen(self) -> dict:
+        return {"listo": self.listo, "duracion_ms": self.duracion_ms, "pasos": self.pasos}
+
+    def reiniciar(self) -> None:
+        self.listo = self.terminado = self.cerrando = False
+        self.duracion_ms = None
+        self.pasos = {}
+
+    async def verificar(self, db: AsyncIOMotorDatabase) -> bool:
+        """Reintenta el ping si el calentamiento no dejó la instancia lista."""
+        if self.cerrando:
+            return False
+        if not self.listo and self.terminado:
+            try:
+                await asyncio.wait_for(db.command("ping"), timeout=2)
+                self.listo = True
+            except Exception as exc:
+                logger.warning("MongoDB sigue sin responder: %s", exc)
+        return self.listo
+
+    def cerrar(self) -> None:
+        # El balanceador deja de enviar tráfico mientras la réplica se apaga
+        self.listo = False
+        self.cerrando = True
+
+preparacion = Preparacion()
+
+async def _paso(nombre: str, paso: Callable[[], Awaitable[Optional[dict]]]) -> bool:
+    t0 = time.perf_counter()
+    try:
+        extra = await paso() or {}
+    except Exception as exc:
+        preparacion.pasos[nombre] = {"ms": round((time.perf_counter() - t0) * 1000, 1), "error": str(exc)}
+        logger.warning("Calentamiento: falló el paso %s: %s", nombre, exc)
+        return False
+    preparacion.pasos[nombre] = {"ms": round((time.perf_counter() - t0) * 1000, 1), **extra}
+    return True
+
+async def calentar(
+    db: AsyncIOMotorDatabase,
+    hash_pool: PoolAcotado,
+    verificar_clave: Callable[[str, str], bool],
+) -> Preparacion:
+    preparacion.reiniciar()
+    t0 = time.perf_counter()
+
+    async def ping():
+        await db.command("ping")
+
+    async def conexiones():
+        n = min(settings.CALENTAMIENTO_CONEXIONES, settings.MONGODB_MAX_POOL_SIZE)
+        await asyncio.gather(*(db.command("ping") for _ in range(n)))
+        return {"abiertas": int(pool_abiertas.valor())}
+
+    async def bcrypt():
+        await asyncio.gather(*(hash_pool.ejecutar(verificar_clave, "calentamiento", HASH_CALENTAMIENTO)
+                               for _ in range(hash_pool.workers)))
+
+    async def firmar_jwt():
+        token = jwt.encode({"sub": "calentamiento"}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    async def todos():
+        if await _paso("ping", ping):
+            await _paso("conexiones", conexiones)
+        await _paso("bcrypt", bcrypt)
+        await _paso("jwt", firmar_jwt)
+
+    try:
+        await asyncio.wait_for(todos(), timeout=settings.CALENTAMIENTO_TIMEOUT_SEGUNDOS)
+    except asyncio.TimeoutError:
+        logger.warning("Calentamiento: se agotaron %ss", settings.CALENTAMIENTO_TIMEOUT_SEGUNDOS)
+    # Lista recién al terminar todos los pasos (o el timeout), y solo si MongoDB respondió
+    ping_ok = "ping" in preparacion.pasos and "error" not in preparacion.pasos["ping"]
+    preparacion.listo = ping_ok
+    preparacion.duracion_ms = round((time.perf_counter() - t0) * 1000, 1)
+    preparacion.terminado = True
+    return preparacion
@@ -1,4 +1,6 @@
 # core/config.py
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -7,6 +9,85 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "change_me"         # reemplaza en .env
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     ALGORITHM: str = "HS256"
+    TOKEN_CACHE_MAX: int = 10_000          # tokens verificados en memoria (LRU hasta su exp)
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""                   # p. ej. "app.services=DEBUG,app.api.auth=WARNING"
+    LOG_FORMAT: str = "json"               # "json" o "texto"
+
+    # MongoDB
+    MONGODB_CREAR_INDICES: bool = True     # crea los índices faltantes al arrancar
+    MONGODB_BACKEND: str = "mongo"         # "memoria": motor en proceso (app/core/memoria.py), sin servidor
+    MONGODB_MEMORIA_SEMILLA: Optional[str] = None  # JSON extendido {"coleccion": [docs]} a cargar al iniciar
+
+    # Pool de conexiones de Motor (None = valor por defecto del driver)
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_MAX_IDLE_MS: Optional[int] = None          # cierra conexiones ociosas tras este tiempo
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None  # espera máxima por una conexión libre
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 30_000
+    MONGODB_CONNECT_TIMEOUT_MS: int = 20_000
+    MONGODB_COMPRESSORS: str = ""          # p. ej. "zstd,snappy,zlib" (en orden de preferencia)
+    MONGODB_ZLIB_LEVEL: int = -1
+    MONGODB_LECTURA_AGENTE: str = "primary"  # "secondaryPreferred" envía la cola del agente a secundarios
+
+    # Calentamiento al arrancar: ping, conexiones del pool, bcrypt y JWT antes de /ready
+    CALENTAMIENTO_HABILITADO: bool = True
+    CALENTAMIENTO_CONEXIONES: int = 10     # pings concurrentes para abrir conexiones (tope: MONGODB_MAX_POOL_SIZE)
+    CALENTAMIENTO_TIMEOUT_SEGUNDOS: float = 30
+
+    # Exportación en streaming (/solicitudes/agente/exportar)
+    EXPORTACION_BATCH_SIZE: int = 1000     # documentos por getMore al exportar
+
+    # Pool para bcrypt (fuera del event loop)
+    HASH_POOL_TIPO: str = "thread"         # "thread" o "process"
+    HASH_POOL_WORKERS: int = 4
+    HASH_POOL_MAX_COLA: int = 256          # por encima se responde 503
+
+    # Límite de intentos de login (cubetas de fichas), antes de la base de datos y de bcrypt
+    LOGIN_LIMITE_HABILITADO: bool = True
+    LOGIN_LIMITE_BACKEND: str = "memoria"  # "memoria" (por réplica), "mongo" o "redis" (compartidos; usa CACHE_REDIS_URL)
+    LOGIN_LIMITE_IP_RAFAGA: int = 20       # intentos seguidos por IP
+    LOGIN_LIMITE_IP_POR_MINUTO: float = 60
+    LOGIN_LIMITE_CORREO_RAFAGA: int = 5    # intentos fallidos seguidos por correo
+    LOGIN_LIMITE_CORREO_POR_MINUTO: float = 2
+    LOGIN_LIMITE_MAX_CLAVES: int = 100_000 # cubetas en memoria (LRU)
+    LOGIN_LIMITE_PROXY_CONFIABLE: bool = False  # toma la IP de X-Forwarded-For (solo detrás de un proxy propio)
+
+    # Barrido automático borrador -> en_validacion (regla de 24 horas)
+    BARRIDO_HABILITADO: bool = True
+    BARRIDO_INTERVALO_SEGUNDOS: float = 300
+    BARRIDO_LEASE_SEGUNDOS: float = 240    # con varias réplicas solo una barre a la vez
+    BARRIDO_LOTE: int = 500
+    BARRIDO_MAX_LOTES: int = 20
+
+    # Tabla de tasas versionada (cada réplica consulta si cambió la versión activa)
+    TASAS_REFRESCO_SEGUNDOS: float = 30
+
+    # Estadísticas pre-agregadas (la reconciliación recalcula los contadores desde cero)
+    ESTADISTICAS_RECONCILIAR_HABILITADO: bool = True
+    ESTADISTICAS_RECONCILIAR_SEGUNDOS: float = 3600
+    ESTADISTICAS_LEASE_SEGUNDOS: float = 1800
+
+    # Eventos en tiempo real (SSE alimentado por change streams; requiere replica set)
+    EVENTOS_HABILITADO: bool = True
+    EVENTOS_COLA_MAX: int = 100            # eventos pendientes por conexión antes de cortarla
+    EVENTOS_BUFFER: int = 1000             # últimos eventos guardados para reconexiones
+    EVENTOS_KEEPALIVE_SEGUNDOS: float = 15
+    EVENTOS_REINTENTO_MAX_SEGUNDOS: float = 60
+    EVENTOS_TOKEN_SEGUNDOS: int = 60       # vigencia del token de ?token= (EventSource no envía Authorization)
+
+    # Caché de respuestas de lectura (listados, cola del agente, /auth/me)
+    CACHE_TTL_SEGUNDOS: float = 5          # 0 desactiva la caché
+    CACHE_MAX_ENTRADAS: int = 10_000
+    CACHE_BACKEND: str = "memoria"         # "memoria" o "redis" (compartida entre réplicas)
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Idempotency-Key en crear solicitud, cambios de estado y decisiones del agente
+    IDEMPOTENCIA_TTL_SEGUNDOS: float = 24 * 3600  # cuánto se recuerda una clave; 0 ignora la cabecera
+    IDEMPOTENCIA_RESERVA_SEGUNDOS: float = 60     # tras esto una petición que no terminó se da por muerta
+    IDEMPOTENCIA_MAX_ENTRADAS: int = 10_000       # respuestas en el LRU de cada réplica
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
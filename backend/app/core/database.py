@@ -1,15 +1,51 @@
 # core/database.py
-from typing import AsyncGenerator
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from typing import AsyncGenerator, Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ReadPreference
 from .config import settings
+from .memoria import ClienteMemoria
+from .metrics import ComandosMongoListener, PoolMongoListener
 
 _client: AsyncIOMotorClient | None = None
 _db: AsyncIOMotorDatabase | None = None
 
+PREFERENCIAS_LECTURA = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+def opciones_cliente() -> dict:
+    """Opciones de pool, timeouts y compresión para AsyncIOMotorClient a partir de Settings."""
+    opciones = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        # Comandos: latencia por colección/operación; CMAP: uso y espera del pool
+        "event_listeners": [ComandosMongoListener(), PoolMongoListener()],
+    }
+    if settings.MONGODB_MAX_IDLE_MS is not None:
+        opciones["maxIdleTimeMS"] = settings.MONGODB_MAX_IDLE_MS
+    if settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS is not None:
+        opciones["waitQueueTimeoutMS"] = settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS
+    compresores = [c.strip() for c in settings.MONGODB_COMPRESSORS.split(",") if c.strip()]
+    if compresores:
+        # Se negocian con el servidor; uno no instalado (zstandard, python-snappy) se ignora con aviso
+        opciones["compressors"] = compresores
+        if "zlib" in compresores:
+            opciones["zlibCompressionLevel"] = settings.MONGODB_ZLIB_LEVEL
+    return opciones
+
 async def get_client() -> AsyncIOMotorClient:
     global _client
     if _client is None:
-        _client = AsyncIOMotorClient(settings.MONGODB_URL)
+        if settings.MONGODB_BACKEND == "memoria":
+            _client = ClienteMemoria(settings.MONGODB_MEMORIA_SEMILLA, settings.MONGODB_DB_NAME)
+        else:
+            _client = AsyncIOMotorClient(settings.MONGODB_URL, **opciones_cliente())
     return _client
 
 async def get_database() -> AsyncGenerator[AsyncIOMotorDatabase, None]:
@@ -18,3 +54,14 @@ async def get_database() -> AsyncGenerator[AsyncIOMotorDatabase, None]:
         client = await get_client()
         _db = client[settings.MONGODB_DB_NAME]
     yield _db
+
+def coleccion_lectura(db: AsyncIOMotorDatabase, nombre: str, preferencia: Optional[str] = None) -> AsyncIOMotorCollection:
+    """
+    Colección con la preferencia de lectura indicada, solo para consultas.
+    Las escrituras siguen usando db[nombre] (siempre van al primario).
+    """
+    if not preferencia or preferencia == "primary":
+        return db[nombre]
+    if preferencia not in PREFERENCIAS_LECTURA:
+        raise ValueError(f"Preferencia de lectura no soportada: {preferencia}")
+    return db[nombre].with_options(read_preference=PREFERENCIAS_LECTURA[preferencia])
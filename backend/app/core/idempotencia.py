@@ -0,0 +1,240 @@
+# core/idempotencia.py
+"""
+Soporte de la cabecera `Idempotency-Key` en los endpoints que escriben
+(crear solicitud, cambiar estado, aprobar/rechazar). Un reintento con la
+misma clave devuelve la respuesta original sin repetir la escritura.
+
+- La clave vale por principal: dos usuarios pueden usar la misma.
+- Se guarda una huella de la petición (método, ruta, query y cuerpo).
+  Reusar la clave con otra petición responde 422.
+- Primero se reserva la clave en la colección `idempotencia` (insert con
+  _id único) y luego se ejecuta el endpoint. Si otra réplica tiene la
+  reserva en curso se responde 409 con Retry-After. En el mismo proceso el
+  reintento espera al primero y comparte su resultado.
+- Se guardan las respuestas 2xx y los 4xx definitivos. Ante un error
+  inesperado, 5xx o 408/409/429 la reserva se libera: esos fallos no
+  escribieron nada y el cliente puede reintentar.
+- Las respuestas guardadas viven IDEMPOTENCIA_TTL_SEGUNDOS (índice TTL
+  sobre `expira`). Un LRU en memoria sirve los reintentos sin ir a MongoDB.
+  Una réplica ve las claves que guardó otra cuando las lee de MongoDB.
+
+Las respuestas repetidas llevan `Idempotent-Replayed: true`.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.metrics import registro
+
+logger = logging.getLogger(__name__)
+
+COLECCION = "idempotencia"
+CABECERA = "idempotency-key"
+MAX_LARGO_CLAVE = 255
+
+# Reintentables: no se guardan
+NO_DEFINITIVOS = {408, 409, 429}
+
+# (código, cuerpo JSON)
+Resultado = Tuple[int, bytes]
+
+consultas_idempotencia = registro.contador(
+    "idempotency_requests_total", "Peticiones con Idempotency-Key por resultado", ("resultado",))
+
+def huella(request: Request, cuerpo: bytes) -> str:
+    h = hashlib.sha256()
+    for parte in (request.method, request.url.path, request.url.query):
+        h.update(parte.encode())
+        h.update(b"\0")
+    h.update(cuerpo)
+    return h.hexdigest()
+
+class RegistroIdempotencia:
+    def __init__(self, max_entradas: int, ttl: float, reserva: float):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.reserva = reserva
+        # clave -> (huella, resultado, expira en time.monotonic())
+        self._lru: "OrderedDict[str, Tuple[str, Resultado, float]]" = OrderedDict()
+        # clave -> (huella, tarea que ejecuta el endpoint)
+        self._en_vuelo: Dict[str, Tuple[str, asyncio.Task]] = {}
+
+    # LRU
+    def _leer_lru(self, clave: str) -> Optional[Tuple[str, Resultado]]:
+        entrada = self._lru.get(clave)
+        if entrada is None:
+            return None
+        huella_, resultado, expira = entrada
+        if expira <= time.monotonic():
+            del self._lru[clave]
+            return None
+        self._lru.move_to_end(clave)
+        return huella_, resultado
+
+    def _guardar_lru(self, clave: str, huella_: str, resultado: Resultado, expira: datetime) -> None:
+        if expira.tzinfo is None:   # Motor devuelve fechas UTC sin zona
+            expira = expira.replace(tzinfo=timezone.utc)
+        restante = (expira - datetime.now(timezone.utc)).total_seconds()
+        self._lru[clave] = (huella_, resultado, time.monotonic() + restante)
+        self._lru.move_to_end(clave)
+        while len(self._lru) > self.max_entradas:
+            self._lru.popitem(last=False)
+
+    def limpiar(self) -> None:
+        self._lru.clear()
+        self._en_vuelo.clear()
+
+    @staticmethod
+    def _verificar_huella(guardada: str, actual: str) -> None:
+        if guardada != actual:
+            consultas_idempotencia.inc(resultado="mismatch")
+            raise HTTPException(status_code=422,
+                                detail="La Idempotency-Key ya se usó con una petición distinta")
+
+    async def respuesta(
+        self,
+        request: Request,
+        db: AsyncIOMotorDatabase,
+        principal_id: str,
+        calcular: Callable[[], Awaitable[bytes]],
+        status_code: int = 200,
+    ) -> Response:
+        """Ejecuta `calcular` (que devuelve el cuerpo JSON) una sola vez por Idempotency-Key."""
+        clave_cliente = request.headers.get(CABECERA)
+        if clave_cliente is None or self.ttl <= 0:
+            return _respuesta((status_code, await calcular()), repetida=False)
+        if not 0 < len(clave_cliente) <= MAX_LARGO_CLAVE:
+            raise HTTPException(status_code=400,
+                                detail=f"Idempotency-Key debe tener entre 1 y {MAX_LARGO_CLAVE} caracteres")
+
+        clave = f"{principal_id}:{clave_cliente}"
+        huella_ = huella(request, await request.body())
+
+        guardada = self._leer_lru(clave)
+        if guardada is not None:
+            self._verificar_huella(guardada[0], huella_)
+            consultas_idempotencia.inc(resultado="hit")
+            return _respuesta(guardada[1], repetida=True)
+
+        en_vuelo = self._en_vuelo.get(clave)
+        if en_vuelo is not None:
+            # Reintento mientras el original sigue en curso en esta réplica
+            self._verificar_huella(en_vuelo[0], huella_)
+            consultas_idempotencia.inc(resultado="coalesced")
+            resultado, _ = await asyncio.shield(en_vuelo[1])
+            return _respuesta(resultado, repetida=True)
+
+        tarea = asyncio.ensure_future(self._ejecutar(db, clave, huella_, calcular, status_code))
+        self._en_vuelo[clave] = (huella_, tarea)
+        tarea.add_done_callback(lambda _: self._en_vuelo.pop(clave, None))
+        # shield: si el cliente se desconecta la escritura termina y queda guardada
+        resultado, repetida = await asyncio.shield(tarea)
+        return _respuesta(resultado, repetida)
+
+    async def _ejecutar(
+        self,
+        db: AsyncIOMotorDatabase,
+        clave: str,
+        huella_: str,
+        calcular: Callable[[], Awaitable[bytes]],
+        status_code: int,
+    ) -> Tuple[Resultado, bool]:
+        """Devuelve el resultado y si es una repetición de lo guardado por otra petición."""
+        coleccion = db[COLECCION]
+        ahora = datetime.now(timezone.utc)
+        try:
+            await coleccion.insert_one({"_id": clave, "huella": huella_, "estado": "en_curso",
+                                        "expira": ahora + timedelta(seconds=self.reserva)})
+        except DuplicateKeyError:
+            guardada = await self._guardada(coleccion, clave, huella_, ahora)
+            if guardada is not None:
+                return guardada, True
+
+        consultas_idempotencia.inc(resultado="miss")
+        try:
+            resultado = (status_code, await calcular())
+        except HTTPException as exc:
+            if exc.status_code >= 500 or exc.status_code in NO_DEFINITIVOS:
+                await self._liberar(coleccion, clave)
+                raise
+            # El mismo error se repetiría: se guarda como respuesta
+            resultado = (exc.status_code, json.dumps({"detail": exc.detail}, ensure_ascii=False,
+                                                     default=str).encode("utf-8"))
+        except BaseException:
+            await self._liberar(coleccion, clave)
+            raise
+
+        expira = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        try:
+            await coleccion.update_one({"_id": clave}, {"$set": {
+                "estado": "completa", "codigo": resultado[0], "cuerpo": resultado[1], "expira": expira,
+            }})
+        except Exception as exc:
+            # La escritura ya ocurrió: al menos esta réplica la recuerda
+            logger.warning("No se pudo guardar la respuesta idempotente %s: %s", clave, exc)
+        self._guardar_lru(clave, huella_, resultado, expira)
+        return resultado, False
+
+    async def _guardada(self, coleccion, clave: str, huella_: str, ahora: datetime) -> Optional[Resultado]:
+        """Resultado ya guardado para la clave; None si se tomó una reserva abandonada o vencida."""
+        # El monitor TTL borra cada ~60 s: lo vencido se ignora aunque siga en la colección
+        doc = await coleccion.find_one({"_id": clave, "expira": {"$gt": ahora}})
+        if doc is not None:
+            self._verificar_huella(doc["huella"], huella_)
+            if doc["estado"] == "completa":
+                resultado = (doc["codigo"], bytes(doc["cuerpo"]))
+                self._guardar_lru(clave, huella_, resultado, doc["expira"])
+                consultas_idempotencia.inc(resultado="hit")
+                return resultado
+            self._en_curso()
+        # Reserva de una petición que murió a mitad de camino o respuesta vencida: se toma
+        reserva = {"huella": huella_, "estado": "en_curso", "expira": ahora + timedelta(seconds=self.reserva)}
+        tomada = await coleccion.find_one_and_update(
+            {"_id": clave, "expira": {"$lte": ahora}},
+            {"$set": reserva, "$unset": {"codigo": "", "cuerpo": ""}},
+            projection={"_id": 1},
+        )
+        if tomada is None:
+            # El TTL la borró entre el insert y la lectura: se vuelve a reservar
+            try:
+                await coleccion.insert_one({"_id": clave, **reserva})
+            except DuplicateKeyError:
+                # Otra réplica la reservó en la misma ventana
+                self._en_curso()
+        return None
+
+    @staticmethod
+    def _en_curso() -> None:
+        consultas_idempotencia.inc(resultado="conflict")
+        raise HTTPException(status_code=409, headers={"Retry-After": "1"},
+                            detail="Una petición con esta Idempotency-Key sigue en curso")
+
+    @staticmethod
+    async def _liberar(coleccion, clave: str) -> None:
+        try:
+            await coleccion.delete_one({"_id": clave, "estado": "en_curso"})
+        except Exception as exc:
+            # La reserva vence sola tras IDEMPOTENCIA_RESERVA_SEGUNDOS
+            logger.warning("No se pudo liberar la reserva idempotente %s: %s", clave, exc)
+
+def _respuesta(resultado: Resultado, repetida: bool) -> Response:
+    codigo, cuerpo = resultado
+    cabeceras = {"Idempotent-Replayed": "true"} if repetida else {}
+    return Response(cuerpo, status_code=codigo, media_type="application/json", headers=cabeceras)
+
+idempotencia = RegistroIdempotencia(
+    settings.IDEMPOTENCIA_MAX_ENTRADAS,
+    settings.IDEMPOTENCIA_TTL_SEGUNDOS,
+    settings.IDEMPOTENCIA_RESERVA_SEGUNDOS,
+)
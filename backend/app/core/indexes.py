@@ -0,0 +1,183 @@
+# core/indexes.py
+"""
+Índices de MongoDB que respaldan las consultas de la capa de servicios.
+
+- INDICES declara los índices por colección.
+- CONSULTAS describe la forma de cada consulta (igualdad, orden, rango)
+  para poder comprobar que ninguna corre sin un índice que la soporte.
+
+Uso:
+    python -m app.core.indexes           # crea los índices que falten
+    python -m app.core.indexes --check   # falla si hay consultas sin índice
+"""
+import asyncio
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+INDICES: Dict[str, List[IndexModel]] = {
+    "usuarios": [
+        IndexModel([("correo", ASCENDING)], name="correo_unico", unique=True),
+    ],
+    "agentes": [
+        IndexModel([("correo", ASCENDING)], name="correo_unico", unique=True),
+    ],
+    "solicitudes_cdt": [
+        # Listado del cliente: igualdad en usuario_id, orden keyset y filtro de eliminadas
+        IndexModel(
+            [("usuario_id", ASCENDING), ("fechaCreacion", DESCENDING),
+             ("_id", DESCENDING), ("eliminada", ASCENDING)],
+            name="usuario_fecha",
+        ),
+        # Cola del agente y barrido de borradores vencidos
+        IndexModel(
+            [("estado", ASCENDING), ("fechaCreacion", ASCENDING),
+             ("_id", ASCENDING), ("eliminada", ASCENDING)],
+            name="estado_fecha",
+        ),
+        # Búsqueda por palabras (`q`): prefijos anclados sobre el arreglo multikey
+        IndexModel([("claves_busqueda", ASCENDING)], name="claves_busqueda"),
+    ],
+    "tablas_tasas": [
+        # Versión activa más reciente
+        IndexModel([("activa", ASCENDING), ("_id", DESCENDING)], name="activa_version"),
+    ],
+    "tareas_ejecuciones": [
+        # El historial de corridas de tareas periódicas se conserva 30 días
+        IndexModel([("inicio", ASCENDING)], name="inicio_ttl", expireAfterSeconds=30 * 24 * 3600),
+    ],
+    "idempotencia": [
+        # Respuestas guardadas por Idempotency-Key (y reservas en curso)
+        IndexModel([("expira", ASCENDING)], name="expira_ttl", expireAfterSeconds=0),
+    ],
+    "limites_login": [
+        # Con LOGIN_LIMITE_BACKEND=mongo: la cubeta se borra cuando ya estaría llena
+        IndexModel([("expira", ASCENDING)], name="expira_ttl", expireAfterSeconds=0),
+    ],
+}
+
+@dataclass(frozen=True)
+class Consulta:
+    origen: str                                  # función que ejecuta la consulta
+    coleccion: str
+    igualdad: Tuple[str, ...] = ()
+    orden: Tuple[Tuple[str, int], ...] = ()
+    rango: Tuple[str, ...] = ()
+
+# Las búsquedas por _id quedan cubiertas por el índice implícito de MongoDB
+CONSULTAS: List[Consulta] = [
+    Consulta("services.identidades.buscar_por_correo", "usuarios", igualdad=("correo",)),
+    Consulta("services.identidades.buscar_por_correo", "agentes", igualdad=("correo",)),
+    Consulta(
+        "api.solicitudes_cdt.listar_mis_solicitudes", "solicitudes_cdt",
+        igualdad=("usuario_id",), orden=(("fechaCreacion", -1), ("_id", -1)),
+    ),
+    Consulta(
+        "services.solicitudes_cdt.listar_solicitudes", "solicitudes_cdt",
+        igualdad=("usuario_id",), orden=(("fechaCreacion", -1),), rango=("eliminada",),
+    ),
+    Consulta(
+        "services.solicitudes_cdt_agente.listar_pendientes", "solicitudes_cdt",
+        igualdad=("estado",), orden=(("fechaCreacion", 1), ("_id", 1)),
+    ),
+    Consulta(
+        "services.solicitudes_cdt.actualizar_solicitudes_vencidas", "solicitudes_cdt",
+        igualdad=("estado",), orden=(("fechaCreacion", 1),), rango=("eliminada",),
+    ),
+    Consulta(
+        "services.busqueda.filtro_busqueda", "solicitudes_cdt", rango=("claves_busqueda",),
+    ),
+    Consulta(
+        "services.tasas.RegistroTasas.refrescar", "tablas_tasas",
+        igualdad=("activa",), orden=(("_id", -1),),
+    ),
+]
+
+def _claves(modelo: IndexModel) -> List[Tuple[str, int]]:
+    return list(modelo.document["key"].items())
+
+def soporta(claves: List[Tuple[str, int]], consulta: Consulta) -> bool:
+    """True si un índice con estas claves sirve a la consulta (regla igualdad-orden-rango)."""
+    campos = [campo for campo, _ in claves]
+    n = len(consulta.igualdad)
+    if n and set(campos[:n]) != set(consulta.igualdad):
+        return False
+
+    resto = claves[n:]
+    if consulta.orden:
+        tramo = resto[:len(consulta.orden)]
+        if [c for c, _ in tramo] != [c for c, _ in consulta.orden]:
+            return False
+        directo = all(d == o for (_, d), (_, o) in zip(tramo, consulta.orden))
+        inverso = all(d == -o for (_, d), (_, o) in zip(tramo, consulta.orden))
+        if not (directo or inverso):
+            return False
+        resto = resto[len(consulta.orden):]
+
+    campos_resto = [c for c, _ in resto]
+    return all(campo in campos_resto for campo in consulta.rango)
+
+def verificar_cobertura(
+    indices: Optional[Dict[str, List[IndexModel]]] = None,
+    consultas: Optional[List[Consulta]] = None,
+) -> List[Consulta]:
+    """Devuelve las consultas que no tienen ningún índice declarado que las soporte."""
+    indices = INDICES if indices is None else indices
+    consultas = CONSULTAS if consultas is None else consultas
+    return [
+        c for c in consultas
+        if not any(soporta(_claves(m), c) for m in indices.get(c.coleccion, []))
+    ]
+
+async def asegurar_indices(db: AsyncIOMotorDatabase, colecciones: Optional[List[str]] = None) -> List[str]:
+    """Crea los índices declarados que falten. Idempotente; devuelve los creados."""
+    creados = []
+    for coleccion, modelos in INDICES.items():
+        if colecciones is not None and coleccion not in colecciones:
+            continue
+        existentes = await db[coleccion].index_information()
+        faltantes = [m for m in modelos if m.document["name"] not in existentes]
+        if faltantes:
+            await db[coleccion].create_indexes(faltantes)
+            creados.extend(f"{coleccion}.{m.document['name']}" for m in faltantes)
+    return creados
+
+async def indices_faltantes(db: AsyncIOMotorDatabase) -> List[str]:
+    """Índices declarados que todavía no existen en la base de datos."""
+    faltan = []
+    for coleccion, modelos in INDICES.items():
+        existentes = await db[coleccion].index_information()
+        faltan.extend(
+            f"{coleccion}.{m.document['name']}" for m in modelos
+            if m.document["name"] not in existentes
+        )
+    return faltan
+
+async def _main(argv: List[str]) -> int:
+    from app.core.config import settings
+    from app.core.database import get_client
+
+    sin_indice = verificar_cobertura()
+    for c in sin_indice:
+        print(f"❌ Consulta sin índice: {c.origen} sobre {c.coleccion}")
+
+    client = await get_client()
+    db = client[settings.MONGODB_DB_NAME]
+    try:
+        if "--check" in argv:
+            faltan = await indices_faltantes(db)
+            for nombre in faltan:
+                print(f"❌ Índice no creado: {nombre}")
+            return 1 if (sin_indice or faltan) else 0
+
+        creados = await asegurar_indices(db)
+        print(f"✅ Índices creados: {', '.join(creados)}" if creados else "✅ Índices al día")
+        return 1 if sin_indice else 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,210 @@
+# core/limites.py
+"""
+Límite de intentos de login con cubetas de fichas (token bucket), para que
+una ráfaga de credential stuffing no sature la CPU con bcrypt.
+
+- Por IP: cada intento consume una ficha.
+- Por correo: solo los intentos fallidos consumen ficha; con la cubeta vacía
+  se rechaza incluso la contraseña correcta hasta que se recargue.
+- Se verifica antes de consultar la base de datos y antes de bcrypt. El
+  rechazo es un 429 con Retry-After y cuenta en `login_throttled_total`.
+
+Cada cubeta se guarda como un solo número con GCRA: el "tiempo teórico de
+llegada" (tat). Una ficha se recarga cada `intervalo` segundos y caben
+`rafaga` seguidas. Un intento se admite si max(tat, ahora) - ahora <=
+(rafaga - 1) * intervalo, y entonces tat avanza un intervalo.
+
+Backends: "memoria" (por réplica, LRU acotado), "mongo" (colección
+`limites_login` con TTL; dos escrituras atómicas por intento) o "redis"
+(script Lua; cualquier servidor compatible). Si el backend compartido falla
+el intento se deja pasar: el pool de bcrypt sigue acotando la carga.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, Request
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.metrics import registro
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - redis es opcional
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+COLECCION = "limites_login"
+
+intentos_rechazados = registro.contador(
+    "login_throttled_total", "Intentos de login rechazados por el límite de intentos", ("motivo",))
+
+@dataclass(frozen=True)
+class Politica:
+    rafaga: int          # fichas que caben en la cubeta
+    por_minuto: float    # ritmo de recarga
+
+    @property
+    def intervalo(self) -> float:
+        return 60.0 / self.por_minuto
+
+    @property
+    def holgura(self) -> float:
+        return (self.rafaga - 1) * self.intervalo
+
+    def espera(self, tat: float, ahora: float) -> float:
+        """Segundos hasta que haya una ficha (0 si la hay ya)."""
+        return max(0.0, max(tat, ahora) - ahora - self.holgura)
+
+# --- Backends ---
+class BackendMemoria:
+    def __init__(self, max_claves: int):
+        self.max_claves = max_claves
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    async def consumir(self, db, clave: str, politica: Politica, ahora: float, registrar: bool = True) -> float:
+        tat = self._tat.get(clave, ahora)
+        espera = politica.espera(tat, ahora)
+        if espera or not registrar:
+            return espera
+        self._tat[clave] = max(tat, ahora) + politica.intervalo
+        self._tat.move_to_end(clave)
+        while len(self._tat) > self.max_claves:
+            # Olvidar la clave menos reciente equivale a devolverle sus fichas
+            self._tat.popitem(last=False)
+        return 0.0
+
+    def limpiar(self) -> None:
+        self._tat.clear()
+
+class BackendMongo:
+    """Compartido entre réplicas vía la colección `limites_login` ({_id: clave, tat, expira})."""
+
+    async def consumir(self, db: AsyncIOMotorDatabase, clave: str, politica: Politica,
+                       ahora: float, registrar: bool = True) -> float:
+        coleccion = db[COLECCION]
+        if registrar:
+            try:
+                # Cubeta llena (tat en el pasado) o clave nueva: tat parte de ahora
+                await coleccion.update_one({"_id": clave, "tat": {"$lt": ahora}},
+                                           {"$set": {"tat": ahora}}, upsert=True)
+            except DuplicateKeyError:
+                pass   # el documento existe con tat >= ahora
+            admitido = await coleccion.find_one_and_update(
+                {"_id": clave, "tat": {"$lte": ahora + politica.holgura}},
+                {
+                    "$inc": {"tat": politica.intervalo},
+                    # Al vencer el TTL la cubeta ya estaría llena otra vez
+                    "$set": {"expira": datetime.fromtimestamp(
+                        ahora + politica.holgura + politica.intervalo, tz=timezone.utc)},
+                },
+                projection={"_id": 1},
+            )
+            if admitido is not None:
+                return 0.0
+        doc = await coleccion.find_one({"_id": clave}, {"tat": 1})
+        return politica.espera(doc["tat"] if doc else ahora, ahora)
+
+    def limpiar(self) -> None:
+        pass
+
+# KEYS[1]: clave; ARGV: ahora, intervalo, holgura, registrar (1/0). Devuelve la espera como texto.
+_SCRIPT_REDIS = """
+local ahora, intervalo, holgura = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or ARGV[1]), ahora)
+if tat - ahora > holgura then return tostring(tat - ahora - holgura) end
+if ARGV[4] == '1' then
+  redis.call('SET', KEYS[1], tostring(tat + intervalo), 'PX', math.ceil((tat + intervalo - ahora) * 1000))
+end
+return '0'
+"""
+
+class BackendRedis:
+    def __init__(self, url: str, prefijo: str = "neocdt:login:"):
+        if redis_asyncio is None:
+            raise RuntimeError("LOGIN_LIMITE_BACKEND=redis requiere el paquete 'redis'")
+        self.cliente = redis_asyncio.from_url(url)
+        self.script = self.cliente.register_script(_SCRIPT_REDIS)
+        self.prefijo = prefijo
+
+    async def consumir(self, db, clave: str, politica: Politica, ahora: float, registrar: bool = True) -> float:
+        espera = await self.script(keys=[self.prefijo + clave],
+                                   args=[repr(ahora), repr(politica.intervalo), repr(politica.holgura),
+                                         "1" if registrar else "0"])
+        return float(espera)
+
+    def limpiar(self) -> None:
+        pass
+
+# --- Limitador ---
+def ip_cliente(request: Request) -> str:
+    if settings.LOGIN_LIMITE_PROXY_CONFIABLE:
+        reenviada = request.headers.get("x-forwarded-for")
+        if reenviada:
+            return reenviada.split(",")[0].strip()
+    return request.client.host if request.client else "desconocida"
+
+class LimitadorLogin:
+    def __init__(self, backend, por_ip: Politica, por_correo: Politica, habilitado: bool = True):
+        self.backend = backend
+        self.por_ip = por_ip
+        self.por_correo = por_correo
+        self.habilitado = habilitado
+
+    async def _consumir(self, db, clave: str, politica: Politica, registrar: bool = True) -> float:
+        try:
+            return await self.backend.consumir(db, clave, politica, time.time(), registrar)
+        except Exception as exc:
+            logger.warning("Límite de intentos de login no disponible: %s", exc)
+            return 0.0
+
+    @staticmethod
+    def _rechazar(motivo: str, espera: float) -> None:
+        intentos_rechazados.inc(motivo=motivo)
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiados intentos de inicio de sesión, intenta más tarde",
+            headers={"Retry-After": str(max(1, math.ceil(espera)))},
+        )
+
+    async def verificar(self, db, ip: str, correo: str) -> None:
+        """Lanza 429 si la IP o el correo no tienen fichas; la IP consume una."""
+        if not self.habilitado:
+            return
+        espera = await self._consumir(db, f"ip:{ip}", self.por_ip)
+        if espera:
+            self._rechazar("ip", espera)
+        espera = await self._consumir(db, f"correo:{correo.strip().lower()}", self.por_correo, registrar=False)
+        if espera:
+            self._rechazar("correo", espera)
+
+    async def registrar_fallo(self, db, correo: str) -> None:
+        if self.habilitado:
+            await self._consumir(db, f"correo:{correo.strip().lower()}", self.por_correo)
+
+    def limpiar(self) -> None:
+        self.backend.limpiar()
+
+def crear_limitador() -> LimitadorLogin:
+    backend = BackendMemoria(settings.LOGIN_LIMITE_MAX_CLAVES)
+    if settings.LOGIN_LIMITE_BACKEND == "mongo":
+        backend = BackendMongo()
+    elif settings.LOGIN_LIMITE_BACKEND == "redis":
+        try:
+            backend = BackendRedis(settings.CACHE_REDIS_URL)
+        except RuntimeError as exc:
+            logger.warning("%s; se usa el límite en memoria", exc)
+    return LimitadorLogin(
+        backend,
+        por_ip=Politica(settings.LOGIN_LIMITE_IP_RAFAGA, settings.LOGIN_LIMITE_IP_POR_MINUTO),
+        por_correo=Politica(settings.LOGIN_LIMITE_CORREO_RAFAGA, settings.LOGIN_LIMITE_CORREO_POR_MINUTO),
+        habilitado=settings.LOGIN_LIMITE_HABILITADO,
+    )
+
+limitador_login = crear_limitador()
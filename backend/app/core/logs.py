@@ -0,0 +1,88 @@
+# core/logs.py
+"""
+Logging estructurado y no bloqueante para la API.
+
+Los módulos usan `logging.getLogger(__name__)` con argumentos perezosos
+(`logger.debug("Payload: %s", payload)`): si el nivel está deshabilitado el
+mensaje nunca se formatea. Los registros habilitados se encolan y un hilo
+aparte (QueueListener) los serializa a JSON y los escribe en stdout.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Optional, TextIO
+
+# Atributos estándar de LogRecord; el resto se considera contexto extra
+_ATRIBUTOS_BASE = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_BASE:
+                datos[clave] = valor
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+class _ManejadorCola(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Solo se resuelven los argumentos; el JSON se arma en el hilo del listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configurar_logging(
+    nivel: str = "INFO",
+    niveles_modulo: str = "",
+    formato: str = "json",
+    destino: Optional[TextIO] = None,
+) -> None:
+    """
+    Configura el logger "app".
+    `niveles_modulo` acepta pares "modulo=NIVEL" separados por coma,
+    por ejemplo "app.services=DEBUG,app.api.auth=WARNING".
+    """
+    global _listener
+    detener_logging()
+
+    salida = logging.StreamHandler(destino or sys.stdout)
+    if formato == "json":
+        salida.setFormatter(FormatoJSON())
+    else:
+        salida.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    cola: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    raiz = logging.getLogger("app")
+    raiz.handlers = [_ManejadorCola(cola)]
+    raiz.setLevel(nivel.upper())
+    raiz.propagate = False
+
+    for par in filter(None, (p.strip() for p in niveles_modulo.split(","))):
+        modulo, _, nivel_modulo = par.partition("=")
+        logging.getLogger(modulo.strip()).setLevel(nivel_modulo.strip().upper())
+
+    _listener = logging.handlers.QueueListener(cola, salida)
+    _listener.start()
+
+def detener_logging() -> None:
+    """Vacía la cola y detiene el hilo escritor."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(detener_logging)
@@ -0,0 +1,1145 @@
+# core/memoria.py
+"""
+Motor de almacenamiento en memoria compatible con la API de Motor que usa
+esta aplicación. Con MONGODB_BACKEND=memoria la API corre sin servidor de
+MongoDB (desarrollo local, pruebas de carga, suite de pruebas).
+
+- Documentos en `ColeccionMemoria.data` (str(_id) -> documento). Las
+  lecturas devuelven copias, como si vinieran de BSON.
+- Índices declarados con create_indexes: cada uno mantiene un hash por
+  valor del primer campo (igualdad, $in) y una lista ordenada (rangos y
+  regex con prefijo anclado). Campos con arreglos se indexan por elemento
+  (multikey). `unique` se respeta (DuplicateKeyError) sobre todos los campos.
+- Filtros: igualdad, $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte/$exists/$regex/
+  $not/$all/$size, $and/$or/$nor y rutas con punto. Un filtro se resuelve
+  con el índice más selectivo (o por _id) y el resto se evalúa documento a
+  documento.
+- Actualizaciones: $set, $unset, $inc, $min, $max, $addToSet, $push, $pull,
+  $setOnInsert y reemplazos; upsert en update_*, find_one_and_update y
+  bulk_write.
+- Agregación: $match, $project, $addFields/$set, $unset, $sort, $skip,
+  $limit, $group, $facet, $unionWith, $count y $unwind, con un subconjunto
+  de expresiones (ver _OPERADORES).
+- Change streams: watch() recibe insert/update/replace/delete de la
+  colección en el mismo proceso y admite resume_after.
+
+No implementa transacciones, colaciones ni la expiración de índices TTL.
+Un operador no soportado lanza NotImplementedError en vez de ignorarse.
+"""
+import asyncio
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId, json_util
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult,
+)
+
+_FALTA = object()   # valor de un campo inexistente
+
+# --- Orden y comparación (orden de tipos de BSON) ---
+def clave_orden(valor: Any) -> tuple:
+    """Clave comparable y hashable; iguala int/float y fechas con o sin zona (UTC)."""
+    if valor is None or valor is _FALTA:
+        return (1, 0)
+    if isinstance(valor, bool):
+        return (8, valor)
+    if isinstance(valor, (int, float)):
+        return (2, valor)
+    if isinstance(valor, str):
+        return (3, valor)
+    if isinstance(valor, dict):
+        return (4, tuple((k, clave_orden(v)) for k, v in valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return (5, tuple(clave_orden(v) for v in valor))
+    if isinstance(valor, bytes):
+        return (6, valor)
+    if isinstance(valor, ObjectId):
+        return (7, valor.binary)
+    if isinstance(valor, datetime):
+        if valor.tzinfo is None:
+            valor = valor.replace(tzinfo=timezone.utc)
+        return (9, valor.timestamp())
+    return (10, str(valor))
+
+def _copiar(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        return {k: _copiar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_copiar(v) for v in valor]
+    return valor
+
+def _obtener(doc: Any, ruta: str) -> Any:
+    """Valor en una ruta con punto, sin expandir arreglos (expresiones, orden)."""
+    for parte in ruta.split("."):
+        if isinstance(doc, dict) and parte in doc:
+            doc = doc[parte]
+        elif isinstance(doc, list) and parte.isdigit() and int(parte) < len(doc):
+            doc = doc[int(parte)]
+        else:
+            return _FALTA
+    return doc
+
+def _valores(doc: Any, ruta: str) -> List[Any]:
+    """Valores candidatos de una ruta para un filtro: expande arreglos (multikey)."""
+    actuales = [doc]
+    for parte in ruta.split("."):
+        siguientes = []
+        for actual in actuales:
+            if isinstance(actual, dict):
+                if parte in actual:
+                    siguientes.append(actual[parte])
+            elif isinstance(actual, list):
+                if parte.isdigit() and int(parte) < len(actual):
+                    siguientes.append(actual[int(parte)])
+                siguientes.extend(e[parte] for e in actual if isinstance(e, dict) and parte in e)
+        actuales = siguientes
+    resultado = []
+    for valor in actuales:
+        resultado.append(valor)
+        if isinstance(valor, list):
+            resultado.extend(valor)
+    return resultado
+
+# --- Filtros ---
+_OPCIONES_REGEX = {"i": re.I, "m": re.M, "s": re.S, "x": re.X}
+
+def _regex(patron: Any, opciones: str = "") -> re.Pattern:
+    if isinstance(patron, re.Pattern):
+        return patron
+    banderas = 0
+    for o in opciones:
+        banderas |= _OPCIONES_REGEX.get(o, 0)
+    return re.compile(patron, banderas)
+
+def _es_operador(cond: Any) -> bool:
+    return isinstance(cond, dict) and bool(cond) and all(k.startswith("$") for k in cond)
+
+def _igual(valores: List[Any], esperado: Any) -> bool:
+    if esperado is None and not valores:
+        return True
+    objetivo = clave_orden(esperado)
+    return any(clave_orden(v) == objetivo for v in valores)
+
+def _condicion(valores: List[Any], cond: Any) -> bool:
+    if isinstance(cond, re.Pattern):
+        return any(isinstance(v, str) and cond.search(v) for v in valores)
+    if not _es_operador(cond):
+        return _igual(valores, cond)
+
+    for op, arg in cond.items():
+        if op == "$eq":
+            ok = _igual(valores, arg)
+        elif op == "$ne":
+            ok = not _igual(valores, arg)
+        elif op == "$in":
+            ok = any(_condicion(valores, a) if isinstance(a, re.Pattern) else _igual(valores, a) for a in arg)
+        elif op == "$nin":
+            ok = not any(_igual(valores, a) for a in arg)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            objetivo = clave_orden(arg)
+            ok = any(_comparar(clave_orden(v), objetivo, op) for v in valores)
+        elif op == "$exists":
+            ok = bool(valores) == bool(arg)
+        elif op == "$regex":
+            patron = _regex(arg, cond.get("$options", ""))
+            ok = any(isinstance(v, str) and patron.search(v) for v in valores)
+        elif op == "$options":
+            continue
+        elif op == "$not":
+            ok = not _condicion(valores, arg)
+        elif op == "$all":
+            ok = all(_igual(valores, a) for a in arg)
+        elif op == "$size":
+            ok = any(isinstance(v, list) and len(v) == arg for v in valores)
+        else:
+            raise NotImplementedError(f"Operador de consulta no soportado en memoria: {op}")
+        if not ok:
+            return False
+    return True
+
+def _comparar(a: tuple, b: tuple, op: str) -> bool:
+    if a[0] != b[0]:   # MongoDB solo compara dentro del mismo tipo
+        return False
+    if op == "$gt":
+        return a > b
+    if op == "$gte":
+        return a >= b
+    if op == "$lt":
+        return a < b
+    return a <= b
+
+def coincide(doc: dict, filtro: Optional[dict]) -> bool:
+    for campo, cond in (filtro or {}).items():
+        if campo == "$and":
+            if not all(coincide(doc, f) for f in cond):
+                return False
+        elif campo == "$or":
+            if not any(coincide(doc, f) for f in cond):
+                return False
+        elif campo == "$nor":
+            if any(coincide(doc, f) for f in cond):
+                return False
+        elif campo.startswith("$"):
+            raise NotImplementedError(f"Operador de consulta no soportado en memoria: {campo}")
+        elif not _condicion(_valores(doc, campo), cond):
+            return False
+    return True
+
+# --- Proyección ---
+def proyectar(doc: dict, proyeccion: Optional[dict]) -> dict:
+    if not proyeccion:
+        return doc
+    incluir = [k for k, v in proyeccion.items() if v and k != "_id"]
+    if incluir:
+        salida = {}
+        for ruta in incluir:
+            valor = _obtener(doc, ruta)
+            if valor is not _FALTA:
+                _asignar(salida, ruta, valor)
+        if proyeccion.get("_id", 1) and "_id" in doc:
+            salida["_id"] = doc["_id"]
+        return salida
+    salida = dict(doc)
+    for ruta, v in proyeccion.items():
+        if not v:
+            _quitar(salida, ruta)
+    return salida
+
+# --- Actualizaciones ---
+def _asignar(doc: dict, ruta: str, valor: Any) -> None:
+    *padres, hoja = ruta.split(".")
+    for parte in padres:
+        doc = doc.setdefault(parte, {})
+    doc[hoja] = valor
+
+def _quitar(doc: dict, ruta: str) -> None:
+    *padres, hoja = ruta.split(".")
+    for parte in padres:
+        doc = doc.get(parte)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(hoja, None)
+
+def aplicar_actualizacion(doc: dict, actualizacion: dict, insertando: bool = False) -> dict:
+    """Devuelve un documento nuevo con la actualización aplicada."""
+    nuevo = _copiar(doc)
+    for op, campos in actualizacion.items():
+        if op == "$setOnInsert" and not insertando:
+            continue
+        for ruta, arg in campos.items():
+            if ruta == "_id" and op in ("$set", "$unset") and arg != doc.get("_id", arg):
+                raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'")
+            actual = _obtener(nuevo, ruta)
+            if op in ("$set", "$setOnInsert"):
+                _asignar(nuevo, ruta, _copiar(arg))
+            elif op == "$unset":
+                _quitar(nuevo, ruta)
+            elif op == "$inc":
+                _asignar(nuevo, ruta, (0 if actual is _FALTA else actual) + arg)
+            elif op in ("$min", "$max"):
+                if actual is _FALTA or (clave_orden(arg) < clave_orden(actual)) == (op == "$min"):
+                    _asignar(nuevo, ruta, arg)
+            elif op in ("$addToSet", "$push"):
+                lista = [] if actual is _FALTA else actual
+                valores = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                for v in valores:
+                    if op == "$push" or not _igual(lista, v):
+                        lista.append(_copiar(v))
+                _asignar(nuevo, ruta, lista)
+            elif op == "$pull":
+                if isinstance(actual, list):
+                    # {"campo": ...} filtra subdocumentos; un valor u operadores, elementos
+                    subfiltro = isinstance(arg, dict) and not _es_operador(arg)
+                    _asignar(nuevo, ruta, [
+                        v for v in actual
+                        if not (coincide(v, arg) if subfiltro else _condicion([v], arg))
+                    ])
+            else:
+                raise NotImplementedError(f"Operador de actualización no soportado en memoria: {op}")
+    return nuevo
+
+def _es_reemplazo(actualizacion: dict) -> bool:
+    return not any(k.startswith("$") for k in actualizacion)
+
+def _documento_upsert(filtro: dict) -> dict:
+    """Campos de igualdad del filtro, como MongoDB al insertar por upsert."""
+    doc: dict = {}
+    for campo, cond in filtro.items():
+        if campo == "$and":
+            for parte in cond:
+                doc.update(_documento_upsert(parte))
+        elif not campo.startswith("$"):
+            if _es_operador(cond):
+                if "$eq" in cond:
+                    _asignar(doc, campo, _copiar(cond["$eq"]))
+            elif not isinstance(cond, re.Pattern):
+                _asignar(doc, campo, _copiar(cond))
+    return doc
+
+# --- Índices ---
+_METACARACTERES = set(".^$*+?{}[]|()")
+
+def _prefijo_regex(patron: str) -> Optional[str]:
+    """Parte literal de un regex anclado (^abc...), o None si no empieza con ^."""
+    if not patron.startswith("^"):
+        return None
+    prefijo, i = [], 1
+    while i < len(patron):
+        c = patron[i]
+        if c == "\\" and i + 1 < len(patron) and not patron[i + 1].isalnum():
+            prefijo.append(patron[i + 1])
+            i += 2
+            continue
+        if c in _METACARACTERES or c == "\\":
+            break
+        prefijo.append(c)
+        i += 1
+    # Un cuantificador afecta al último caracter literal: no es parte del prefijo
+    if i < len(patron) and patron[i] in "*?{" and prefijo:
+        prefijo.pop()
+    return "".join(prefijo)
+
+class Indice:
+    def __init__(self, nombre: str, claves: List[Tuple[str, Any]], unico: bool = False,
+                 expira_segundos: Optional[int] = None):
+        self.nombre = nombre
+        self.claves = claves
+        self.campo = claves[0][0]
+        self.unico = unico
+        self.expira_segundos = expira_segundos
+        self.hash: Dict[tuple, Set[str]] = defaultdict(set)
+        self.ordenado: List[Tuple[tuple, str]] = []
+        self.unicos: Dict[tuple, str] = {}
+
+    def info(self) -> dict:
+        info: Dict[str, Any] = {"v": 2, "key": list(self.claves)}
+        if self.unico:
+            info["unique"] = True
+        if self.expira_segundos is not None:
+            info["expireAfterSeconds"] = self.expira_segundos
+        return info
+
+    def _claves_doc(self, doc: dict) -> Set[tuple]:
+        valores = _valores(doc, self.campo)
+        if not valores:
+            return {clave_orden(None)}
+        claves = set()
+        for v in valores:
+            if isinstance(v, list):
+                if not v:
+                    claves.add(clave_orden(None))
+                continue   # los elementos ya vienen expandidos
+            claves.add(clave_orden(v))
+        return claves
+
+    def clave_unica(self, doc: dict) -> tuple:
+        return tuple(clave_orden(_obtener(doc, campo)) for campo, _ in self.claves)
+
+    def verificar(self, _id: str, doc: dict) -> None:
+        if self.unico:
+            dueno = self.unicos.get(self.clave_unica(doc))
+            if dueno is not None and dueno != _id:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error index: {self.nombre}", 11000,
+                    {"code": 11000, "keyPattern": dict(self.claves)},
+                )
+
+    def agregar(self, _id: str, doc: dict) -> None:
+        for clave in self._claves_doc(doc):
+            self.hash[clave].add(_id)
+            insort(self.ordenado, (clave, _id))
+        if self.unico:
+            self.unicos[self.clave_unica(doc)] = _id
+
+    def quitar(self, _id: str, doc: dict) -> None:
+        for clave in self._claves_doc(doc):
+            ids = self.hash.get(clave)
+            if ids is not None:
+                ids.discard(_id)
+                if not ids:
+                    del self.hash[clave]
+            i = bisect_left(self.ordenado, (clave, _id))
+            if i < len(self.ordenado) and self.ordenado[i] == (clave, _id):
+                del self.ordenado[i]
+        if self.unico and self.unicos.get(self.clave_unica(doc)) == _id:
+            del self.unicos[self.clave_unica(doc)]
+
+    def _rango(self, desde: tuple, incluir_desde: bool, hasta: tuple, incluir_hasta: bool) -> Set[str]:
+        ids = set()
+        # Por posición: un slice copiaría toda la cola del índice en cada consulta
+        for j in range(bisect_left(self.ordenado, (desde,)), len(self.ordenado)):
+            clave, _id = self.ordenado[j]
+            if clave == desde and not incluir_desde:
+                continue
+            if clave > hasta or (clave == hasta and not incluir_hasta):
+                break
+            ids.add(_id)
+        return ids
+
+    def buscar(self, cond: Any) -> Optional[Set[str]]:
+        """Ids candidatos para la condición sobre el primer campo, o None si el índice no sirve."""
+        if isinstance(cond, re.Pattern):
+            cond = {"$regex": cond.pattern}
+        if not _es_operador(cond):
+            if isinstance(cond, (list, dict)):
+                return None
+            return set(self.hash.get(clave_orden(cond), ()))
+        if "$eq" in cond and not isinstance(cond["$eq"], (list, dict)):
+            return set(self.hash.get(clave_orden(cond["$eq"]), ()))
+        if "$in" in cond:
+            if any(isinstance(v, (list, dict, re.Pattern)) for v in cond["$in"]):
+                return None
+            ids: Set[str] = set()
+            for v in cond["$in"]:
+                ids |= self.hash.get(clave_orden(v), set())
+            return ids
+        if "$regex" in cond and not cond.get("$options"):
+            patron = cond["$regex"].pattern if isinstance(cond["$regex"], re.Pattern) else cond["$regex"]
+            prefijo = _prefijo_regex(patron)
+            if prefijo is None:
+                return None
+            return self._rango((3, prefijo), True, (3, prefijo + "\U0010ffff"), True)
+        limites = {op: clave_orden(v) for op, v in cond.items() if op in ("$gt", "$gte", "$lt", "$lte")}
+        if limites:
+            tipo = next(iter(limites.values()))[0]
+            desde, incluir_desde = (tipo,), True
+            hasta, incluir_hasta = (tipo + 1,), False
+            if "$gte" in limites:
+                desde = limites["$gte"]
+            if "$gt" in limites:
+                desde, incluir_desde = limites["$gt"], False
+            if "$lte" in limites:
+                hasta, incluir_hasta = limites["$lte"], True
+            if "$lt" in limites:
+                hasta = limites["$lt"]
+            return self._rango(desde, incluir_desde, hasta, incluir_hasta)
+        return None
+
+# --- Cursores ---
+def _ordenar(docs: List[dict], orden: List[Tuple[str, int]], limite: Optional[int] = None) -> List[dict]:
+    if not orden:
+        return docs
+    direcciones = {d for _, d in orden}
+    if len(direcciones) == 1:
+        clave = lambda d: tuple(clave_orden(_obtener(d, campo)) for campo, _ in orden)
+        descendente = direcciones.pop() == -1
+        if limite is not None and limite < len(docs):
+            return (heapq.nlargest if descendente else heapq.nsmallest)(limite, docs, key=clave)
+        return sorted(docs, key=clave, reverse=descendente)
+    # Direcciones mezcladas: ordenamientos estables de la última clave a la primera
+    for campo, direccion in reversed(orden):
+        docs = sorted(docs, key=lambda d: clave_orden(_obtener(d, campo)), reverse=direccion == -1)
+    return docs
+
+def _normalizar_orden(clave: Any, direccion: Any = None) -> List[Tuple[str, int]]:
+    if isinstance(clave, str):
+        return [(clave, direccion if direccion is not None else 1)]
+    return [(c, d) for c, d in (clave.items() if isinstance(clave, dict) else clave)]
+
+class _CursorBase:
+    def __init__(self):
+        self._resultados: Optional[List[dict]] = None
+        self._posicion = 0
+
+    def _materializar(self) -> List[dict]:
+        raise NotImplementedError
+
+    def batch_size(self, n: int) -> "_CursorBase":
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if self._resultados is None:
+            self._resultados = self._materializar()
+        if self._posicion >= len(self._resultados):
+            raise StopAsyncIteration
+        doc = self._resultados[self._posicion]
+        self._posicion += 1
+        return doc
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        docs = []
+        async for doc in self:
+            docs.append(doc)
+            if length and len(docs) >= length:
+                break
+        return docs
+
+    async def close(self) -> None:
+        self._resultados = []
+
+class CursorMemoria(_CursorBase):
+    def __init__(self, coleccion: "ColeccionMemoria", filtro: Optional[dict], proyeccion: Optional[dict]):
+        super().__init__()
+        self.coleccion = coleccion
+        self.filtro = filtro or {}
+        self.proyeccion = proyeccion
+        self._orden: List[Tuple[str, int]] = []
+        self._saltar = 0
+        self._limite: Optional[int] = None
+        self.estadisticas: dict = {}
+
+    def sort(self, clave, direccion=None) -> "CursorMemoria":
+        self._orden = _normalizar_orden(clave, direccion)
+        return self
+
+    def skip(self, n: int) -> "CursorMemoria":
+        self._saltar = n
+        return self
+
+    def limit(self, n: int) -> "CursorMemoria":
+        self._limite = n or None
+        return self
+
+    def _materializar(self) -> List[dict]:
+        docs, self.estadisticas = self.coleccion._buscar(self.filtro)
+        tope = None if self._limite is None else self._saltar + self._limite
+        docs = _ordenar(docs, self._orden, tope)
+        docs = docs[self._saltar:tope]
+        self.estadisticas["nReturned"] = len(docs)
+        return [proyectar(_copiar(d), self.proyeccion) for d in docs]
+
+    async def explain(self) -> dict:
+        self._materializar()
+        e = self.estadisticas
+        return {
+            "queryPlanner": {"winningPlan": {"stage": e["etapa"], "indexName": e.get("indice")}},
+            "executionStats": {
+                "nReturned": e["nReturned"],
+                "totalKeysExamined": e["claves_examinadas"],
+                "totalDocsExamined": e["docs_examinados"],
+            },
+        }
+
+class CursorAgregacion(_CursorBase):
+    def __init__(self, calcular: Callable[[], List[dict]]):
+        super().__init__()
+        self._calcular = calcular
+
+    def _materializar(self) -> List[dict]:
+        return self._calcular()
+
+# --- Change streams ---
+class FlujoCambios:
+    def __init__(self, coleccion: "ColeccionMemoria", pipeline: Optional[list],
+                 full_document: Optional[str], resume_after: Optional[dict]):
+        self.coleccion = coleccion
+        self.filtros = [etapa["$match"] for etapa in (pipeline or []) if "$match" in etapa]
+        self.completo = full_document in ("updateLookup", "whenAvailable", "required")
+        self.cola: asyncio.Queue = asyncio.Queue()
+        self.resume_token: Optional[dict] = resume_after
+        if resume_after is not None:
+            tokens = [e["_id"]["_data"] for e in coleccion._historial]
+            if resume_after.get("_data") not in tokens:
+                raise OperationFailure("Resume token no encontrado en el historial", 286)
+            for evento in list(coleccion._historial)[tokens.index(resume_after["_data"]) + 1:]:
+                self.cola.put_nowait(evento)
+        coleccion._flujos.add(self)
+
+    def recibir(self, evento: dict) -> None:
+        self.cola.put_nowait(evento)
+
+    async def __aenter__(self) -> "FlujoCambios":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        while True:
+            evento = _copiar(await self.cola.get())
+            self.resume_token = evento["_id"]
+            if all(coincide(evento, f) for f in self.filtros):
+                if not self.completo and evento["operationType"] == "update":
+                    evento.pop("fullDocument", None)
+                return evento
+
+    async def close(self) -> None:
+        self.coleccion._flujos.discard(self)
+
+# --- Colección ---
+class Documentos(dict):
+    """str(_id) -> documento; escribir o borrar una clave actualiza los índices (también desde las pruebas)."""
+
+    def __init__(self, coleccion: "ColeccionMemoria"):
+        super().__init__()
+        self._indices = coleccion.indices
+
+    def __setitem__(self, clave: str, doc: dict) -> None:
+        anterior = self.get(clave)
+        for indice in self._indices.values():
+            indice.verificar(clave, doc)
+        if anterior is not None:
+            for indice in self._indices.values():
+                indice.quitar(clave, anterior)
+        super().__setitem__(clave, doc)
+        for indice in self._indices.values():
+            indice.agregar(clave, doc)
+
+    def __delitem__(self, clave: str) -> None:
+        for indice in self._indices.values():
+            indice.quitar(clave, self[clave])
+        super().__delitem__(clave)
+
+class ColeccionMemoria:
+    TAMANO_HISTORIAL = 10_000   # eventos guardados para resume_after
+
+    def __init__(self, nombre: str = "", database: Optional["BaseMemoria"] = None):
+        self.name = nombre
+        self.database = database
+        self.indices: Dict[str, Indice] = {}
+        self.data = Documentos(self)   # str(_id) -> documento
+        self._flujos: Set[FlujoCambios] = set()
+        self._historial: deque = deque(maxlen=self.TAMANO_HISTORIAL)
+        self._secuencia = 0
+        self._con_historial = False
+
+    @property
+    def db(self) -> Optional["BaseMemoria"]:
+        return self.database
+
+    def with_options(self, **kwargs) -> "ColeccionMemoria":
+        return self   # preferencias de lectura y write concern no aplican en memoria
+
+    # Planificación
+    def _candidatos(self, filtro: dict) -> Tuple[Optional[Iterable[str]], dict]:
+        if "_id" in filtro:
+            cond = filtro["_id"]
+            if not _es_operador(cond) and not isinstance(cond, re.Pattern):
+                return [str(cond)], {"etapa": "IDHACK"}
+            if _es_operador(cond) and "$in" in cond:
+                return [str(v) for v in cond["$in"]], {"etapa": "IDHACK"}
+
+        mejor: Optional[Tuple[Set[str], str]] = None
+        for indice in self.indices.values():
+            if indice.campo not in filtro:
+                continue
+            ids = indice.buscar(filtro[indice.campo])
+            if ids is not None and (mejor is None or len(ids) < len(mejor[0])):
+                mejor = (ids, indice.nombre)
+        for parte in filtro.get("$and", []):
+            ids, plan = self._candidatos(parte)
+            if ids is not None:
+                ids = set(ids)
+                if mejor is None or len(ids) < len(mejor[0]):
+                    mejor = (ids, plan.get("indice", "_id_"))
+        if mejor is not None:
+            return mejor[0], {"etapa": "IXSCAN", "indice": mejor[1]}
+
+        if "$or" in filtro:
+            union: Set[str] = set()
+            for rama in filtro["$or"]:
+                ids, _ = self._candidatos(rama)
+                if ids is None:
+                    break
+                union |= set(ids)
+            else:
+                return union, {"etapa": "OR", "indice": "varios"}
+        return None, {"etapa": "COLLSCAN"}
+
+    def _buscar(self, filtro: dict) -> Tuple[List[dict], dict]:
+        """Documentos (sin copiar) que cumplen el filtro y estadísticas del plan."""
+        ids, plan = self._candidatos(filtro)
+        if ids is None:
+            candidatos = list(self.data.values())
+            plan["claves_examinadas"] = 0
+        else:
+            candidatos = [d for d in (self.data.get(i) for i in ids) if d is not None]
+            plan["claves_examinadas"] = len(candidatos)
+        plan["docs_examinados"] = len(candidatos)
+        return [d for d in candidatos if coincide(d, filtro)], plan
+
+    def _primero(self, filtro: Optional[dict], sort=None) -> Optional[dict]:
+        docs, _ = self._buscar(filtro or {})
+        if sort:
+            docs = _ordenar(docs, _normalizar_orden(sort), 1)
+        return docs[0] if docs else None
+
+    # Escrituras internas
+    def _guardar(self, doc: dict) -> None:
+        self.data[str(doc["_id"])] = doc
+
+    def _insertar(self, doc: dict) -> Any:
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()   # como PyMongo, el _id se agrega al documento recibido
+        if str(doc["_id"]) in self.data:
+            raise DuplicateKeyError("E11000 duplicate key error index: _id_", 11000,
+                                    {"code": 11000, "keyPattern": {"_id": 1}})
+        nuevo = _copiar(doc)
+        self._guardar(nuevo)
+        self._emitir("insert", nuevo)
+        return doc["_id"]
+
+    def _actualizar(self, doc: dict, actualizacion: dict) -> Tuple[dict, bool]:
+        if _es_reemplazo(actualizacion):
+            nuevo = {**_copiar(actualizacion), "_id": doc["_id"]}
+            tipo = "replace"
+        else:
+            nuevo = aplicar_actualizacion(doc, actualizacion)
+            tipo = "update"
+        if nuevo == doc:
+            return doc, False
+        self._guardar(nuevo)
+        self._emitir(tipo, nuevo, anterior=doc)
+        return nuevo, True
+
+    def _upsert(self, filtro: dict, actualizacion: dict) -> dict:
+        if _es_reemplazo(actualizacion):
+            nuevo = _copiar(actualizacion)
+            if "_id" in filtro and not _es_operador(filtro["_id"]):
+                nuevo.setdefault("_id", filtro["_id"])
+        else:
+            nuevo = aplicar_actualizacion(_documento_upsert(filtro), actualizacion, insertando=True)
+        self._insertar(nuevo)
+        return nuevo
+
+    def _borrar(self, doc: dict) -> None:
+        del self.data[str(doc["_id"])]
+        self._emitir("delete", doc)
+
+    def _emitir(self, tipo: str, doc: dict, anterior: Optional[dict] = None) -> None:
+        if not self._con_historial:
+            return
+        self._secuencia += 1
+        evento = {
+            "_id": {"_data": f"{self._secuencia:016x}"},
+            "operationType": tipo,
+            "ns": {"db": self.database.name if self.database else "", "coll": self.name},
+            "documentKey": {"_id": doc["_id"]},
+        }
+        if tipo != "delete":
+            evento["fullDocument"] = _copiar(doc)
+        if tipo == "update" and anterior is not None:
+            evento["updateDescription"] = {
+                "updatedFields": {k: _copiar(v) for k, v in doc.items() if anterior.get(k, _FALTA) != v},
+                "removedFields": [k for k in anterior if k not in doc],
+            }
+        self._historial.append(evento)
+        for flujo in list(self._flujos):
+            flujo.recibir(evento)
+
+    # Lecturas
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> CursorMemoria:
+        cursor = CursorMemoria(self, filter, projection)
+        if "sort" in kwargs:
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        if kwargs.get("skip"):
+            cursor.skip(kwargs["skip"])
+        return cursor
+
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None,
+                       sort=None, **kwargs) -> Optional[dict]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        doc = self._primero(filter, sort)
+        return proyectar(_copiar(doc), projection) if doc is not None else None
+
+    async def count_documents(self, filter: dict, limit: Optional[int] = None, skip: int = 0, **kwargs) -> int:
+        n = max(0, len(self._buscar(filter)[0]) - (skip or 0))
+        return min(n, limit) if limit else n
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self.data)
+
+    async def distinct(self, key: str, filter: Optional[dict] = None, **kwargs) -> list:
+        vistos: Dict[tuple, Any] = {}
+        for doc in self._buscar(filter or {})[0]:
+            for v in _valores(doc, key):
+                if not isinstance(v, list):
+                    vistos.setdefault(clave_orden(v), v)
+        return list(vistos.values())
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> CursorAgregacion:
+        def calcular():
+            etapas = list(pipeline)
+            if etapas and "$match" in etapas[0]:
+                docs = self._buscar(etapas.pop(0)["$match"])[0]
+            else:
+                docs = list(self.data.values())
+            return ejecutar_pipeline([_copiar(d) for d in docs], etapas, self.database)
+        return CursorAgregacion(calcular)
+
+    # Escrituras
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        return InsertOneResult(self._insertar(document), True)
+
+    async def insert_many(self, documents: Iterable[dict], ordered: bool = True, **kwargs) -> InsertManyResult:
+        documentos = list(documents)
+        errores = []
+        for i, doc in enumerate(documentos):
+            try:
+                self._insertar(doc)
+            except DuplicateKeyError as exc:
+                errores.append({"index": i, "code": 11000, "errmsg": str(exc), "op": doc})
+                if ordered:
+                    break
+        if errores:
+            raise BulkWriteError({
+                "writeErrors": errores, "writeConcernErrors": [],
+                "nInserted": len(documentos) - len(errores) if not ordered else errores[0]["index"],
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+            })
+        return InsertManyResult([d["_id"] for d in documentos], True)
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._actualizar_varios(filter, update, upsert, multi=False), True)
+
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._actualizar_varios(filter, update, upsert, multi=True), True)
+
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._actualizar_varios(filter, replacement, upsert, multi=False), True)
+
+    def _actualizar_varios(self, filtro: dict, actualizacion: dict, upsert: bool, multi: bool) -> dict:
+        docs = self._buscar(filtro)[0]
+        if not multi:
+            docs = docs[:1]
+        if not docs and upsert:
+            nuevo = self._upsert(filtro, actualizacion)
+            return {"n": 1, "nModified": 0, "upserted": nuevo["_id"], "ok": 1.0}
+        modificados = sum(self._actualizar(doc, actualizacion)[1] for doc in docs)
+        return {"n": len(docs), "nModified": modificados, "ok": 1.0}
+
+    async def find_one_and_update(self, filter: dict, update: dict, projection: Optional[dict] = None,
+                                  sort=None, upsert: bool = False, return_document: bool = False,
+                                  **kwargs) -> Optional[dict]:
+        doc = self._primero(filter, sort)
+        if doc is None:
+            if not upsert:
+                return None
+            nuevo = self._upsert(filter, update)
+            return proyectar(_copiar(nuevo), projection) if return_document else None
+        nuevo, _ = self._actualizar(doc, update)
+        return proyectar(_copiar(nuevo if return_document else doc), projection)
+
+    async def find_one_and_replace(self, filter: dict, replacement: dict, **kwargs) -> Optional[dict]:
+        return await self.find_one_and_update(filter, replacement, **kwargs)
+
+    async def find_one_and_delete(self, filter: dict, projection: Optional[dict] = None,
+                                  sort=None, **kwargs) -> Optional[dict]:
+        doc = self._primero(filter, sort)
+        if doc is not None:
+            self._borrar(doc)
+            return proyectar(_copiar(doc), projection)
+        return None
+
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        doc = self._primero(filter)
+        if doc is not None:
+            self._borrar(doc)
+        return DeleteResult({"n": int(doc is not None), "ok": 1.0}, True)
+
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        docs = self._buscar(filter)[0]
+        for doc in docs:
+            self._borrar(doc)
+        return DeleteResult({"n": len(docs), "ok": 1.0}, True)
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs) -> BulkWriteResult:
+        resultado = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0,
+                     "upserted": [], "writeErrors": [], "writeConcernErrors": []}
+        for i, op in enumerate(requests):
+            try:
+                if isinstance(op, InsertOne):
+                    self._insertar(op._doc)
+                    resultado["nInserted"] += 1
+                elif isinstance(op, (UpdateOne, UpdateMany, ReplaceOne)):
+                    parcial = self._actualizar_varios(op._filter, op._doc, bool(op._upsert),
+                                                      multi=isinstance(op, UpdateMany))
+                    if "upserted" in parcial:
+                        resultado["nUpserted"] += 1
+                        resultado["upserted"].append({"index": i, "_id": parcial["upserted"]})
+                    else:
+                        resultado["nMatched"] += parcial["n"]
+                        resultado["nModified"] += parcial["nModified"]
+                elif isinstance(op, (DeleteOne, DeleteMany)):
+                    docs = self._buscar(op._filter)[0]
+                    for doc in docs if isinstance(op, DeleteMany) else docs[:1]:
+                        self._borrar(doc)
+                        resultado["nRemoved"] += 1
+                else:
+                    raise NotImplementedError(f"Operación de bulk_write no soportada: {type(op).__name__}")
+            except DuplicateKeyError as exc:
+                resultado["writeErrors"].append({"index": i, "code": 11000, "errmsg": str(exc)})
+                if ordered:
+                    break
+        if resultado["writeErrors"]:
+            raise BulkWriteError(resultado)
+        return BulkWriteResult(resultado, True)
+
+    # Índices
+    async def create_indexes(self, indexes: List[Any], **kwargs) -> List[str]:
+        nombres = []
+        for modelo in indexes:
+            documento = modelo.document
+            claves = list(documento["key"].items())
+            nombre = documento.get("name") or "_".join(f"{c}_{d}" for c, d in claves)
+            if nombre not in self.indices:
+                indice = Indice(nombre, claves, bool(documento.get("unique")),
+                                documento.get("expireAfterSeconds"))
+                for _id, doc in self.data.items():
+                    indice.verificar(_id, doc)
+                    indice.agregar(_id, doc)
+                self.indices[nombre] = indice
+            nombres.append(nombre)
+        return nombres
+
+    async def create_index(self, keys, **kwargs) -> str:
+        from pymongo import IndexModel
+        return (await self.create_indexes([IndexModel(keys, **kwargs)]))[0]
+
+    async def index_information(self) -> dict:
+        return {"_id_": {"v": 2, "key": [("_id", 1)]}, **{n: i.info() for n, i in self.indices.items()}}
+
+    async def drop_indexes(self) -> None:
+        self.indices.clear()
+
+    async def drop(self) -> None:
+        self.data.clear()
+        self.indices.clear()
+
+    def watch(self, pipeline: Optional[list] = None, full_document: Optional[str] = None,
+              resume_after: Optional[dict] = None, **kwargs) -> FlujoCambios:
+        self._con_historial = True
+        return FlujoCambios(self, pipeline, full_document, resume_after)
+
+# --- Base de datos y cliente ---
+class BaseMemoria:
+    def __init__(self, nombre: str = "memoria", client: Optional["ClienteMemoria"] = None):
+        self.name = nombre
+        self.client = client
+        self.collections: Dict[str, ColeccionMemoria] = {}
+
+    def __getitem__(self, nombre: str) -> ColeccionMemoria:
+        if nombre not in self.collections:
+            self.collections[nombre] = ColeccionMemoria(nombre, self)
+        return self.collections[nombre]
+
+    def __getattr__(self, nombre: str) -> ColeccionMemoria:
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return self[nombre]
+
+    def get_collection(self, nombre: str, **kwargs) -> ColeccionMemoria:
+        return self[nombre]
+
+    async def list_collection_names(self, **kwargs) -> List[str]:
+        return sorted(self.collections)
+
+    async def drop_collection(self, nombre: str) -> None:
+        self.collections.pop(nombre if isinstance(nombre, str) else nombre.name, None)
+
+    async def command(self, comando, *args, **kwargs) -> dict:
+        nombre = comando if isinstance(comando, str) else next(iter(comando))
+        if nombre in ("ping", "hello", "isMaster", "buildInfo"):
+            return {"ok": 1.0}
+        raise NotImplementedError(f"Comando no soportado en memoria: {nombre}")
+
+    def cargar(self, colecciones: Dict[str, List[dict]]) -> None:
+        """Inserta documentos iniciales (p. ej. los de MONGODB_MEMORIA_SEMILLA)."""
+        for nombre, docs in colecciones.items():
+            for doc in docs:
+                self[nombre]._insertar(doc)
+
+class ClienteMemoria:
+    def __init__(self, semilla: Optional[str] = None, base_semilla: str = "memoria"):
+        self._bases: Dict[str, BaseMemoria] = {}
+        if semilla:
+            # JSON extendido de MongoDB: {"coleccion": [documentos]}
+            with open(semilla, encoding="utf-8") as f:
+                self[base_semilla].cargar(json_util.loads(f.read()))
+
+    def __getitem__(self, nombre: str) -> BaseMemoria:
+        if nombre not in self._bases:
+            self._bases[nombre] = BaseMemoria(nombre, self)
+        return self._bases[nombre]
+
+    def get_database(self, nombre: str, **kwargs) -> BaseMemoria:
+        return self[nombre]
+
+    @property
+    def admin(self) -> BaseMemoria:
+        return self["admin"]
+
+    def close(self) -> None:
+        pass
+
+# --- Agregación ---
+def _fecha_a_texto(fecha: Any, formato: str) -> Optional[str]:
+    if not isinstance(fecha, datetime):
+        return None
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc)
+    return fecha.strftime(formato.replace("%L", f"{fecha.microsecond // 1000:03d}"))
+
+def _verdadero(valor: Any) -> bool:
+    return valor not in (None, False, 0, _FALTA)
+
+def _args(arg: Any, doc: dict) -> List[Any]:
+    return [evaluar(a, doc) for a in (arg if isinstance(arg, list) else [arg])]
+
+def _cond(arg: Any, doc: dict) -> Any:
+    si, entonces, sino = (arg["if"], arg["then"], arg["else"]) if isinstance(arg, dict) else arg
+    return evaluar(entonces, doc) if _verdadero(evaluar(si, doc)) else evaluar(sino, doc)
+
+def _suma(valores: List[Any]) -> Any:
+    return sum(v for v in valores if isinstance(v, (int, float)) and not isinstance(v, bool))
+
+_OPERADORES: Dict[str, Callable[[Any, dict], Any]] = {
+    "$literal": lambda a, d: a,
+    "$ifNull": lambda a, d: next((v for v in _args(a, d)[:-1] if v not in (None, _FALTA)), _args(a, d)[-1]),
+    "$eq": lambda a, d: clave_orden(_args(a, d)[0]) == clave_orden(_args(a, d)[1]),
+    "$ne": lambda a, d: clave_orden(_args(a, d)[0]) != clave_orden(_args(a, d)[1]),
+    "$gt": lambda a, d: clave_orden(_args(a, d)[0]) > clave_orden(_args(a, d)[1]),
+    "$gte": lambda a, d: clave_orden(_args(a, d)[0]) >= clave_orden(_args(a, d)[1]),
+    "$lt": lambda a, d: clave_orden(_args(a, d)[0]) < clave_orden(_args(a, d)[1]),
+    "$lte": lambda a, d: clave_orden(_args(a, d)[0]) <= clave_orden(_args(a, d)[1]),
+    "$and": lambda a, d: all(_verdadero(v) for v in _args(a, d)),
+    "$or": lambda a, d: any(_verdadero(v) for v in _args(a, d)),
+    "$not": lambda a, d: not _verdadero(_args(a, d)[0]),
+    "$in": lambda a, d: _igual(_args(a, d)[1] or [], _args(a, d)[0]),
+    "$cond": _cond,
+    "$add": lambda a, d: _suma(_args(a, d)),
+    "$subtract": lambda a, d: _args(a, d)[0] - _args(a, d)[1],
+    "$multiply": lambda a, d: math.prod(_args(a, d)),
+    "$divide": lambda a, d: _args(a, d)[0] / _args(a, d)[1],
+    "$concat": lambda a, d: "".join(_args(a, d)),
+    "$toString": lambda a, d: None if (v := _args(a, d)[0]) in (None, _FALTA) else str(v),
+    "$size": lambda a, d: len(_args(a, d)[0]),
+    "$dateToString": lambda a, d: _fecha_a_texto(evaluar(a["date"], d), a["format"]),
+}
+
+def evaluar(expr: Any, doc: dict) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        if expr == "$$ROOT":
+            return doc
+        return _obtener(doc, expr[1:])
+    if isinstance(expr, dict):
+        if len(expr) == 1 and next(iter(expr)).startswith("$"):
+            op, arg = next(iter(expr.items()))
+            if op not in _OPERADORES:
+                raise NotImplementedError(f"Expresión no soportada en memoria: {op}")
+            return _OPERADORES[op](arg, doc)
+        return {k: _limpiar(evaluar(v, doc)) for k, v in expr.items()}
+    if isinstance(expr, list):
+        return [_limpiar(evaluar(v, doc)) for v in expr]
+    return expr
+
+def _limpiar(valor: Any) -> Any:
+    return None if valor is _FALTA else valor
+
+def _agrupar(docs: List[dict], spec: dict) -> List[dict]:
+    grupos: Dict[tuple, dict] = {}
+    acumulados: Dict[tuple, Dict[str, list]] = {}
+    for doc in docs:
+        clave_grupo = _limpiar(evaluar(spec["_id"], doc))
+        k = clave_orden(clave_grupo)
+        if k not in grupos:
+            grupos[k] = {"_id": clave_grupo}
+            acumulados[k] = defaultdict(list)
+        for campo, acc in spec.items():
+            if campo == "_id":
+                continue
+            (op, arg), = acc.items()
+            acumulados[k][campo].append(_limpiar(evaluar(arg, doc)) if op != "$count" else 1)
+    for k, grupo in grupos.items():
+        for campo, acc in spec.items():
+            if campo == "_id":
+                continue
+            op = next(iter(acc))
+            valores = acumulados[k][campo]
+            presentes = [v for v in valores if v is not None]
+            if op in ("$sum", "$count"):
+                grupo[campo] = _suma(valores)
+            elif op == "$avg":
+                numeros = [v for v in presentes if isinstance(v, (int, float))]
+                grupo[campo] = sum(numeros) / len(numeros) if numeros else None
+            elif op == "$min":
+                grupo[campo] = min(presentes, key=clave_orden) if presentes else None
+            elif op == "$max":
+                grupo[campo] = max(presentes, key=clave_orden) if presentes else None
+            elif op == "$first":
+                grupo[campo] = valores[0] if valores else None
+            elif op == "$last":
+                grupo[campo] = valores[-1] if valores else None
+            elif op == "$push":
+                grupo[campo] = valores
+            elif op == "$addToSet":
+                grupo[campo] = list({clave_orden(v): v for v in valores}.values())
+            else:
+                raise NotImplementedError(f"Acumulador no soportado en memoria: {op}")
+    return list(grupos.values())
+
+def _proyectar_etapa(doc: dict, spec: dict) -> dict:
+    if all(v in (0, False) for v in spec.values()):
+        return proyectar(doc, spec)
+    salida = {}
+    if spec.get("_id", 1) and "_id" in doc:
+        salida["_id"] = doc["_id"]
+    for campo, v in spec.items():
+        if campo == "_id" and isinstance(v, (int, bool)):
+            continue
+        if v is True or (isinstance(v, int) and not isinstance(v, bool) and v == 1):
+            valor = _obtener(doc, campo)
+            if valor is not _FALTA:
+                _asignar(salida, campo, valor)
+        elif v not in (0, False):
+            _asignar(salida, campo, _limpiar(evaluar(v, doc)))
+    return salida
+
+def ejecutar_pipeline(docs: List[dict], pipeline: List[dict], db: Optional[BaseMemoria]) -> List[dict]:
+    for etapa in pipeline:
+        (op, arg), = etapa.items()
+        if op == "$match":
+            docs = [d for d in docs if coincide(d, arg)]
+        elif op in ("$addFields", "$set"):
+            docs = [{**d, **{k: _limpiar(evaluar(v, d)) for k, v in arg.items()}} for d in docs]
+        elif op == "$unset":
+            campos = [arg] if isinstance(arg, str) else arg
+            docs = [proyectar(d, {c: 0 for c in campos}) for d in docs]
+        elif op == "$project":
+            docs = [_proyectar_etapa(d, arg) for d in docs]
+        elif op == "$sort":
+            docs = _ordenar(docs, list(arg.items()))
+        elif op == "$skip":
+            docs = docs[arg:]
+        elif op == "$limit":
+            docs = docs[:arg]
+        elif op == "$count":
+            docs = [{arg: len(docs)}] if docs else []
+        elif op == "$group":
+            docs = _agrupar(docs, arg)
+        elif op == "$facet":
+            docs = [{nombre: ejecutar_pipeline([_copiar(d) for d in docs], sub, db) for nombre, sub in arg.items()}]
+        elif op == "$unionWith":
+            nombre, sub = (arg, []) if isinstance(arg, str) else (arg["coll"], arg.get("pipeline", []))
+            otra = db[nombre] if db is not None else ColeccionMemoria()
+            docs = docs + ejecutar_pipeline([_copiar(d) for d in otra.data.values()], sub, db)
+        elif op == "$unwind":
+            ruta = (arg if isinstance(arg, str) else arg["path"])[1:]
+            desplegados = []
+            for d in docs:
+                valor = _obtener(d, ruta)
+                for elemento in valor if isinstance(valor, list) else ([] if valor is _FALTA else [valor]):
+                    nuevo = _copiar(d)
+                    _asignar(nuevo, ruta, elemento)
+                    desplegados.append(nuevo)
+            docs = desplegados
+        else:
+            raise NotImplementedError(f"Etapa de agregación no soportada en memoria: {op}")
+    return docs
@@ -0,0 +1,256 @@
+# core/metrics.py
+"""
+Métricas en formato de texto de Prometheus, sin dependencias externas.
+
+- MetricasMiddleware: latencia por ruta, peticiones en curso y códigos de estado.
+- ComandosMongoListener: cuenta y cronometra cada comando que Motor envía,
+  por colección y operación (se registra en el cliente en core/database.py).
+- PoolMongoListener: eventos CMAP del pool de conexiones (en uso, abiertas,
+  espera para obtener una conexión).
+
+Los listeners de pymongo se ejecutan en los hilos de Motor, por eso cada
+métrica protege sus valores con un lock.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from pymongo import monitoring
+
+BUCKETS_LATENCIA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (),
+                 funcion: Optional[Callable[[], float]] = None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.funcion = funcion   # si existe, el valor se lee al exponer
+        self._lock = threading.Lock()
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def _clave(self, etiquetas: dict) -> Tuple[str, ...]:
+        return tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+
+    def valor(self, **etiquetas) -> float:
+        return self._valores.get(self._clave(etiquetas), 0.0)
+
+    def _lineas(self) -> Iterable[str]:
+        if self.funcion is not None:
+            yield f"{self.nombre} {float(self.funcion())}"
+            return
+        with self._lock:
+            items = list(self._valores.items())
+        for clave, valor in items:
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}"
+
+    def exponer(self) -> str:
+        cabecera = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        return "\n".join(cabecera + list(self._lineas()))
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor: float = 1.0, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0.0) + valor
+
+class Medidor(_Metrica):
+    tipo = "gauge"
+
+    def set(self, valor: float, **etiquetas) -> None:
+        with self._lock:
+            self._valores[self._clave(etiquetas)] = valor
+
+    def inc(self, valor: float = 1.0, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0.0) + valor
+
+    def dec(self, valor: float = 1.0, **etiquetas) -> None:
+        self.inc(-valor, **etiquetas)
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # clave -> [conteos por bucket..., suma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, valor: float, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def conteo(self, **etiquetas) -> int:
+        serie = self._series.get(self._clave(etiquetas))
+        return serie[-1] if serie else 0
+
+    def _lineas(self) -> Iterable[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for clave, serie in items:
+            for limite, conteo in zip(self.buckets, serie):
+                le = _etiquetas(self.etiquetas, clave, f'le="{limite}"')
+                yield f"{self.nombre}_bucket{le} {conteo}"
+            infinito = _etiquetas(self.etiquetas, clave, 'le="+Inf"')
+            yield f"{self.nombre}_bucket{infinito} {serie[-1]}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {serie[-2]}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {serie[-1]}"
+
+class Registro:
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+
+    def _registrar(self, metrica: _Metrica) -> _Metrica:
+        # Idempotente: volver a declarar una métrica devuelve la existente
+        return self._metricas.setdefault(metrica.nombre, metrica)
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (),
+                 funcion: Optional[Callable[[], float]] = None) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas, funcion))
+
+    def medidor(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (),
+                funcion: Optional[Callable[[], float]] = None) -> Medidor:
+        return self._registrar(Medidor(nombre, ayuda, etiquetas, funcion))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (),
+                   buckets: Tuple[float, ...] = BUCKETS_LATENCIA) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def exponer(self) -> str:
+        return "\n".join(m.exponer() for m in self._metricas.values()) + "\n"
+
+registro = Registro()
+
+# --- HTTP ---
+http_peticiones = registro.contador(
+    "http_requests_total", "Peticiones HTTP atendidas", ("metodo", "ruta", "estado"))
+http_duracion = registro.histograma(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP", ("metodo", "ruta"))
+http_en_curso = registro.medidor(
+    "http_requests_in_flight", "Peticiones HTTP en curso")
+
+class MetricasMiddleware:
+    """Middleware ASGI puro: no envuelve el cuerpo de la respuesta (apto para streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estado = {"codigo": 500}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+            await send(mensaje)
+
+        http_en_curso.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            http_en_curso.dec()
+            # Se usa la plantilla de la ruta (/solicitudes/{solicitud_id}) para acotar etiquetas
+            ruta = getattr(scope.get("route"), "path", "sin_ruta")
+            http_peticiones.inc(metodo=scope["method"], ruta=ruta, estado=estado["codigo"])
+            http_duracion.observe(duracion, metodo=scope["method"], ruta=ruta)
+
+# --- MongoDB ---
+mongo_comandos = registro.contador(
+    "mongodb_commands_total", "Comandos enviados a MongoDB", ("coleccion", "operacion", "resultado"))
+mongo_duracion = registro.histograma(
+    "mongodb_command_duration_seconds", "Duración de los comandos de MongoDB", ("coleccion", "operacion"))
+
+class ComandosMongoListener(monitoring.CommandListener):
+    def __init__(self):
+        self._colecciones: Dict[Tuple[int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event) -> None:
+        comando = event.command
+        coleccion = comando.get(event.command_name)
+        if event.command_name == "getMore":
+            coleccion = comando.get("collection")
+        if not isinstance(coleccion, str):
+            coleccion = "-"
+        with self._lock:
+            self._colecciones[(event.request_id, event.operation_id)] = coleccion
+
+    def _terminar(self, event, resultado: str) -> None:
+        with self._lock:
+            coleccion = self._colecciones.pop((event.request_id, event.operation_id), "-")
+        operacion = event.command_name
+        mongo_comandos.inc(coleccion=coleccion, operacion=operacion, resultado=resultado)
+        mongo_duracion.observe(event.duration_micros / 1_000_000, coleccion=coleccion, operacion=operacion)
+
+    def succeeded(self, event) -> None:
+        self._terminar(event, "ok")
+
+    def failed(self, event) -> None:
+        self._terminar(event, "error")
+
+# --- Pool de conexiones (CMAP) ---
+pool_en_uso = registro.medidor(
+    "mongodb_pool_checked_out", "Conexiones de MongoDB prestadas en este momento")
+pool_abiertas = registro.medidor(
+    "mongodb_pool_connections", "Conexiones de MongoDB abiertas")
+pool_espera = registro.histograma(
+    "mongodb_pool_wait_seconds", "Espera para obtener una conexión del pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+pool_fallos = registro.contador(
+    "mongodb_pool_checkout_failures_total", "Préstamos de conexión fallidos", ("motivo",))
+
+class PoolMongoListener(monitoring.ConnectionPoolListener):
+    def pool_created(self, event) -> None: pass
+    def pool_ready(self, event) -> None: pass
+    def pool_cleared(self, event) -> None: pass
+    def pool_closed(self, event) -> None: pass
+    def connection_ready(self, event) -> None: pass
+    def connection_check_out_started(self, event) -> None: pass
+
+    def connection_created(self, event) -> None:
+        pool_abiertas.inc()
+
+    def connection_closed(self, event) -> None:
+        pool_abiertas.dec()
+
+    def connection_checked_out(self, event) -> None:
+        pool_en_uso.inc()
+        if getattr(event, "duration", None) is not None:
+            pool_espera.observe(event.duration)
+
+    def connection_checked_in(self, event) -> None:
+        pool_en_uso.dec()
+
+    def connection_check_out_failed(self, event) -> None:
+        pool_fallos.inc(motivo=event.reason)
+        if getattr(event, "duration", None) is not None:
+            pool_espera.observe(event.duration)
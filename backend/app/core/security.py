@@ -1,4 +1,112 @@
 # core/security.py
-from fastapi.security import HTTPBearer
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import Depends, HTTPException, Security
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.schemas.auth import Principal
 
 bearer_scheme = HTTPBearer(auto_error=False)
+
+# --- Caché LRU de tokens ya verificados, cada entrada vive hasta el exp del token ---
+class CacheTokens:
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._datos: "OrderedDict[bytes, Tuple[Principal, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def obtener(self, clave: bytes) -> Optional[Principal]:
+        entrada = self._datos.get(clave)
+        if entrada is None:
+            self.misses += 1
+            return None
+        principal, expira = entrada
+        if expira <= time.time():
+            del self._datos[clave]
+            self.misses += 1
+            return None
+        self._datos.move_to_end(clave)
+        self.hits += 1
+        return principal
+
+    def guardar(self, clave: bytes, principal: Principal, expira: float) -> None:
+        self._datos[clave] = (principal, expira)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def limpiar(self) -> None:
+        self._datos.clear()
+
+token_cache = CacheTokens(settings.TOKEN_CACHE_MAX)
+
+def _principal(payload: dict) -> Principal:
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Token no contiene user_id")
+    return Principal(
+        id=user_id,
+        correo=payload.get("correo"),
+        rol=payload.get("rol", "cliente"),
+    )
+
+def verificar_token(token: str) -> Principal:
+    """Decodifica el JWT una sola vez por sesión; las siguientes llamadas salen de la caché."""
+    clave = hashlib.sha256(token.encode()).digest()
+    principal = token_cache.obtener(clave)
+    if principal is not None:
+        return principal
+
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Token inválido")
+
+    if payload.get("uso"):
+        # Tokens de un solo uso (p. ej. ?token= de /solicitudes/eventos) no sirven como sesión
+        raise HTTPException(status_code=401, detail="Token inválido")
+    principal = _principal(payload)
+    # Sin exp el token no caduca: no se guarda para no servirlo indefinidamente
+    if "exp" in payload:
+        token_cache.guardar(clave, principal, float(payload["exp"]))
+    return principal
+
+# --- Token corto para EventSource (no puede enviar la cabecera Authorization) ---
+USO_EVENTOS = "eventos"
+
+def crear_token_eventos(principal: Principal) -> str:
+    expira = time.time() + settings.EVENTOS_TOKEN_SEGUNDOS
+    return jwt.encode(
+        {"sub": principal.id, "correo": principal.correo, "rol": principal.rol,
+         "uso": USO_EVENTOS, "exp": int(expira)},
+        settings.SECRET_KEY, algorithm=settings.ALGORITHM,
+    )
+
+def verificar_token_eventos(token: str) -> Principal:
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Token inválido")
+    if payload.get("uso") != USO_EVENTOS:
+        raise HTTPException(status_code=401, detail="Token inválido")
+    return _principal(payload)
+
+# --- Dependencias compartidas por los routers ---
+async def obtener_principal(
+    credentials: HTTPAuthorizationCredentials = Security(bearer_scheme),
+) -> Principal:
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Falta Bearer token")
+    return verificar_token(credentials.credentials)
+
+async def obtener_usuario_id(principal: Principal = Depends(obtener_principal)) -> str:
+    return principal.id
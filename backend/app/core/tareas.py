@@ -0,0 +1,109 @@
+# core/tareas.py
+"""
+Tareas periódicas en el mismo proceso de la API.
+
+Cada ejecución primero toma un lease en `tareas_lease`; con varias réplicas
+solo la que tiene el lease vigente ejecuta la tarea. Cada corrida queda
+registrada en `tareas_ejecuciones` (conteos y duración).
+
+Con `duracion_lease=None` la tarea corre en todas las réplicas (por ejemplo
+refrescar cachés locales) y `registrar=False` omite el historial.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+async def adquirir_lease(db: AsyncIOMotorDatabase, nombre: str, dueno: str, duracion: float) -> bool:
+    """Toma (o renueva) el lease si está libre, vencido o ya es nuestro."""
+    ahora = datetime.now(timezone.utc)
+    try:
+        doc = await db["tareas_lease"].find_one_and_update(
+            {"_id": nombre, "$or": [{"expira": {"$lte": ahora}}, {"dueno": dueno}]},
+            {"$set": {"dueno": dueno, "expira": ahora + timedelta(seconds=duracion)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Otra réplica tiene el lease vigente: el upsert choca con su _id
+        return False
+    return doc is not None
+
+class TareaPeriodica:
+    def __init__(
+        self,
+        nombre: str,
+        funcion: Callable[[AsyncIOMotorDatabase], Awaitable[dict]],
+        intervalo: float,
+        duracion_lease: Optional[float],
+        registrar: bool = True,
+    ):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.intervalo = intervalo
+        self.duracion_lease = duracion_lease
+        self.registrar = registrar
+        self._tarea: Optional[asyncio.Task] = None
+
+        self.ejecuciones = 0
+        self.ultima_ejecucion: Optional[dict] = None
+
+    def iniciar(self, db: AsyncIOMotorDatabase) -> None:
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._bucle(db), name=self.nombre)
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    async def ejecutar_una_vez(self, db: AsyncIOMotorDatabase) -> Optional[dict]:
+        """Corre la tarea si esta réplica obtiene el lease; devuelve el registro de la corrida."""
+        if self.duracion_lease is not None and not await adquirir_lease(
+            db, self.nombre, REPLICA_ID, self.duracion_lease
+        ):
+            return None
+
+        inicio = datetime.now(timezone.utc)
+        t0 = time.perf_counter()
+        registro = {"tarea": self.nombre, "replica": REPLICA_ID, "inicio": inicio}
+        try:
+            registro.update(await self.funcion(db) or {})
+        except Exception as exc:
+            registro["error"] = str(exc)
+        registro["duracion_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+        self.ejecuciones += 1
+        self.ultima_ejecucion = registro
+        if not self.registrar:
+            logger.debug("Tarea %s ejecutada", self.nombre, extra={"ejecucion": registro})
+            return registro
+        logger.info("Tarea %s ejecutada", self.nombre, extra={"ejecucion": registro})
+        await db["tareas_ejecuciones"].insert_one(dict(registro))
+        return registro
+
+    async def _bucle(self, db: AsyncIOMotorDatabase) -> None:
+        while True:
+            try:
+                await self.ejecutar_una_vez(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Un fallo de red no debe matar el bucle: se reintenta en el próximo intervalo
+                logger.warning("Tarea %s falló: %s", self.nombre, exc)
+            await asyncio.sleep(self.intervalo)
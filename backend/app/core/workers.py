@@ -0,0 +1,82 @@
+# core/workers.py
+"""
+Pools acotados para trabajo de CPU que no debe correr en el event loop
+(por ejemplo bcrypt). Si la cola supera su límite se rechaza la tarea
+con PoolSaturado en lugar de acumular peticiones sin control.
+"""
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+class PoolSaturado(Exception):
+    """La cola del pool alcanzó su límite (backpressure)."""
+
+class PoolAcotado:
+    def __init__(self, nombre: str, tipo: str = "thread", workers: int = 4, max_cola: int = 256):
+        if tipo not in ("thread", "process"):
+            raise ValueError(f"Tipo de pool no soportado: {tipo}")
+        self.nombre = nombre
+        self.tipo = tipo
+        self.workers = workers
+        self.max_cola = max_cola
+        self._executor: Optional[Executor] = None
+
+        # Métricas
+        self.pendientes = 0          # enviadas al executor y sin terminar
+        self.max_pendientes = 0
+        self.completadas = 0
+        self.fallidas = 0            # terminaron con excepción
+        self.rechazadas = 0
+
+    @property
+    def en_cola(self) -> int:
+        """Tareas esperando un worker libre."""
+        return max(0, self.pendientes - self.workers)
+
+    def _obtener_executor(self) -> Executor:
+        # Se crea bajo demanda para no lanzar procesos/hilos al importar el módulo
+        if self._executor is None:
+            if self.tipo == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=self.nombre
+                )
+        return self._executor
+
+    async def ejecutar(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.en_cola >= self.max_cola:
+            self.rechazadas += 1
+            raise PoolSaturado(f"Pool '{self.nombre}' saturado ({self.pendientes} tareas pendientes)")
+
+        self.pendientes += 1
+        self.max_pendientes = max(self.max_pendientes, self.pendientes)
+        try:
+            loop = asyncio.get_running_loop()
+            resultado = await loop.run_in_executor(self._obtener_executor(), fn, *args)
+        except BaseException:
+            self.fallidas += 1
+            raise
+        finally:
+            self.pendientes -= 1
+        self.completadas += 1
+        return resultado
+
+    def estadisticas(self) -> dict:
+        return {
+            "nombre": self.nombre,
+            "tipo": self.tipo,
+            "workers": self.workers,
+            "max_cola": self.max_cola,
+            "pendientes": self.pendientes,
+            "en_cola": self.en_cola,
+            "max_pendientes": self.max_pendientes,
+            "completadas": self.completadas,
+            "fallidas": self.fallidas,
+            "rechazadas": self.rechazadas,
+        }
+
+    def cerrar(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,14 +1,32 @@
 # app/main.py
-from fastapi import FastAPI
+import logging
+
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi.responses import JSONResponse, PlainTextResponse
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
+from .core.calentamiento import calentar, preparacion
 from .core.config import settings
-from .core.database import get_client
+from .core.database import get_client, get_database
+from .core.indexes import asegurar_indices
+from .core.logs import configurar_logging
+from .core.metrics import MetricasMiddleware, registro
+from .core.security import token_cache
+from .core.tareas import TareaPeriodica
+from .core.workers import PoolSaturado
+from .services.auth import hash_pool, verify_password
+from .services.estadisticas import reconciliar
+from .services.eventos import difusor
+from .services.solicitudes_cdt import actualizar_solicitudes_vencidas
+from .services.tasas import registro_tasas
 from .api.auth import router as auth_router
 from .api.solicitudes_cdt import router as solicitudes_cdt_router
 from .api.solicitudes_cdt_agente import router as solicitudes_agente_router
 
+configurar_logging(settings.LOG_LEVEL, settings.LOG_LEVELS, settings.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="NeoCDT Bank API",
     version="1.0.0",
@@ -24,23 +42,122 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas (se agrega al final para quedar por fuera de CORS y medir la petición completa)
+app.add_middleware(MetricasMiddleware)
+registro.medidor("bcrypt_pool_pendientes", "Tareas de bcrypt enviadas y sin terminar",
+                 funcion=lambda: hash_pool.pendientes)
+registro.medidor("bcrypt_pool_en_cola", "Tareas de bcrypt esperando worker",
+                 funcion=lambda: hash_pool.en_cola)
+registro.contador("bcrypt_pool_rechazadas_total", "Tareas de bcrypt rechazadas por backpressure",
+                  funcion=lambda: hash_pool.rechazadas)
+registro.medidor("token_cache_entradas", "Tokens verificados en caché",
+                 funcion=lambda: len(token_cache))
+registro.contador("token_cache_aciertos_total", "Verificaciones de JWT resueltas desde la caché",
+                  funcion=lambda: token_cache.hits)
+registro.contador("token_cache_fallos_total", "Verificaciones de JWT que decodificaron el token",
+                  funcion=lambda: token_cache.misses)
+
 # Routers
 app.include_router(auth_router)
 app.include_router(solicitudes_cdt_router)
 app.include_router(solicitudes_agente_router)
 
+# Tareas periódicas
+async def _barrer_borradores_vencidos(db):
+    return await actualizar_solicitudes_vencidas(
+        db, lote=settings.BARRIDO_LOTE, max_lotes=settings.BARRIDO_MAX_LOTES
+    )
+
+barrido_vencidas = TareaPeriodica(
+    "barrido_borradores_vencidos",
+    _barrer_borradores_vencidos,
+    intervalo=settings.BARRIDO_INTERVALO_SEGUNDOS,
+    duracion_lease=settings.BARRIDO_LEASE_SEGUNDOS,
+)
+
+# Sin lease: cada réplica mantiene su propia copia compilada de la tabla
+refresco_tasas = TareaPeriodica(
+    "refresco_tabla_tasas",
+    registro_tasas.refrescar,
+    intervalo=settings.TASAS_REFRESCO_SEGUNDOS,
+    duracion_lease=None,
+    registrar=False,
+)
+
+reconciliacion_estadisticas = TareaPeriodica(
+    "reconciliacion_estadisticas",
+    reconciliar,
+    intervalo=settings.ESTADISTICAS_RECONCILIAR_SEGUNDOS,
+    duracion_lease=settings.ESTADISTICAS_LEASE_SEGUNDOS,
+)
+
+# Backpressure del pool de bcrypt
+@app.exception_handler(PoolSaturado)
+async def pool_saturado_handler(request: Request, exc: PoolSaturado):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servicio ocupado, intenta de nuevo"},
+        headers={"Retry-After": "1"},
+    )
+
 # Eventos
 @app.on_event("startup")
 async def startup_db_client():
     app.mongodb_client = await get_client()
-    print(f"✅ Conectado a MongoDB: {settings.MONGODB_DB_NAME}")
+    db = app.mongodb_client[settings.MONGODB_DB_NAME]
+    logger.info("Conectado a MongoDB: %s", settings.MONGODB_DB_NAME)
+
+    if settings.CALENTAMIENTO_HABILITADO:
+        await calentar(db, hash_pool, verify_password)
+        logger.info("Calentamiento en %s ms: %s", preparacion.duracion_ms, preparacion.pasos)
+    else:
+        preparacion.reiniciar()
+        preparacion.listo = preparacion.terminado = True
+
+    if settings.MONGODB_CREAR_INDICES:
+        try:
+            creados = await asegurar_indices(db)
+            logger.info("Índices creados: %s", ", ".join(creados) or "ninguno (al día)")
+        except Exception as exc:
+            # Sin permisos de createIndex o con índices en conflicto la API sigue arrancando
+            logger.warning("No se pudieron asegurar los índices: %s", exc)
+
+    try:
+        await registro_tasas.refrescar(db)
+    except Exception as exc:
+        logger.warning("No se pudo cargar la tabla de tasas, se usa la versión %s: %s",
+                       registro_tasas.tabla.version, exc)
+    refresco_tasas.iniciar(db)
+
+    if settings.BARRIDO_HABILITADO:
+        barrido_vencidas.iniciar(db)
+    if settings.ESTADISTICAS_RECONCILIAR_HABILITADO:
+        reconciliacion_estadisticas.iniciar(db)
+    if settings.EVENTOS_HABILITADO:
+        difusor.iniciar(db)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    preparacion.cerrar()
+    await barrido_vencidas.detener()
+    await refresco_tasas.detener()
+    await reconciliacion_estadisticas.detener()
+    await difusor.detener()
+    hash_pool.cerrar()
     client = getattr(app, "mongodb_client", None)
     if client:
         client.close()
-        print("🛑 Conexión a MongoDB cerrada")
+        logger.info("Conexión a MongoDB cerrada")
+
+@app.get("/ready", include_in_schema=False)
+async def ready(db: AsyncIOMotorDatabase = Depends(get_database)):
+    if not await preparacion.verificar(db):
+        return JSONResponse(status_code=503, content=preparacion.resumen())
+    return preparacion.resumen()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registro.exponer(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
@@ -1,5 +1,5 @@
 # schemas/auth.py
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from typing import Optional
 
 class LoginRequest(BaseModel):
@@ -27,3 +27,11 @@ class UsuarioPublico(BaseModel):
     correo: EmailStr
     telefono: Optional[str] = None
     activo: bool
+
+# --- Identidad autenticada extraída del JWT ---
+class Principal(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: str
+    correo: Optional[str] = None
+    rol: str = "cliente"
@@ -1,8 +1,11 @@
 # schemas/solicitudes_cdt.py
-from pydantic import BaseModel, Field, PositiveInt, condecimal
-from typing import Optional
+from pydantic import BaseModel, Field, PositiveInt, condecimal, conint, model_validator
+from typing import List, Optional, Tuple
 from datetime import datetime
 
+# Máximo de elementos por petición en los endpoints por lote
+MAX_ITEMS_LOTE = 500
+
 class SolicitudBase(BaseModel):
     monto: PositiveInt = Field(..., description="Monto a invertir en pesos colombianos")
     plazo_meses: PositiveInt = Field(..., description="Duración del CDT en meses")
@@ -14,6 +17,35 @@ class SolicitudUpdate(BaseModel):
     monto: Optional[PositiveInt] = None
     plazo_meses: Optional[PositiveInt] = None
 
+class SolicitudesLoteRequest(BaseModel):
+    solicitudes: List[SolicitudCreate] = Field(..., min_length=1, max_length=MAX_ITEMS_LOTE)
+
+class CotizacionRequest(BaseModel):
+    """
+    Filas a cotizar. Por defecto `montos[i]` va con `plazos_meses[i]`;
+    con `grilla=True` se cotiza el producto cartesiano montos × plazos.
+    """
+    montos: List[conint(ge=10_000)] = Field(..., min_length=1, max_length=100_000)
+    plazos_meses: List[PositiveInt] = Field(..., min_length=1, max_length=100_000)
+    grilla: bool = False
+
+    @model_validator(mode="after")
+    def validar_filas(self):
+        if self.grilla:
+            if len(self.montos) * len(self.plazos_meses) > 100_000:
+                raise ValueError("La grilla supera 100000 filas")
+        elif len(self.montos) != len(self.plazos_meses):
+            raise ValueError("montos y plazos_meses deben tener la misma longitud")
+        return self
+
+    def filas(self) -> Tuple[List[int], List[int]]:
+        if not self.grilla:
+            return self.montos, self.plazos_meses
+        return (
+            [m for m in self.montos for _ in self.plazos_meses],
+            self.plazos_meses * len(self.montos),
+        )
+
 class SolicitudDB(SolicitudBase):
     id: str
     usuario_id: str
@@ -1,6 +1,8 @@
 # schemas/solicitudes_cdt_agente.py
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
+
+from app.schemas.solicitudes_cdt import MAX_ITEMS_LOTE
 from datetime import datetime
 
 # --- Modelo base de solicitud vista por el agente ---
@@ -10,6 +12,7 @@ class SolicitudAgenteDB(BaseModel):
     monto: int
     plazo_meses: int
     tasa: float
+    tasa_version: Optional[int] = None   # None: creada antes de las tablas versionadas
     estado: str
     fechaCreacion: datetime
     fechaActualizacion: datetime
@@ -28,3 +31,19 @@ class SolicitudCambioEstado(BaseModel):
     estado_nuevo: str
     fechaActualizacion: datetime
     comentario: Optional[str] = None
+
+# --- Decisiones por lote ---
+class DecisionLote(BaseModel):
+    id: str
+    accion: Literal["aprobar", "rechazar"]
+    motivo: Optional[str] = Field(None, min_length=3, description="Obligatorio al rechazar")
+
+class DecisionesLoteRequest(BaseModel):
+    decisiones: List[DecisionLote] = Field(..., min_length=1, max_length=MAX_ITEMS_LOTE)
+
+class ResultadoDecision(BaseModel):
+    indice: int
+    id: str
+    estado: int                              # código HTTP que habría dado el endpoint individual
+    detalle: Optional[str] = None
+    resultado: Optional[SolicitudCambioEstado] = None
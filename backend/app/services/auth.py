@@ -8,9 +8,19 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 
 from app.core.config import settings
+from app.core.workers import PoolAcotado
+from app.services.identidades import buscar_por_correo, buscar_por_id
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt tarda ~100-300 ms por llamada: se ejecuta en un pool acotado
+hash_pool = PoolAcotado(
+    "bcrypt",
+    tipo=settings.HASH_POOL_TIPO,
+    workers=settings.HASH_POOL_WORKERS,
+    max_cola=settings.HASH_POOL_MAX_COLA,
+)
+
 def verify_password(plain: str, hashed: str) -> bool:
     # bcrypt ignora >72 bytes: útil cortar o validar antes si lo deseas
     return pwd_context.verify(plain, hashed)
@@ -18,6 +28,12 @@ def verify_password(plain: str, hashed: str) -> bool:
 def hash_password(plain: str) -> str:
     return pwd_context.hash(plain)
 
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await hash_pool.ejecutar(verify_password, plain, hashed)
+
+async def hash_password_async(plain: str) -> str:
+    return await hash_pool.ejecutar(hash_password, plain)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(tz=timezone.utc) + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -25,21 +41,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 async def find_user_by_correo(db: AsyncIOMotorDatabase, correo: str) -> Optional[dict]:
-    # Busca primero en 'usuarios'
-    user = await db["usuarios"].find_one({"correo": correo})
-    if user:
-        user["rol"] = "cliente"
-        user["tipo_coleccion"] = "usuarios"
-        return user
-
-    # Si no está en usuarios, busca en 'agentes'
-    agent = await db["agentes"].find_one({"correo": correo})
-    if agent:
-        agent["rol"] = agent.get("rol", "agente")
-        agent["tipo_coleccion"] = "agentes"
-        return agent
+    # usuarios y agentes en una sola consulta ($unionWith); usuarios tiene prioridad
+    return await buscar_por_correo(db, correo)
 
-    return None
+async def find_user_by_id(db: AsyncIOMotorDatabase, user_id: str) -> Optional[dict]:
+    return await buscar_por_id(db, user_id)
 
 def serialize_user(doc: dict) -> dict:
     return {
@@ -59,7 +65,7 @@ async def register_user(db: AsyncIOMotorDatabase, data: dict) -> dict:
     exists = await db["usuarios"].find_one({"correo": data["correo"]})
     if exists:
         raise ValueError("El correo ya está registrado")
-    hashed = hash_password(data["contraseña"])
+    hashed = await hash_password_async(data["contraseña"])
     doc = {
         "nombre": data["nombre"],
         "correo": data["correo"],
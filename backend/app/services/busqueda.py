@@ -0,0 +1,127 @@
+# services/busqueda.py
+"""
+Búsqueda de solicitudes por palabras (parámetro `q` de los listados).
+
+Cada solicitud guarda en `claves_busqueda` las palabras normalizadas
+(minúsculas, sin tildes) de razon_cancelacion y motivo_rechazo, el monto y
+su rango ("bajo", "medio", "alto"). Con un índice multikey sobre ese campo
+cada palabra de `q` se busca como prefijo anclado (^palabra), que MongoDB
+resuelve como un rango del índice.
+
+El estado no se copia al arreglo: las palabras que coinciden con algún
+estado (p. ej. "valid" -> en_validacion) se traducen aquí a un $in sobre
+`estado`, que ya tiene índice. Así una transición no tiene que reescribir
+las claves; solo agrega las del motivo con $addToSet.
+
+Cada palabra de `q` debe coincidir (AND) con el estado o con las claves.
+La entrada se tokeniza y se escapa: nunca llega a MongoDB como regex libre.
+
+Uso:
+    python -m app.services.busqueda      # recalcula las claves de las solicitudes sin ellas
+    python -m app.services.busqueda --todas
+"""
+import asyncio
+import re
+import sys
+import unicodedata
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.services.serializadores import ESTADOS_FRONTEND
+
+CAMPO = "claves_busqueda"
+CAMPOS_TEXTO = ("razon_cancelacion", "motivo_rechazo")
+
+MAX_PALABRAS = 8          # palabras de `q` que se consideran
+MAX_LARGO_PALABRA = 40
+
+# (límite superior exclusivo, etiqueta); el último rango no tiene tope
+RANGOS_MONTO = [(1_000_000, "bajo"), (10_000_000, "medio"), (None, "alto")]
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+
+def palabras(texto: Optional[str]) -> List[str]:
+    """Minúsculas, sin tildes, separadas por cualquier caracter no alfanumérico."""
+    if not texto:
+        return []
+    plano = unicodedata.normalize("NFKD", str(texto))
+    plano = "".join(c for c in plano if not unicodedata.combining(c)).lower()
+    return _PALABRA.findall(plano)
+
+def rango_monto(monto: int) -> str:
+    return next(etiqueta for tope, etiqueta in RANGOS_MONTO if tope is None or monto < tope)
+
+# --- Claves del documento ---
+def claves_texto(campos: dict) -> List[str]:
+    claves = []
+    for campo in CAMPOS_TEXTO:
+        claves.extend(palabras(campos.get(campo)))
+    return sorted(set(claves))
+
+def claves_busqueda(doc: dict) -> List[str]:
+    claves = set(claves_texto(doc))
+    if doc.get("monto") is not None:
+        claves.update((str(int(doc["monto"])), rango_monto(doc["monto"])))
+    return sorted(claves)
+
+# --- Filtro ---
+# palabra -> estado, con el nombre interno y el que muestra el frontend
+_VOCABULARIO_ESTADOS: Dict[str, set] = {}
+for _estado, _nombre in ESTADOS_FRONTEND.items():
+    for _p in palabras(_estado.replace("_", " ")) + palabras(_nombre):
+        _VOCABULARIO_ESTADOS.setdefault(_p, set()).add(_estado)
+
+def estados_con_prefijo(prefijo: str) -> List[str]:
+    estados = set()
+    for palabra, de_estado in _VOCABULARIO_ESTADOS.items():
+        if palabra.startswith(prefijo):
+            estados |= de_estado
+    return sorted(estados)
+
+def filtro_busqueda(q: str) -> Optional[dict]:
+    """Condición para `q`, o None si no tiene palabras buscables."""
+    condiciones = []
+    for palabra in palabras(q)[:MAX_PALABRAS]:
+        palabra = palabra[:MAX_LARGO_PALABRA]
+        por_claves = {CAMPO: {"$regex": "^" + re.escape(palabra)}}
+        estados = estados_con_prefijo(palabra)
+        condiciones.append({"$or": [{"estado": {"$in": estados}}, por_claves]} if estados else por_claves)
+    if not condiciones:
+        return None
+    return condiciones[0] if len(condiciones) == 1 else {"$and": condiciones}
+
+# --- Backfill ---
+async def reindexar(db: AsyncIOMotorDatabase, todas: bool = False, lote: int = 1000) -> int:
+    """Calcula `claves_busqueda` de solicitudes existentes; devuelve cuántas se escribieron."""
+    filtro = {} if todas else {CAMPO: {"$exists": False}}
+    proyeccion = {"monto": 1, **{c: 1 for c in CAMPOS_TEXTO}}
+    escritas = 0
+    pendientes: List[UpdateOne] = []
+    async for doc in db["solicitudes_cdt"].find(filtro, proyeccion).sort("_id", 1).batch_size(lote):
+        pendientes.append(UpdateOne({"_id": doc["_id"]}, {"$set": {CAMPO: claves_busqueda(doc)}}))
+        if len(pendientes) >= lote:
+            await db["solicitudes_cdt"].bulk_write(pendientes, ordered=False)
+            escritas += len(pendientes)
+            pendientes = []
+    if pendientes:
+        await db["solicitudes_cdt"].bulk_write(pendientes, ordered=False)
+        escritas += len(pendientes)
+    return escritas
+
+async def _main(argv: List[str]) -> int:
+    from app.core.config import settings
+    from app.core.database import get_client
+
+    client = await get_client()
+    db = client[settings.MONGODB_DB_NAME]
+    try:
+        escritas = await reindexar(db, todas="--todas" in argv)
+        print(f"✅ Claves de búsqueda actualizadas: {escritas}")
+    finally:
+        client.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,176 @@
+# services/estadisticas.py
+"""
+Estadísticas pre-agregadas de solicitudes para el tablero de agentes.
+
+La colección `estadisticas_solicitudes` guarda contadores que la capa de
+servicios incrementa con $inc en cada creación, transición, modificación y
+eliminación lógica:
+
+- "global": por_estado.<estado>, total, monto_total, suma_tasa, eliminadas
+- "mes:AAAA-MM" (mes de creación): solicitudes, monto_total, suma_tasa
+
+Leer el tablero es leer esos documentos. Los incrementos no son
+transaccionales con la escritura principal: `reconciliar` recalcula todo
+con una agregación y reemplaza los contadores (tarea periódica).
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COLECCION = "estadisticas_solicitudes"
+ID_GLOBAL = "global"
+PREFIJO_MES = "mes:"
+
+def id_mes(fecha: datetime) -> str:
+    return f"{PREFIJO_MES}{fecha:%Y-%m}"
+
+# --- Incrementos ---
+async def _incrementar(db: AsyncIOMotorDatabase, incrementos: Dict[str, Dict[str, float]]) -> None:
+    operaciones = [
+        UpdateOne({"_id": _id}, {"$inc": inc}, upsert=True)
+        for _id, inc in incrementos.items() if inc
+    ]
+    if not operaciones:
+        return
+    try:
+        await db[COLECCION].bulk_write(operaciones, ordered=False)
+    except Exception as exc:
+        # Las estadísticas nunca hacen fallar la operación principal; la reconciliación corrige
+        logger.warning("No se pudieron actualizar las estadísticas: %s", exc)
+
+async def registrar_creaciones(db: AsyncIOMotorDatabase, docs: Iterable[dict]) -> None:
+    incrementos: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for doc in docs:
+        g = incrementos[ID_GLOBAL]
+        g[f"por_estado.{doc['estado']}"] += 1
+        g["total"] += 1
+        g["monto_total"] += doc["monto"]
+        g["suma_tasa"] += doc["tasa"]
+        m = incrementos[id_mes(doc["fechaCreacion"])]
+        m["solicitudes"] += 1
+        m["monto_total"] += doc["monto"]
+        m["suma_tasa"] += doc["tasa"]
+    await _incrementar(db, {k: dict(v) for k, v in incrementos.items()})
+
+async def registrar_transicion(db: AsyncIOMotorDatabase, anterior: str, nuevo: str, cantidad: int = 1) -> None:
+    if cantidad and anterior != nuevo:
+        await _incrementar(db, {ID_GLOBAL: {f"por_estado.{anterior}": -cantidad, f"por_estado.{nuevo}": cantidad}})
+
+async def registrar_modificacion(db: AsyncIOMotorDatabase, antes: dict, despues: dict) -> None:
+    delta = {
+        "monto_total": despues["monto"] - antes["monto"],
+        "suma_tasa": despues["tasa"] - antes["tasa"],
+    }
+    delta = {k: v for k, v in delta.items() if v}
+    if delta:
+        await _incrementar(db, {ID_GLOBAL: delta, id_mes(antes["fechaCreacion"]): dict(delta)})
+
+async def registrar_eliminacion(db: AsyncIOMotorDatabase, cantidad: int = 1) -> None:
+    await _incrementar(db, {ID_GLOBAL: {"eliminadas": cantidad}})
+
+# --- Lectura del tablero ---
+def _promedio(suma: float, n: int):
+    return round(suma / n, 2) if n else None
+
+async def obtener_resumen(db: AsyncIOMotorDatabase, meses: int = 12) -> dict:
+    """Un documento global y, como mucho, `meses` documentos mensuales (por _id)."""
+    g = await db[COLECCION].find_one({"_id": ID_GLOBAL}) or {}
+    cursor = (
+        db[COLECCION]
+        .find({"_id": {"$gte": PREFIJO_MES, "$lt": "mes;"}})   # ";" sigue a ":" en ASCII
+        .sort("_id", -1)
+        .limit(meses)
+    )
+    por_mes = [{
+        "mes": doc["_id"][len(PREFIJO_MES):],
+        "solicitudes": int(doc.get("solicitudes", 0)),
+        "monto_total": doc.get("monto_total", 0),
+        "tasa_promedio": _promedio(doc.get("suma_tasa", 0), doc.get("solicitudes", 0)),
+    } async for doc in cursor]
+
+    total = int(g.get("total", 0))
+    return {
+        "por_estado": {k: int(v) for k, v in g.get("por_estado", {}).items() if v},
+        "total": total,
+        "eliminadas": int(g.get("eliminadas", 0)),
+        "monto_total": g.get("monto_total", 0),
+        "tasa_promedio": _promedio(g.get("suma_tasa", 0), total),
+        "por_mes": por_mes,
+        "reconciliado": g.get("reconciliado"),
+    }
+
+# --- Reconciliación ---
+PIPELINE_RECONCILIACION: List[dict] = [
+    {"$facet": {
+        "global": [{"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "monto_total": {"$sum": "$monto"},
+            "suma_tasa": {"$sum": "$tasa"},
+            "eliminadas": {"$sum": {"$cond": [{"$eq": ["$eliminada", True]}, 1, 0]}},
+        }}],
+        "por_estado": [{"$group": {"_id": "$estado", "n": {"$sum": 1}}}],
+        "por_mes": [{"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m", "date": "$fechaCreacion"}},
+            "solicitudes": {"$sum": 1},
+            "monto_total": {"$sum": "$monto"},
+            "suma_tasa": {"$sum": "$tasa"},
+        }}],
+    }},
+]
+
+async def reconciliar(db: AsyncIOMotorDatabase) -> dict:
+    """
+    Recalcula los contadores desde `solicitudes_cdt` y los reemplaza.
+    Un incremento que llegue entre la agregación y el reemplazo se pierde
+    hasta la siguiente corrida; la deriva queda acotada a un intervalo.
+    """
+    resultado = [doc async for doc in db["solicitudes_cdt"].aggregate(PIPELINE_RECONCILIACION, allowDiskUse=True)][0]
+    g = (resultado["global"] or [{}])[0]
+    ahora = datetime.now(timezone.utc)
+
+    anterior = await db[COLECCION].find_one({"_id": ID_GLOBAL}) or {}
+    nuevo_global = {
+        "_id": ID_GLOBAL,
+        "por_estado": {e["_id"]: e["n"] for e in resultado["por_estado"] if e["_id"]},
+        "total": g.get("total", 0),
+        "monto_total": g.get("monto_total", 0),
+        "suma_tasa": g.get("suma_tasa", 0),
+        "eliminadas": g.get("eliminadas", 0),
+        "reconciliado": ahora,
+    }
+    meses = {
+        f"{PREFIJO_MES}{m['_id']}": {
+            "_id": f"{PREFIJO_MES}{m['_id']}",
+            "solicitudes": m["solicitudes"],
+            "monto_total": m["monto_total"],
+            "suma_tasa": m["suma_tasa"],
+        }
+        for m in resultado["por_mes"] if m["_id"]
+    }
+    existentes = [d["_id"] async for d in db[COLECCION].find({"_id": {"$ne": ID_GLOBAL}}, {"_id": 1})]
+
+    operaciones = [ReplaceOne({"_id": ID_GLOBAL}, nuevo_global, upsert=True)]
+    operaciones += [ReplaceOne({"_id": _id}, doc, upsert=True) for _id, doc in meses.items()]
+    obsoletos = [_id for _id in existentes if _id not in meses]
+    await db[COLECCION].bulk_write(operaciones, ordered=False)
+    if obsoletos:
+        await db[COLECCION].delete_many({"_id": {"$in": obsoletos}})
+
+    deriva = {
+        "total": nuevo_global["total"] - int(anterior.get("total", 0)),
+        "por_estado": {
+            e: nuevo_global["por_estado"].get(e, 0) - int(anterior.get("por_estado", {}).get(e, 0))
+            for e in set(nuevo_global["por_estado"]) | set(anterior.get("por_estado", {}))
+            if nuevo_global["por_estado"].get(e, 0) != int(anterior.get("por_estado", {}).get(e, 0))
+        },
+    }
+    if deriva["total"] or deriva["por_estado"]:
+        logger.warning("Estadísticas reconciliadas con deriva: %s", deriva)
+    return {"meses": len(meses), "deriva": deriva}
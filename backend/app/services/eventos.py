@@ -0,0 +1,204 @@
+# services/eventos.py
+"""
+Cambios de solicitudes en tiempo real (Server-Sent Events).
+
+Un único change stream de MongoDB sobre `solicitudes_cdt` por proceso
+alimenta a todos los suscriptores conectados a esa réplica:
+
+- un cliente recibe solo sus solicitudes (filtro por usuario_id);
+- un agente o administrador recibe todas, con la forma de la cola.
+
+Cada suscriptor tiene una cola acotada. Si un consumidor lento la llena se
+le desconecta (no se acumulan eventos sin límite); al reconectar envía la
+cabecera Last-Event-ID y se le reenvía lo que siga en el búfer circular
+del difusor. Si ese id ya salió del búfer recibe un evento `reiniciar` y
+debe volver a pedir el listado una vez.
+
+El id de cada evento es el resume token del change stream, así que el
+difusor también reanuda el stream tras un corte de red sin perder cambios.
+Si el token ya salió del oplog (o el stream no es reanudable) se abre uno
+nuevo desde el presente: se vacía el búfer y los suscriptores reciben
+`reiniciar`, porque los cambios intermedios se perdieron.
+Los change streams requieren replica set o clúster; en un mongod
+standalone el difusor registra el error y reintenta con espera creciente.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Deque, Optional, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
+
+from app.core.config import settings
+from app.core.metrics import registro
+from app.services.serializadores import a_json, solicitud_agente, solicitud_normalizada
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_CAMBIOS = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+
+# ChangeStreamHistoryLost y ChangeStreamFatalError: reanudar con el mismo token no sirve
+CODIGOS_NO_REANUDABLES = {280, 286}
+
+eventos_emitidos = registro.contador(
+    "solicitudes_events_total", "Cambios de solicitudes recibidos del change stream"
+)
+suscriptores_desconectados = registro.contador(
+    "sse_subscribers_dropped_total", "Suscriptores desconectados por cola llena"
+)
+
+# --- Suscriptores ---
+class Suscriptor:
+    """Cola acotada de un cliente SSE. `usuario_id=None` recibe todo (agentes)."""
+
+    def __init__(self, usuario_id: Optional[str], tamano_cola: int):
+        self.usuario_id = usuario_id
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=tamano_cola)
+        self.desbordado = False
+
+    @property
+    def es_agente(self) -> bool:
+        return self.usuario_id is None
+
+    def acepta(self, evento: dict) -> bool:
+        return self.es_agente or evento["usuario_id"] == self.usuario_id
+
+    def entregar(self, mensaje: Tuple[str, dict]) -> bool:
+        try:
+            self.cola.put_nowait(mensaje)
+            return True
+        except asyncio.QueueFull:
+            self.desbordado = True
+            return False
+
+# --- Difusor ---
+class DifusorCambios:
+    def __init__(self, tamano_buffer: int = 0, tamano_cola: int = 0):
+        self.tamano_cola = tamano_cola or settings.EVENTOS_COLA_MAX
+        self.suscriptores: Set[Suscriptor] = set()
+        # (resume token, evento) de los últimos cambios, para reconexiones
+        self.buffer: Deque[Tuple[str, dict]] = deque(maxlen=tamano_buffer or settings.EVENTOS_BUFFER)
+        self.ultimo_token: Optional[dict] = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    # Ciclo de vida
+    def iniciar(self, db: AsyncIOMotorDatabase) -> None:
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._escuchar(db), name="difusor_cambios")
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    async def _escuchar(self, db: AsyncIOMotorDatabase) -> None:
+        espera = 1.0
+        while True:
+            try:
+                async with db["solicitudes_cdt"].watch(
+                    PIPELINE_CAMBIOS,
+                    full_document="updateLookup",
+                    resume_after=self.ultimo_token,
+                ) as stream:
+                    espera = 1.0
+                    async for cambio in stream:
+                        self.publicar(cambio)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                no_reanudable = isinstance(exc, OperationFailure) and exc.code in CODIGOS_NO_REANUDABLES
+                if no_reanudable and self.ultimo_token is not None:
+                    logger.warning("Change stream de solicitudes no reanudable: %s (se reinicia desde ahora)", exc)
+                    self.reiniciar()
+                    continue
+                espera = min(espera, settings.EVENTOS_REINTENTO_MAX_SEGUNDOS)
+                logger.warning("Change stream de solicitudes interrumpido: %s (reintento en %.0f s)", exc, espera)
+                await asyncio.sleep(espera)
+                espera *= 2
+
+    # Difusión
+    def publicar(self, cambio: dict) -> None:
+        """Convierte un documento del change stream en evento y lo reparte."""
+        self.ultimo_token = cambio["_id"]
+        doc = cambio.get("fullDocument")
+        if doc is None:   # borrado físico posterior al cambio: no hay nada que mostrar
+            return
+        evento = {
+            "usuario_id": str(doc["usuario_id"]),
+            "cliente": solicitud_normalizada(doc),
+            "agente": solicitud_agente(doc),
+        }
+        token = cambio["_id"]["_data"]
+        self.buffer.append((token, evento))
+        eventos_emitidos.inc()
+
+        for suscriptor in list(self.suscriptores):
+            if suscriptor.acepta(evento) and not suscriptor.entregar((token, evento)):
+                # Se corta la conexión; el cliente reanuda con Last-Event-ID
+                self.suscriptores.discard(suscriptor)
+                suscriptores_desconectados.inc()
+
+    def reiniciar(self) -> None:
+        """Olvida el token y el búfer; los suscriptores vuelven a pedir el listado."""
+        self.ultimo_token = None
+        self.buffer.clear()
+        for suscriptor in list(self.suscriptores):
+            if not suscriptor.entregar(("", {})):
+                self.suscriptores.discard(suscriptor)
+                suscriptores_desconectados.inc()
+
+    def suscribir(self, usuario_id: Optional[str], ultimo_id: Optional[str] = None) -> Suscriptor:
+        suscriptor = Suscriptor(usuario_id, self.tamano_cola)
+        if ultimo_id:
+            tokens = [token for token, _ in self.buffer]
+            if ultimo_id in tokens:
+                pendientes = list(self.buffer)[tokens.index(ultimo_id) + 1:]
+                for token, evento in pendientes:
+                    if suscriptor.acepta(evento) and not suscriptor.entregar((token, evento)):
+                        break
+            else:
+                suscriptor.entregar(("", {}))   # evento "reiniciar"
+        self.suscriptores.add(suscriptor)
+        return suscriptor
+
+    def desuscribir(self, suscriptor: Suscriptor) -> None:
+        self.suscriptores.discard(suscriptor)
+
+difusor = DifusorCambios()
+registro.medidor("sse_subscribers", "Conexiones SSE abiertas en esta réplica",
+                 funcion=lambda: len(difusor.suscriptores))
+
+# --- Formato SSE ---
+def mensaje_sse(token: str, evento: dict, agente: bool) -> bytes:
+    if not token:
+        return b"event: reiniciar\ndata: {}\n\n"
+    datos = a_json(evento["agente"] if agente else evento["cliente"])
+    return b"id: " + token.encode() + b"\nevent: solicitud\ndata: " + datos + b"\n\n"
+
+async def flujo_sse(
+    suscriptor: Suscriptor,
+    origen: DifusorCambios,
+    keepalive: float = 0,
+) -> AsyncIterator[bytes]:
+    """Generador para StreamingResponse; al cortarse la conexión se desuscribe."""
+    keepalive = keepalive or settings.EVENTOS_KEEPALIVE_SEGUNDOS
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                token, evento = await asyncio.wait_for(suscriptor.cola.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                if suscriptor.desbordado:
+                    return
+                yield b": keepalive\n\n"   # mantiene viva la conexión a través de proxies
+                continue
+            yield mensaje_sse(token, evento, suscriptor.es_agente)
+            if suscriptor.desbordado and suscriptor.cola.empty():
+                return
+    finally:
+        origen.desuscribir(suscriptor)
@@ -0,0 +1,99 @@
+# services/identidades.py
+"""
+Búsqueda de identidades (clientes y agentes) en una sola consulta.
+
+`usuarios` y `agentes` se resuelven con un $unionWith: se consulta primero
+`usuarios` y, en la misma agregación, `agentes`. Así un login de agente o un
+correo inexistente cuesta un único viaje a la base de datos. Si un correo
+está en las dos colecciones gana `usuarios` (campo `_prioridad`: $unionWith
+no garantiza el orden de salida).
+
+Migración de datos existentes:
+    python -m app.services.identidades
+"""
+import asyncio
+import sys
+from typing import List, Optional
+
+from bson import ObjectId, errors as bson_errors
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+def pipeline_identidad(filtro: dict, proyeccion: Optional[dict] = None) -> List[dict]:
+    """Agregación sobre `usuarios` que incorpora `agentes`; gana `usuarios`."""
+    pipeline = [
+        {"$match": filtro},
+        {"$addFields": {"rol": "cliente", "tipo_coleccion": "usuarios", "_prioridad": 0}},
+        {"$unionWith": {
+            "coll": "agentes",
+            "pipeline": [
+                {"$match": filtro},
+                {"$addFields": {"rol": {"$ifNull": ["$rol", "agente"]}, "tipo_coleccion": "agentes",
+                                "_prioridad": 1}},
+            ],
+        }},
+        {"$sort": {"_prioridad": 1}},
+        {"$limit": 1},
+        {"$unset": "_prioridad"},
+    ]
+    if proyeccion:
+        pipeline.append({"$project": proyeccion})
+    return pipeline
+
+async def buscar_identidad(db: AsyncIOMotorDatabase, filtro: dict, proyeccion: Optional[dict] = None) -> Optional[dict]:
+    async for doc in db["usuarios"].aggregate(pipeline_identidad(filtro, proyeccion)):
+        return doc
+    return None
+
+async def buscar_por_correo(db: AsyncIOMotorDatabase, correo: str) -> Optional[dict]:
+    return await buscar_identidad(db, {"correo": correo})
+
+async def buscar_por_id(db: AsyncIOMotorDatabase, user_id: str) -> Optional[dict]:
+    try:
+        obj_id = ObjectId(user_id)
+    except (bson_errors.InvalidId, TypeError):
+        return None
+    return await buscar_identidad(db, {"_id": obj_id}, {"contraseña": 0})
+
+# --- Migración / backfill ---
+async def migrar_identidades(db: AsyncIOMotorDatabase) -> dict:
+    """
+    Prepara los datos existentes para la búsqueda unificada:
+    - asegura los índices únicos de `correo` en ambas colecciones,
+    - completa `rol` en los agentes que no lo tienen,
+    - reporta correos presentes en las dos colecciones (se resuelven a favor de `usuarios`).
+    """
+    from app.core.indexes import asegurar_indices
+
+    creados = await asegurar_indices(db, ["usuarios", "agentes"])
+    res = await db["agentes"].update_many({"rol": None}, {"$set": {"rol": "agente"}})
+
+    # Los agentes son pocos: basta una consulta $in sobre usuarios
+    correos_agentes = [a["correo"] async for a in db["agentes"].find({}, {"correo": 1}) if a.get("correo")]
+    duplicados = sorted({
+        u["correo"] async for u in db["usuarios"].find({"correo": {"$in": correos_agentes}}, {"correo": 1})
+    })
+
+    return {
+        "indices_creados": creados,
+        "agentes_con_rol_completado": res.modified_count,
+        "correos_en_ambas_colecciones": duplicados,
+    }
+
+async def _main() -> int:
+    from app.core.config import settings
+    from app.core.database import get_client
+
+    client = await get_client()
+    try:
+        resumen = await migrar_identidades(client[settings.MONGODB_DB_NAME])
+    finally:
+        client.close()
+
+    print(f"✅ Índices creados: {', '.join(resumen['indices_creados']) or 'ninguno'}")
+    print(f"✅ Agentes con rol completado: {resumen['agentes_con_rol_completado']}")
+    for correo in resumen["correos_en_ambas_colecciones"]:
+        print(f"⚠️ Correo en usuarios y agentes (se usará usuarios): {correo}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,84 @@
+# services/serializadores.py
+"""
+Serializadores de solicitudes para las respuestas de la API.
+
+Las tablas se construyen una sola vez al importar el módulo. Los listados
+se escriben a bytes con `a_json` (orjson si está instalado, si no json de
+la librería estándar) y se devuelven desde la caché de respuestas
+(core/cache.py) como `Response`: FastAPI no vuelve a validar contra el
+response_model ni pasa por jsonable_encoder.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from bson import ObjectId
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+# --- Tablas ---
+ESTADOS_FRONTEND = {
+    "borrador": "Borrador",
+    "en_validacion": "En validación",
+    "aprobada": "Aprobada",
+    "rechazada": "Rechazada",
+    "cancelada": "Cancelada",
+}
+
+def fecha_iso(fecha: Any) -> Optional[str]:
+    if fecha is None:
+        return None
+    if isinstance(fecha, datetime):
+        return fecha.isoformat()
+    return str(fecha)
+
+# --- Cliente ---
+def solicitud_normalizada(doc: dict) -> dict:
+    """Solicitud con el estado capitalizado que espera el frontend."""
+    estado = doc.get("estado", "Desconocido")
+    return {
+        "id": str(doc["_id"]),
+        "usuario_id": str(doc["usuario_id"]),
+        "monto": int(doc.get("monto", 0)),
+        "plazo_meses": int(doc.get("plazo_meses", 0)),
+        "tasa": float(doc.get("tasa", 0.0)),
+        "tasa_version": doc.get("tasa_version"),
+        "estado": ESTADOS_FRONTEND.get(estado.lower(), estado),
+        "fechaCreacion": fecha_iso(doc.get("fechaCreacion")),
+        "fechaActualizacion": fecha_iso(doc.get("fechaActualizacion")),
+        "razon_cancelacion": doc.get("razon_cancelacion"),
+    }
+
+# --- Agente ---
+def solicitud_agente(doc: dict) -> dict:
+    """Mismos campos que SolicitudAgenteDB, sin pasar por Pydantic (documentos de la BD)."""
+    return {
+        "id": str(doc["_id"]),
+        "usuario_id": str(doc["usuario_id"]),
+        "monto": int(doc["monto"]),
+        "plazo_meses": int(doc["plazo_meses"]),
+        "tasa": float(doc["tasa"]),
+        "tasa_version": doc.get("tasa_version"),
+        "estado": doc["estado"],
+        "fechaCreacion": doc.get("fechaCreacion"),
+        "fechaActualizacion": doc.get("fechaActualizacion"),
+    }
+
+# --- Respuesta JSON ---
+def _por_defecto(valor: Any) -> Any:
+    if isinstance(valor, datetime):
+        # Igual que Pydantic/orjson con OPT_UTC_Z: UTC se escribe con "Z"
+        if valor.tzinfo is not None and valor.utcoffset() == timezone.utc.utcoffset(None):
+            return valor.replace(tzinfo=None).isoformat() + "Z"
+        return valor.isoformat()
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def a_json(contenido: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(contenido, default=_por_defecto, option=orjson.OPT_UTC_Z)
+    return json.dumps(contenido, default=_por_defecto, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -1,21 +1,114 @@
 # services/solicitudes_cdt.py
+import base64
+import json
+import logging
 from datetime import datetime, timedelta, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from bson import ObjectId
-from typing import List, Optional
+from bson import ObjectId, errors as bson_errors
+from typing import Iterator, List, Optional, Sequence
 from fastapi import HTTPException, status
+from pymongo.errors import BulkWriteError
 
+from app.core.cache import invalidar_solicitudes
 from app.schemas.solicitudes_cdt import SolicitudCreate, SolicitudUpdate
+from app.services.busqueda import claves_busqueda, filtro_busqueda
+from app.services.estadisticas import registrar_creaciones, registrar_modificacion, registrar_transicion
+from app.services.tasas import TablaTasas, registro_tasas
+from app.services.transiciones import cambios_transicion, filtro_transicion, transicionar
+
+logger = logging.getLogger(__name__)
 
 # --- Cálculo automático de tasa ---
+# La regla vive en la tabla de tasas activa (services/tasas.py), compilada en memoria
 def calcular_tasa(monto: int, plazo_meses: int) -> float:
-    tasa = 5 + (plazo_meses / 12) * 0.5 + (monto / 1_000_000) * 0.2
-    return round(min(tasa, 12), 2)  # máximo 12%
+    return registro_tasas.tabla.calcular(monto, plazo_meses)
+
+# --- Cotización por lotes ---
+MAX_FILAS_COTIZACION = 100_000
+
+def calcular_tasas(montos: Sequence[int], plazos_meses: Sequence[int]) -> List:
+    """calcular_tasa para muchas filas (vectorizada con NumPy si está disponible)."""
+    return registro_tasas.tabla.calcular_lote(montos, plazos_meses)
+
+def cotizar_ndjson(
+    montos: Sequence[int],
+    plazos_meses: Sequence[int],
+    lote: int = 10_000,
+    tabla: Optional[TablaTasas] = None,
+) -> Iterator[bytes]:
+    """
+    Genera la cotización como NDJSON, un bloque de bytes por lote de filas.
+    Todas las filas se calculan con la misma versión de tabla.
+    """
+    tabla = tabla or registro_tasas.tabla
+    for inicio in range(0, len(montos), lote):
+        m = montos[inicio:inicio + lote]
+        p = plazos_meses[inicio:inicio + lote]
+        tasas = tabla.calcular_lote(m, p)
+        yield "".join(
+            f'{{"monto":{mi},"plazo_meses":{pi},"tasa":{ti!r}}}\n' for mi, pi, ti in zip(m, p, tasas)
+        ).encode()
+
+# --- Filtros del listado (compartidos con la exportación) ---
+def filtro_listado(
+    usuario_id: Optional[ObjectId] = None,
+    estado: Optional[str] = None,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    monto_min: Optional[int] = None,
+    q: Optional[str] = None,
+) -> dict:
+    """Fechas ISO inválidas se ignoran, igual que en el listado original."""
+    filtro = {}
+    if usuario_id is not None:
+        filtro["usuario_id"] = usuario_id
+
+    if estado:
+        filtro["estado"] = estado.lower()
+
+    if desde:
+        try:
+            fecha_desde = datetime.fromisoformat(desde.replace("Z", "+00:00"))
+            filtro["fechaCreacion"] = {"$gte": fecha_desde}
+        except ValueError:
+            pass
+
+    if hasta:
+        try:
+            fecha_hasta = datetime.fromisoformat(hasta.replace("Z", "+00:00"))
+            if "fechaCreacion" in filtro:
+                filtro["fechaCreacion"]["$lte"] = fecha_hasta
+            else:
+                filtro["fechaCreacion"] = {"$lte": fecha_hasta}
+        except ValueError:
+            pass
+
+    if monto_min:
+        filtro["monto"] = {"$gte": monto_min}
+
+    if q:
+        # Palabras escapadas y ancladas (ver services/busqueda.py); sin palabras buscables no hay resultados
+        filtro["$and"] = [filtro_busqueda(q) or {"_id": {"$exists": False}}]
+    return filtro
 
 # --- Crear nueva solicitud ---
+def _nueva_solicitud(usuario_id: ObjectId, data: SolicitudCreate, tabla: TablaTasas, now: datetime) -> dict:
+    return {
+        "usuario_id": usuario_id,
+        "monto": data.monto,
+        "plazo_meses": data.plazo_meses,
+        "tasa": tabla.calcular(data.monto, data.plazo_meses),
+        "tasa_version": tabla.version,
+        "estado": "borrador",
+        "fechaCreacion": now,
+        "fechaActualizacion": now,
+        "eliminada": False,
+        "claves_busqueda": claves_busqueda({"monto": data.monto}),
+    }
+
 async def crear_solicitud(db: AsyncIOMotorDatabase, usuario_id: str, data: SolicitudCreate) -> dict:
-    print(f"Service: Creating solicitud for user {usuario_id}")
-    print(f"Service: Data received - monto: {data.monto}, plazo: {data.plazo_meses}")
+    logger.debug("Creando solicitud para usuario %s (monto=%s, plazo=%s)",
+                 usuario_id, data.monto, data.plazo_meses)
     
     if data.monto < 10_000:
         raise HTTPException(
@@ -23,29 +116,54 @@ async def crear_solicitud(db: AsyncIOMotorDatabase, usuario_id: str, data: Solic
             detail="Monto mínimo es 10000"
         )
 
-    tasa = calcular_tasa(data.monto, data.plazo_meses)
-    now = datetime.now(timezone.utc)
-    
-    doc = {
-        "usuario_id": ObjectId(usuario_id),
-        "monto": data.monto,
-        "plazo_meses": data.plazo_meses,
-        "tasa": tasa,
-        "estado": "borrador",
-        "fechaCreacion": now,
-        "fechaActualizacion": now,
-        "eliminada": False
-    }
-    
-    print(f"Service: Inserting document: {doc}")
-    
+    doc = _nueva_solicitud(ObjectId(usuario_id), data, registro_tasas.tabla, datetime.now(timezone.utc))
     res = await db["solicitudes_cdt"].insert_one(doc)
     doc["_id"] = res.inserted_id
+    await registrar_creaciones(db, [doc])
+    await invalidar_solicitudes([usuario_id])
     
-    print(f"Service: Created with ID: {res.inserted_id}")
+    logger.debug("Solicitud creada con ID %s", res.inserted_id)
     
     return doc
 
+# --- Crear varias solicitudes en un solo insert_many ---
+async def crear_solicitudes(db: AsyncIOMotorDatabase, usuario_id: str, items: List[SolicitudCreate]) -> List[dict]:
+    """
+    Mismas reglas que crear_solicitud, con un resultado por elemento:
+    {"indice", "estado": 201|400|500, "solicitud" o "detalle"}.
+    Los elementos inválidos no impiden crear los demás.
+    """
+    usuario = ObjectId(usuario_id)
+    tabla = registro_tasas.tabla
+    now = datetime.now(timezone.utc)
+
+    resultados: List[dict] = []
+    docs: List[dict] = []
+    for i, data in enumerate(items):
+        if data.monto < 10_000:
+            resultados.append({"indice": i, "estado": 400, "detalle": "Monto mínimo es 10000"})
+            continue
+        # _id asignado aquí: se conoce el id de cada elemento aunque el lote falle a medias
+        doc = {"_id": ObjectId(), **_nueva_solicitud(usuario, data, tabla, now)}
+        docs.append(doc)
+        resultados.append({"indice": i, "estado": 201, "solicitud": doc})
+
+    if docs:
+        try:
+            await db["solicitudes_cdt"].insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            fallidos = {docs[e["index"]]["_id"] for e in exc.details.get("writeErrors", [])}
+            for r in resultados:
+                if r["estado"] == 201 and r["solicitud"]["_id"] in fallidos:
+                    r.update(estado=500, detalle="No se pudo guardar la solicitud")
+                    del r["solicitud"]
+        await registrar_creaciones(db, [r["solicitud"] for r in resultados if r["estado"] == 201])
+        await invalidar_solicitudes([usuario_id])
+
+    logger.debug("Lote de %s solicitudes para usuario %s: %s creadas",
+                 len(items), usuario_id, sum(r["estado"] == 201 for r in resultados))
+    return resultados
+
 # --- Listar solicitudes ---
 async def listar_solicitudes(db: AsyncIOMotorDatabase, usuario_id: Optional[str] = None) -> List[dict]:
     filtro = {}
@@ -61,15 +179,15 @@ async def listar_solicitudes(db: AsyncIOMotorDatabase, usuario_id: Optional[str]
 
 # --- Actualizar solicitud ---
 async def actualizar_solicitud(db: AsyncIOMotorDatabase, solicitud_id: str, data: SolicitudUpdate) -> Optional[dict]:
-    print(f"Service: Updating solicitud {solicitud_id}")
+    logger.debug("Actualizando solicitud %s", solicitud_id)
     
     solicitud = await db["solicitudes_cdt"].find_one({"_id": ObjectId(solicitud_id)})
     if not solicitud:
-        print("Service: Solicitud not found")
+        logger.debug("Solicitud %s no encontrada", solicitud_id)
         return None
     
     if solicitud["estado"] != "borrador":
-        print(f"Service: Cannot update - estado is {solicitud['estado']}")
+        logger.debug("Solicitud %s no editable: estado %s", solicitud_id, solicitud["estado"])
         return None
 
     nuevos_campos = {k: v for k, v in data.model_dump().items() if v is not None}
@@ -81,60 +199,107 @@ async def actualizar_solicitud(db: AsyncIOMotorDatabase, solicitud_id: str, data
         # Recalcular tasa con los valores actualizados
         monto = nuevos_campos.get("monto", solicitud["monto"])
         plazo = nuevos_campos.get("plazo_meses", solicitud["plazo_meses"])
-        nuevos_campos["tasa"] = calcular_tasa(monto, plazo)
+        tabla = registro_tasas.tabla
+        nuevos_campos["tasa"] = tabla.calcular(monto, plazo)
+        nuevos_campos["tasa_version"] = tabla.version
         nuevos_campos["fechaActualizacion"] = datetime.now(timezone.utc)
+        if "monto" in nuevos_campos:
+            nuevos_campos["claves_busqueda"] = claves_busqueda({**solicitud, **nuevos_campos})
         
-        print(f"Service: Updating with fields: {nuevos_campos}")
+        logger.debug("Campos a actualizar en %s: %s", solicitud_id, nuevos_campos)
         
         await db["solicitudes_cdt"].update_one(
             {"_id": ObjectId(solicitud_id)},
             {"$set": nuevos_campos}
         )
         
+        antes = dict(solicitud)
         solicitud.update(nuevos_campos)
+        await registrar_modificacion(db, antes, solicitud)
+        await invalidar_solicitudes([solicitud["usuario_id"]])
     
     return solicitud
 
 # --- Cancelar solicitud ---
 async def cancelar_solicitud(db: AsyncIOMotorDatabase, solicitud_id: str, usuario_id: str) -> bool:
     filtro = {"_id": ObjectId(solicitud_id), "usuario_id": ObjectId(usuario_id)}
-    solicitud = await db["solicitudes_cdt"].find_one(filtro)
-    
-    if not solicitud or solicitud["estado"] not in ["borrador", "en_validacion"]:
-        return False
-    
-    await db["solicitudes_cdt"].update_one(
-        filtro,
-        {"$set": {"estado": "cancelada", "fechaActualizacion": datetime.now(timezone.utc)}}
-    )
-    return True
+    return await transicionar(db, filtro, "cancelada") is not None
 
 # --- Enviar manualmente a validación ---
 async def enviar_a_validacion(db: AsyncIOMotorDatabase, solicitud_id: str, usuario_id: str) -> Optional[dict]:
     filtro = {"_id": ObjectId(solicitud_id), "usuario_id": ObjectId(usuario_id)}
-    solicitud = await db["solicitudes_cdt"].find_one(filtro)
-    
-    if not solicitud or solicitud["estado"] != "borrador":
-        return None
-    
-    await db["solicitudes_cdt"].update_one(
-        filtro,
-        {"$set": {"estado": "en_validacion", "fechaActualizacion": datetime.now(timezone.utc)}}
-    )
-    
-    solicitud["estado"] = "en_validacion"
-    solicitud["fechaActualizacion"] = datetime.now(timezone.utc)
-    return solicitud
+    resultado = await transicionar(db, filtro, "en_validacion")
+    return resultado.solicitud if resultado else None
 
 # --- Cambio automático tras 24 horas ---
-async def actualizar_solicitudes_vencidas(db: AsyncIOMotorDatabase):
-    """Cambia automáticamente solicitudes en 'borrador' a 'en_validacion' después de 24h."""
+async def actualizar_solicitudes_vencidas(
+    db: AsyncIOMotorDatabase,
+    lote: int = 500,
+    max_lotes: Optional[int] = None,
+) -> dict:
+    """
+    Cambia automáticamente solicitudes en 'borrador' a 'en_validacion' después de 24h.
+    Trabaja por lotes de `lote` documentos para no bloquear la colección con un
+    update_many masivo; `max_lotes` acota el trabajo de una sola corrida.
+    """
     limite = datetime.now(timezone.utc) - timedelta(hours=24)
-    await db["solicitudes_cdt"].update_many(
-        {"estado": "borrador", "fechaCreacion": {"$lte": limite}, "eliminada": {"$ne": True}},
-        {"$set": {"estado": "en_validacion", "fechaActualizacion": datetime.now(timezone.utc)}}
+    filtro = filtro_transicion(
+        {"fechaCreacion": {"$lte": limite}, "eliminada": {"$ne": True}}, "en_validacion"
     )
 
+    procesadas = 0
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        docs = [
+            doc async for doc in
+            db["solicitudes_cdt"].find(filtro, {"_id": 1, "usuario_id": 1}).sort("fechaCreacion", 1).limit(lote)
+        ]
+        if not docs:
+            break
+        ids = [doc["_id"] for doc in docs]
+        # El filtro se repite para no pisar solicitudes que cambiaron entre ambas consultas
+        res = await db["solicitudes_cdt"].update_many(
+            {**filtro, "_id": {"$in": ids}},
+            {"$set": cambios_transicion("en_validacion")},
+        )
+        procesadas += res.modified_count
+        await registrar_transicion(db, "borrador", "en_validacion", res.modified_count)
+        if res.modified_count:
+            await invalidar_solicitudes(doc["usuario_id"] for doc in docs)
+        lotes += 1
+        if len(ids) < lote:
+            break
+
+    return {"procesadas": procesadas, "lotes": lotes}
+
+# --- Paginación por cursor (keyset sobre fechaCreacion, _id) ---
+ORDEN_LISTADO = [("fechaCreacion", -1), ("_id", -1)]
+
+def codificar_cursor(doc: dict) -> str:
+    """Cursor opaco que apunta al último documento entregado."""
+    crudo = json.dumps(
+        {"f": doc["fechaCreacion"].isoformat(), "id": str(doc["_id"])},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+def filtro_desde_cursor(cursor: str) -> dict:
+    """Traduce el cursor a la condición que continúa después de él en ORDEN_LISTADO."""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        fecha = datetime.fromisoformat(datos["f"])
+        ultimo_id = ObjectId(datos["id"])
+    except (ValueError, KeyError, TypeError, bson_errors.InvalidId):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    return {
+        "$or": [
+            {"fechaCreacion": {"$lt": fecha}},
+            {"fechaCreacion": fecha, "_id": {"$lt": ultimo_id}},
+        ]
+    }
+
 # --- Serializador ---
 def serialize_solicitud(doc: dict) -> dict:
     """Serializador básico sin transformación de estados"""
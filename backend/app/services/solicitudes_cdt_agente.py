@@ -1,70 +1,155 @@
 # services/solicitudes_cdt_agente.py
 from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from bson import ObjectId
-from typing import List, Optional
+from bson import ObjectId, errors as bson_errors
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, status
 
-from app.schemas.solicitudes_cdt_agente import RechazoRequest
+from app.core.config import settings
+from app.core.database import coleccion_lectura
+from app.schemas.solicitudes_cdt_agente import DecisionLote, RechazoRequest
+from app.services.serializadores import solicitud_agente
+from app.services.transiciones import transicionar_lote, transicionar_o_error
 
-# --- Listar todas las solicitudes pendientes de validación ---
-async def listar_pendientes(db: AsyncIOMotorDatabase) -> List[dict]:
-    cursor = db["solicitudes_cdt"].find({
-        "estado": {"$in": ["en_validacion", "aprobada", "rechazada"]}
-    })
-    solicitudes = []
-    async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        doc["usuario_id"] = str(doc["usuario_id"])
-        solicitudes.append(doc)
-    return solicitudes
+# --- Cola del agente ---
+ESTADOS_COLA = ["en_validacion", "aprobada", "rechazada"]
+
+# Solo los campos que expone SolicitudAgenteDB
+PROYECCION_AGENTE = {
+    "_id": 1, "usuario_id": 1, "monto": 1, "plazo_meses": 1, "tasa": 1, "tasa_version": 1,
+    "estado": 1, "fechaCreacion": 1, "fechaActualizacion": 1,
+}
+
+# Más antiguas primero; _id desempata para que la paginación sea estable
+ORDEN_COLA = [("fechaCreacion", 1), ("_id", 1)]
+
+# --- Listar solicitudes de la cola (paginado, más antiguas primero) ---
+async def listar_pendientes(
+    db: AsyncIOMotorDatabase,
+    page: int = 1,
+    limit: Optional[int] = 50,
+    estado: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+) -> Tuple[List[dict], bool]:
+    """Devuelve (solicitudes de la página, hay_mas). Con limit=None, toda la cola."""
+    if estado:
+        estado = estado.lower()
+        if estado not in ESTADOS_COLA:
+            raise HTTPException(status_code=400, detail=f"Estado '{estado}' no válido para la cola")
+        filtro = {"estado": estado}
+    else:
+        filtro = {"estado": {"$in": ESTADOS_COLA}}
+
+    rango = {}
+    if desde:
+        rango["$gte"] = desde
+    if hasta:
+        rango["$lte"] = hasta
+    if rango:
+        filtro["fechaCreacion"] = rango
+
+    # Lectura intensiva y tolerante a segundos de retraso: puede ir a secundarios
+    cursor = (
+        coleccion_lectura(db, "solicitudes_cdt", settings.MONGODB_LECTURA_AGENTE)
+        .find(filtro, PROYECCION_AGENTE)
+        .sort(ORDEN_COLA)
+    )
+    if limit is None:
+        return [solicitud_agente(doc) async for doc in cursor], False
+    cursor = cursor.skip((page - 1) * limit).limit(limit + 1)
+    solicitudes = [solicitud_agente(doc) async for doc in cursor]
+
+    hay_mas = len(solicitudes) > limit
+    return solicitudes[:limit], hay_mas
 
 # --- Aprobar una solicitud ---
 async def aprobar_solicitud(db: AsyncIOMotorDatabase, solicitud_id: str, agente_id: str) -> dict:
-    solicitud = await db["solicitudes_cdt"].find_one({"_id": ObjectId(solicitud_id)})
-    if not solicitud:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-    if solicitud["estado"] != "en_validacion":
-        raise HTTPException(status_code=400, detail="Solo se pueden aprobar solicitudes en validación")
-
-    nuevo_estado = "aprobada"
-    await db["solicitudes_cdt"].update_one(
-        {"_id": ObjectId(solicitud_id)},
-        {"$set": {
-            "estado": nuevo_estado,
-            "fechaActualizacion": datetime.now(timezone.utc)
-        }}
+    resultado = await transicionar_o_error(
+        db, {"_id": ObjectId(solicitud_id)}, "aprobada",
+        detalle="Solo se pueden aprobar solicitudes en validación",
     )
-
     return {
         "id": str(solicitud_id),
-        "estado_anterior": solicitud["estado"],
-        "estado_nuevo": nuevo_estado,
-        "fechaActualizacion": datetime.now(timezone.utc)
+        "estado_anterior": resultado.estado_anterior,
+        "estado_nuevo": resultado.solicitud["estado"],
+        "fechaActualizacion": resultado.solicitud["fechaActualizacion"],
     }
 
 # --- Rechazar una solicitud con motivo ---
 async def rechazar_solicitud(db: AsyncIOMotorDatabase, solicitud_id: str, agente_id: str, data: RechazoRequest) -> dict:
-    solicitud = await db["solicitudes_cdt"].find_one({"_id": ObjectId(solicitud_id)})
-    if not solicitud:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-    if solicitud["estado"] != "en_validacion":
-        raise HTTPException(status_code=400, detail="Solo se pueden rechazar solicitudes en validación")
-
-    nuevo_estado = "rechazada"
-    await db["solicitudes_cdt"].update_one(
-        {"_id": ObjectId(solicitud_id)},
-        {"$set": {
-            "estado": nuevo_estado,
-            "fechaActualizacion": datetime.now(timezone.utc),
-            "motivo_rechazo": data.motivo
-        }}
+    resultado = await transicionar_o_error(
+        db, {"_id": ObjectId(solicitud_id)}, "rechazada",
+        detalle="Solo se pueden rechazar solicitudes en validación",
+        campos={"motivo_rechazo": data.motivo},
     )
-
     return {
         "id": str(solicitud_id),
-        "estado_anterior": solicitud["estado"],
-        "estado_nuevo": nuevo_estado,
-        "fechaActualizacion": datetime.now(timezone.utc),
+        "estado_anterior": resultado.estado_anterior,
+        "estado_nuevo": resultado.solicitud["estado"],
+        "fechaActualizacion": resultado.solicitud["fechaActualizacion"],
         "comentario": data.motivo
     }
+
+# --- Aprobar / rechazar varias solicitudes en un solo bulk_write ---
+DECISIONES = {
+    "aprobar": ("aprobada", "Solo se pueden aprobar solicitudes en validación"),
+    "rechazar": ("rechazada", "Solo se pueden rechazar solicitudes en validación"),
+}
+
+async def decidir_lote(db: AsyncIOMotorDatabase, decisiones: List[DecisionLote], agente_id: str) -> List[dict]:
+    """
+    Mismas reglas que aprobar_solicitud / rechazar_solicitud, con un resultado por
+    elemento y el código HTTP que habría devuelto el endpoint individual.
+    """
+    resultados: List[Optional[dict]] = [None] * len(decisiones)
+    operaciones, indices, vistos = [], [], set()
+
+    for i, decision in enumerate(decisiones):
+        try:
+            obj_id = ObjectId(decision.id)
+        except (bson_errors.InvalidId, TypeError):
+            resultados[i] = {"indice": i, "id": decision.id, "estado": 400, "detalle": "ID de solicitud inválido"}
+            continue
+        if obj_id in vistos:
+            resultados[i] = {"indice": i, "id": decision.id, "estado": 400, "detalle": "Solicitud repetida en el lote"}
+            continue
+        if decision.accion == "rechazar" and not decision.motivo:
+            resultados[i] = {"indice": i, "id": decision.id, "estado": 400, "detalle": "El rechazo requiere un motivo"}
+            continue
+        vistos.add(obj_id)
+        destino, _ = DECISIONES[decision.accion]
+        campos = {"motivo_rechazo": decision.motivo} if decision.accion == "rechazar" else None
+        operaciones.append(({"_id": obj_id}, destino, campos))
+        indices.append(i)
+
+    aplicadas = await transicionar_lote(db, operaciones)
+
+    # Solo las que no aplicaron pagan una lectura (conjunta) para distinguir 404 de 400
+    fallidas = [filtro["_id"] for (filtro, _, _), r in zip(operaciones, aplicadas) if r is None]
+    existentes = set()
+    if fallidas:
+        existentes = {d["_id"] async for d in db["solicitudes_cdt"].find({"_id": {"$in": fallidas}}, {"_id": 1})}
+
+    for i, (filtro, _, _), resultado in zip(indices, operaciones, aplicadas):
+        decision = decisiones[i]
+        if resultado is None:
+            if filtro["_id"] in existentes:
+                resultados[i] = {"indice": i, "id": decision.id, "estado": 400,
+                                 "detalle": DECISIONES[decision.accion][1]}
+            else:
+                resultados[i] = {"indice": i, "id": decision.id, "estado": 404, "detalle": "Solicitud no encontrada"}
+            continue
+        resultados[i] = {
+            "indice": i,
+            "id": decision.id,
+            "estado": 200,
+            "resultado": {
+                "id": decision.id,
+                "estado_anterior": resultado.estado_anterior,
+                "estado_nuevo": resultado.solicitud["estado"],
+                "fechaActualizacion": resultado.solicitud["fechaActualizacion"],
+                "comentario": decision.motivo if decision.accion == "rechazar" else None,
+            },
+        }
+    return resultados
@@ -0,0 +1,203 @@
+# services/tasas.py
+"""
+Tablas de tasas versionadas.
+
+Cada versión se guarda en `tablas_tasas` y la activa se compila a una
+TablaTasas en memoria: por variable (plazo, monto) una lista ordenada de
+puntos de quiebre donde bisect ubica el tramo. Calcular una tasa no toca
+la base de datos; la tabla se refresca en segundo plano y se reemplaza
+completa (una sola asignación), así que cada cálculo usa una única versión.
+
+Formato de una versión:
+    {
+        "_id": 3, "activa": true, "descripcion": "...",
+        "base": 5, "tope": 12,
+        "plazo": {"unidad": 12, "tramos": [{"desde": 0, "factor": 0.5}]},
+        "monto": {"unidad": 1000000, "tramos": [{"desde": 0, "factor": 0.2}]}
+    }
+El aporte de una variable x en el tramo i es
+    acumulado_i + ((x - desde_i) / unidad) * factor_i
+La versión 0 (TABLA_INICIAL) reproduce la fórmula original.
+
+Uso:
+    python -m app.services.tasas                        # muestra la versión activa
+    python -m app.services.tasas --publicar tabla.json  # publica y activa una versión nueva
+"""
+import asyncio
+import json
+import logging
+import sys
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import List, Sequence
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy es opcional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+TABLA_INICIAL = {
+    "_id": 0,
+    "descripcion": "5% base, +0.5 por año de plazo, +0.2 por millón, tope 12%",
+    "base": 5,
+    "tope": 12,
+    "plazo": {"unidad": 12, "tramos": [{"desde": 0, "factor": 0.5}]},
+    "monto": {"unidad": 1_000_000, "tramos": [{"desde": 0, "factor": 0.2}]},
+}
+
+UMBRAL_VECTORIZADO = 256      # por debajo el bucle escalar es más rápido que NumPy
+_MAX_ENTERO_EXACTO = 2 ** 53  # hasta aquí int -> float64 no pierde precisión
+
+# --- Compilación ---
+class _Escala:
+    """Aporte lineal por tramos de una variable."""
+    __slots__ = ("unidad", "desdes", "factores", "acumulados")
+
+    def __init__(self, definicion: dict):
+        tramos = sorted(definicion["tramos"], key=lambda t: t["desde"])
+        if not tramos or tramos[0]["desde"] != 0:
+            raise ValueError("El primer tramo debe empezar en 0")
+        if definicion["unidad"] <= 0:
+            raise ValueError("La unidad debe ser positiva")
+        self.unidad = definicion["unidad"]
+        self.desdes = [t["desde"] for t in tramos]
+        self.factores = [t["factor"] for t in tramos]
+        # Aporte acumulado al inicio de cada tramo (continuo entre tramos)
+        self.acumulados = [0.0]
+        for i in range(1, len(tramos)):
+            ancho = self.desdes[i] - self.desdes[i - 1]
+            self.acumulados.append(self.acumulados[-1] + (ancho / self.unidad) * self.factores[i - 1])
+
+    def aporte(self, x) -> float:
+        i = bisect_right(self.desdes, x) - 1
+        return self.acumulados[i] + ((x - self.desdes[i]) / self.unidad) * self.factores[i]
+
+    def aporte_vector(self, x):
+        # Mismas operaciones y en el mismo orden que aporte(): resultados idénticos
+        desdes = np.asarray(self.desdes, dtype=np.float64)
+        i = np.searchsorted(desdes, x, side="right") - 1
+        acumulados = np.asarray(self.acumulados, dtype=np.float64)
+        factores = np.asarray(self.factores, dtype=np.float64)
+        return acumulados[i] + ((x - desdes[i]) / float(self.unidad)) * factores[i]
+
+class TablaTasas:
+    __slots__ = ("version", "base", "tope", "plazo", "monto")
+
+    def __init__(self, version: int, base, tope, plazo: _Escala, monto: _Escala):
+        self.version = version
+        self.base = base
+        self.tope = tope
+        self.plazo = plazo
+        self.monto = monto
+
+    @classmethod
+    def desde_documento(cls, doc: dict) -> "TablaTasas":
+        return cls(doc["_id"], doc["base"], doc["tope"], _Escala(doc["plazo"]), _Escala(doc["monto"]))
+
+    def calcular(self, monto: int, plazo_meses: int) -> float:
+        tasa = self.base + self.plazo.aporte(plazo_meses) + self.monto.aporte(monto)
+        return round(min(tasa, self.tope), 2)
+
+    def calcular_lote(self, montos: Sequence[int], plazos_meses: Sequence[int]) -> List:
+        """
+        calcular() para muchas filas. Con NumPy se evalúa vectorizada y cada
+        resultado coincide bit a bit con la versión escalar (incluido el tipo
+        del tope cuando se aplica).
+        """
+        if np is None or len(montos) < UMBRAL_VECTORIZADO:
+            return [self.calcular(m, p) for m, p in zip(montos, plazos_meses)]
+
+        m = np.asarray(montos, dtype=np.int64)
+        p = np.asarray(plazos_meses, dtype=np.int64)
+        if m.max(initial=0) > _MAX_ENTERO_EXACTO or p.max(initial=0) > _MAX_ENTERO_EXACTO:
+            return [self.calcular(mi, pi) for mi, pi in zip(montos, plazos_meses)]
+
+        tasa = (float(self.base) + self.plazo.aporte_vector(p.astype(np.float64))
+                + self.monto.aporte_vector(m.astype(np.float64)))
+        topadas = tasa > self.tope
+        tasa = np.minimum(tasa, float(self.tope))
+
+        # round(x, 2) de Python redondea el valor decimal exacto; rint(x * 100) / 100
+        # da lo mismo salvo cuando x * 100 queda pegado a ,5: esos casos van por round()
+        escalado = tasa * 100
+        resultado = (np.rint(escalado) / 100).tolist()
+        cerca_de_empate = np.abs(escalado - np.floor(escalado) - 0.5) < 1e-6
+        for i in np.flatnonzero(cerca_de_empate).tolist():
+            resultado[i] = round(float(tasa[i]), 2)
+        tope = round(self.tope, 2)   # min(tasa, tope) devuelve el tope tal cual (p. ej. el int 12)
+        for i in np.flatnonzero(topadas).tolist():
+            resultado[i] = tope
+        return resultado
+
+# --- Versión activa en memoria ---
+class RegistroTasas:
+    def __init__(self):
+        self.tabla = TablaTasas.desde_documento(TABLA_INICIAL)
+
+    async def refrescar(self, db: AsyncIOMotorDatabase) -> dict:
+        """Carga la versión activa si cambió; se llama al arrancar y periódicamente."""
+        actual = await db["tablas_tasas"].find_one({"activa": True}, {"_id": 1}, sort=[("_id", -1)])
+        if actual is None or actual["_id"] == self.tabla.version:
+            return {"version": self.tabla.version, "cambio": False}
+
+        doc = await db["tablas_tasas"].find_one({"_id": actual["_id"]})
+        if doc is None:
+            return {"version": self.tabla.version, "cambio": False}
+        anterior = self.tabla.version
+        self.tabla = TablaTasas.desde_documento(doc)   # se compila antes de reemplazar
+        logger.info("Tabla de tasas activa: versión %s (antes %s)", self.tabla.version, anterior)
+        return {"version": self.tabla.version, "cambio": True}
+
+registro_tasas = RegistroTasas()
+
+# --- Publicación de versiones ---
+async def publicar_tabla(db: AsyncIOMotorDatabase, definicion: dict, intentos: int = 5) -> int:
+    """Guarda una versión nueva como activa y desactiva las anteriores. Devuelve la versión."""
+    campos = {k: definicion[k] for k in ("base", "tope", "plazo", "monto")}
+    TablaTasas.desde_documento({"_id": -1, **campos})   # valida antes de guardar
+
+    for _ in range(intentos):
+        ultima = await db["tablas_tasas"].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        version = (ultima["_id"] if ultima else 0) + 1
+        try:
+            await db["tablas_tasas"].insert_one({
+                "_id": version,
+                "activa": True,
+                "descripcion": definicion.get("descripcion", ""),
+                "creada": datetime.now(timezone.utc),
+                **campos,
+            })
+        except DuplicateKeyError:
+            continue  # otra publicación tomó el mismo número
+        # La nueva ya está activa: el lector siempre encuentra una versión vigente
+        await db["tablas_tasas"].update_many(
+            {"activa": True, "_id": {"$ne": version}}, {"$set": {"activa": False}}
+        )
+        return version
+    raise RuntimeError("No se pudo asignar un número de versión a la tabla de tasas")
+
+async def _main(argv: List[str]) -> int:
+    from app.core.config import settings
+    from app.core.database import get_client
+
+    client = await get_client()
+    db = client[settings.MONGODB_DB_NAME]
+    try:
+        if len(argv) == 2 and argv[0] == "--publicar":
+            with open(argv[1], encoding="utf-8") as f:
+                version = await publicar_tabla(db, json.load(f))
+            print(f"✅ Tabla de tasas publicada: versión {version}")
+        else:
+            resultado = await registro_tasas.refrescar(db)
+            print(f"✅ Versión activa: {resultado['version']}")
+    finally:
+        client.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,133 @@
+# services/transiciones.py
+from datetime import datetime, timezone
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from fastapi import HTTPException
+
+from app.core.cache import invalidar_solicitudes
+from app.services.busqueda import CAMPO as CAMPO_BUSQUEDA, claves_texto
+from app.services.estadisticas import registrar_transicion
+
+# --- Grafo de estados: destino -> estados de origen permitidos ---
+TRANSICIONES = {
+    "en_validacion": ("borrador",),
+    "cancelada": ("borrador", "en_validacion"),
+    "aprobada": ("en_validacion",),
+    "rechazada": ("en_validacion",),
+}
+
+class ResultadoTransicion(NamedTuple):
+    estado_anterior: str
+    solicitud: dict          # documento tal como quedó tras la transición
+
+def filtro_transicion(filtro: dict, nuevo_estado: str) -> dict:
+    """Condiciona el filtro a que la solicitud esté en un estado de origen válido."""
+    return {**filtro, "estado": {"$in": list(TRANSICIONES[nuevo_estado])}}
+
+def cambios_transicion(nuevo_estado: str, campos: Optional[dict] = None) -> dict:
+    return {
+        "estado": nuevo_estado,
+        "fechaActualizacion": datetime.now(timezone.utc),
+        **(campos or {}),
+    }
+
+def actualizacion_transicion(cambios: dict, campos: Optional[dict] = None) -> dict:
+    """$set de la transición; los motivos (cancelación, rechazo) se suman a las claves de búsqueda."""
+    actualizacion = {"$set": cambios}
+    claves = claves_texto(campos or {})
+    if claves:
+        actualizacion["$addToSet"] = {CAMPO_BUSQUEDA: {"$each": claves}}
+    return actualizacion
+
+# --- Transición atómica en un solo viaje a la base de datos ---
+async def transicionar(
+    db: AsyncIOMotorDatabase,
+    filtro: dict,
+    nuevo_estado: str,
+    campos: Optional[dict] = None,
+) -> Optional[ResultadoTransicion]:
+    """
+    Aplica la transición con un find_one_and_update condicionado al estado actual.
+    Si dos agentes deciden a la vez sobre la misma solicitud solo uno gana.
+    Devuelve None si la solicitud no existe o no está en un estado de origen válido.
+    """
+    cambios = cambios_transicion(nuevo_estado, campos)
+    anterior = await db["solicitudes_cdt"].find_one_and_update(
+        filtro_transicion(filtro, nuevo_estado),
+        actualizacion_transicion(cambios, campos),
+        return_document=ReturnDocument.BEFORE,
+    )
+    if anterior is None:
+        return None
+    await registrar_transicion(db, anterior["estado"], nuevo_estado)
+    await invalidar_solicitudes([anterior["usuario_id"]])
+    # Se pide el documento previo para conocer el estado de origen; el nuevo es previo + $set
+    return ResultadoTransicion(anterior["estado"], {**anterior, **cambios})
+
+async def transicionar_o_error(
+    db: AsyncIOMotorDatabase,
+    filtro: dict,
+    nuevo_estado: str,
+    detalle: str,
+    campos: Optional[dict] = None,
+) -> ResultadoTransicion:
+    """Como transicionar, pero responde 404/400 cuando la transición no aplica."""
+    resultado = await transicionar(db, filtro, nuevo_estado, campos)
+    if resultado is None:
+        # Solo el camino de error paga una lectura extra para distinguir el motivo
+        existe = await db["solicitudes_cdt"].find_one(filtro, {"_id": 1})
+        if not existe:
+            raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+        raise HTTPException(status_code=400, detail=detalle)
+    return resultado
+
+# --- Transiciones por lote en un solo bulk_write ---
+async def transicionar_lote(
+    db: AsyncIOMotorDatabase,
+    operaciones: List[Tuple[dict, str, Optional[dict]]],
+) -> List[Optional[ResultadoTransicion]]:
+    """
+    Aplica varias transiciones (filtro con _id, nuevo_estado, campos) en un bulk_write
+    no ordenado; los _id deben ser distintos entre sí. Cada actualización marca la solicitud con `lote_transicion`; una
+    lectura por _id de las marcadas dice cuáles se aplicaron. Devuelve un resultado
+    por operación, None donde la transición no aplicó (mismas reglas que transicionar).
+    """
+    if not operaciones:
+        return []
+    marca = ObjectId()
+    cambios = [cambios_transicion(estado, campos) for _, estado, campos in operaciones]
+    await db["solicitudes_cdt"].bulk_write(
+        [
+            UpdateOne(
+                filtro_transicion(filtro, estado),
+                actualizacion_transicion({**cambio, "lote_transicion": marca}, campos),
+            )
+            for (filtro, estado, campos), cambio in zip(operaciones, cambios)
+        ],
+        ordered=False,
+    )
+
+    ids = [filtro["_id"] for filtro, _, _ in operaciones]
+    aplicadas = {
+        doc["_id"]: doc
+        async for doc in db["solicitudes_cdt"].find({"_id": {"$in": ids}, "lote_transicion": marca})
+    }
+    resultados: List[Optional[ResultadoTransicion]] = []
+    conteos: Dict[Tuple[str, str], int] = defaultdict(int)
+    for (filtro, estado, _), _id in zip(operaciones, ids):
+        doc = aplicadas.get(_id)
+        origenes = TRANSICIONES[estado]
+        # Con un único estado de origen posible, el anterior queda determinado
+        anterior = origenes[0] if len(origenes) == 1 else None
+        resultados.append(ResultadoTransicion(anterior, doc) if doc is not None else None)
+        if doc is not None and anterior is not None:
+            conteos[(anterior, estado)] += 1
+    for (anterior, estado), cantidad in conteos.items():
+        await registrar_transicion(db, anterior, estado, cantidad)
+    if aplicadas:
+        await invalidar_solicitudes(doc["usuario_id"] for doc in aplicadas.values())
+    return resultados
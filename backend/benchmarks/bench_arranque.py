@@ -0,0 +1,129 @@
+# benchmarks/bench_arranque.py
+"""
+Arranque en frío de app.main: tiempo de importación y tiempo hasta el primer
+byte (TTFB) de las primeras peticiones, con y sin calentamiento.
+
+Cada medición usa un proceso nuevo:
+- importación: `python -X importtime -c "import app.main"`, con la mediana de
+  las corridas y los módulos más lentos (tiempo acumulado);
+- arranque: uvicorn en un puerto libre. Se mide hasta que acepta conexiones
+  (incluye el startup) y luego el TTFB de la primera y la segunda petición a
+  /ready, POST /auth/login y GET /auth/me, con CALENTAMIENTO_HABILITADO
+  en true y en false.
+
+Toma la configuración del entorno (.env): contra Atlas se ve el costo real
+de DNS/TLS. Sin MongoDB se puede usar el motor en memoria:
+    MONGODB_BACKEND=memoria MONGODB_MEMORIA_SEMILLA=benchmarks/semilla_memoria.json \\
+        python -m benchmarks.bench_arranque
+
+Uso (desde backend/):
+    python -m benchmarks.bench_arranque --repeticiones 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+CODIGO_IMPORTACION = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+def _importacion(repeticiones: int, top: int) -> dict:
+    tiempos: List[float] = []
+    acumulados: Dict[str, List[int]] = {}
+    for _ in range(repeticiones):
+        r = subprocess.run([sys.executable, "-X", "importtime", "-c", CODIGO_IMPORTACION],
+                           capture_output=True, text=True, check=True)
+        tiempos.append(float(r.stdout.strip().splitlines()[-1]))
+        # "import time: self [us] | cumulative | imported package"
+        for linea in r.stderr.splitlines():
+            if not linea.startswith("import time:") or "cumulative" in linea:
+                continue
+            _, acumulado, modulo = linea.split("|")
+            acumulados.setdefault(modulo.strip(), []).append(int(acumulado))
+    lentos = sorted(((m, statistics.median(v)) for m, v in acumulados.items()), key=lambda x: -x[1])[:top]
+    return {
+        "mediana_s": round(statistics.median(tiempos), 4),
+        "corridas_s": [round(t, 4) for t in tiempos],
+        "modulos_lentos_ms": {m: round(us / 1000, 1) for m, us in lentos},
+    }
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _esperar_puerto(proceso: subprocess.Popen, puerto: int, timeout: float) -> None:
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"uvicorn terminó al arrancar:\n{proceso.stderr.read()[-2000:]}")
+        try:
+            socket.create_connection(("127.0.0.1", puerto), timeout=0.05).close()
+            return
+        except OSError:
+            time.sleep(0.01)
+    raise TimeoutError(f"uvicorn no aceptó conexiones en {timeout}s")
+
+def _ttfb(cliente: httpx.Client, metodo: str, ruta: str, **kwargs) -> float:
+    t0 = time.perf_counter()
+    with cliente.stream(metodo, ruta, **kwargs) as r:   # vuelve al recibir las cabeceras
+        ms = (time.perf_counter() - t0) * 1000
+        r.read()
+    if r.status_code >= 400:
+        raise RuntimeError(f"{metodo} {ruta} respondió {r.status_code}: {r.text}")
+    return round(ms, 2)
+
+def _arranque(calentamiento: bool, args: argparse.Namespace) -> dict:
+    puerto = _puerto_libre()
+    entorno = {**os.environ, "CALENTAMIENTO_HABILITADO": "true" if calentamiento else "false"}
+    t0 = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(puerto), "--log-level", "warning"],
+        env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        _esperar_puerto(proceso, puerto, args.timeout)
+        resultado = {"hasta_aceptar_s": round(time.perf_counter() - t0, 3)}
+        credenciales = {"correo": args.correo, "contraseña": args.clave}
+        with httpx.Client(base_url=f"http://127.0.0.1:{puerto}", timeout=args.timeout) as cliente:
+            for vez in ("primera", "segunda"):
+                resultado[f"ready_{vez}_ms"] = _ttfb(cliente, "GET", "/ready")
+            for vez in ("primera", "segunda"):
+                resultado[f"login_{vez}_ms"] = _ttfb(cliente, "POST", "/auth/login", json=credenciales)
+            token = cliente.post("/auth/login", json=credenciales).json()["access_token"]
+            for vez in ("primera", "segunda"):
+                resultado[f"me_{vez}_ms"] = _ttfb(cliente, "GET", "/auth/me",
+                                                  headers={"Authorization": f"Bearer {token}"})
+        return resultado
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+
+def _medianas(corridas: List[dict]) -> dict:
+    return {k: round(statistics.median(c[k] for c in corridas), 3) for k in corridas[0]}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="módulos más lentos a reportar")
+    parser.add_argument("--correo", default="admin@neocdt.banco.com")
+    parser.add_argument("--clave", default="admin")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "importacion": _importacion(args.repeticiones, args.top),
+        "arranque": {
+            "con_calentamiento": _medianas([_arranque(True, args) for _ in range(args.repeticiones)]),
+            "sin_calentamiento": _medianas([_arranque(False, args) for _ in range(args.repeticiones)]),
+        },
+    }, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_busqueda.py
+"""
+Latencia del filtro `q` sobre una colección de prueba en MongoDB:
+
+- "regex": filtro anterior, $regex sin anclar y sin escapar sobre `estado`.
+- "claves": services/busqueda.py (prefijos anclados sobre `claves_busqueda`
+  + $in de estados), con los índices de core/indexes.py.
+
+Sin `--usuario` se mide la consulta global (exportación del agente), que es
+donde el regex obliga a recorrer la colección. Además de la latencia se
+reporta el plan (docs/claves examinados) con explain.
+
+Requiere un MongoDB accesible (usa MONGODB_URL); la colección se crea y se
+borra en la base `bench_busqueda`.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_busqueda --documentos 200000 --repeticiones 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import DESCENDING, IndexModel
+
+from app.core.database import get_client
+from app.core.indexes import INDICES
+from app.services.busqueda import claves_busqueda, filtro_busqueda
+
+ESTADOS = ["borrador", "en_validacion", "aprobada", "rechazada", "cancelada"]
+MOTIVOS = [None, "Documentos incompletos", "Ingresos no verificables", "Cambio de planes", "Tasa poco competitiva"]
+CONSULTAS = ["rechaz", "document", "alto", "aprob incomplet"]
+
+def _documentos(n: int, usuarios: list):
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        estado = random.choice(ESTADOS)
+        doc = {
+            "_id": ObjectId(), "usuario_id": random.choice(usuarios),
+            "monto": random.randrange(10_000, 50_000_000, 10_000), "plazo_meses": 12, "tasa": 6.0,
+            "estado": estado, "fechaCreacion": base + timedelta(seconds=i), "eliminada": False,
+        }
+        motivo = random.choice(MOTIVOS)
+        if estado == "rechazada" and motivo:
+            doc["motivo_rechazo"] = motivo
+        if estado == "cancelada" and motivo:
+            doc["razon_cancelacion"] = motivo
+        doc["claves_busqueda"] = claves_busqueda(doc)
+        yield doc
+
+def filtro_regex(q: str) -> dict:
+    return {"$or": [{"estado": {"$regex": q, "$options": "i"}}]}
+
+async def _medir(coleccion, filtro: dict, repeticiones: int) -> dict:
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        await coleccion.find(filtro).sort([("fechaCreacion", DESCENDING), ("_id", DESCENDING)]).limit(20).to_list(20)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    plan = await coleccion.find(filtro).sort([("fechaCreacion", DESCENDING), ("_id", DESCENDING)]).limit(20).explain()
+    stats = plan.get("executionStats", {})
+    tiempos.sort()
+    return {
+        "p50_ms": round(tiempos[len(tiempos) // 2], 2),
+        "p95_ms": round(tiempos[int(len(tiempos) * 0.95) - 1], 2),
+        "docs_examinados": stats.get("totalDocsExamined"),
+        "claves_examinadas": stats.get("totalKeysExamined"),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documentos", type=int, default=200_000)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--usuario", action="store_true", help="mide el listado de un cliente en vez del global")
+    args = parser.parse_args()
+
+    client = await get_client()
+    db = client["bench_busqueda"]
+    coleccion = db["solicitudes_cdt"]
+    try:
+        await coleccion.drop()
+        await coleccion.create_indexes(INDICES["solicitudes_cdt"]
+                                       + [IndexModel([("fechaCreacion", DESCENDING), ("_id", DESCENDING)])])
+        usuarios = [ObjectId() for _ in range(args.usuarios)]
+        lote = []
+        for doc in _documentos(args.documentos, usuarios):
+            lote.append(doc)
+            if len(lote) == 5000:
+                await coleccion.insert_many(lote, ordered=False)
+                lote = []
+        if lote:
+            await coleccion.insert_many(lote, ordered=False)
+
+        resultados = []
+        for q in CONSULTAS:
+            base = {"usuario_id": usuarios[0]} if args.usuario else {}
+            regex = await _medir(coleccion, {**base, **filtro_regex(q)}, args.repeticiones)
+            claves = await _medir(coleccion, {**base, "$and": [filtro_busqueda(q)]}, args.repeticiones)
+            resultados.append({
+                "q": q, "regex": regex, "claves": claves,
+                "aceleracion_p50": round(regex["p50_ms"] / claves["p50_ms"], 2) if claves["p50_ms"] else None,
+            })
+        print(json.dumps({"documentos": args.documentos, "por_usuario": args.usuario,
+                          "resultados": resultados}, indent=2, ensure_ascii=False))
+    finally:
+        await db.drop_collection("solicitudes_cdt")
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+# benchmarks/bench_cotizacion.py
+"""
+calcular_tasa en un bucle vs calcular_tasas (NumPy) para 1k/10k/100k filas,
+y costo completo de generar el NDJSON de /solicitudes/cotizar.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_cotizacion
+"""
+import json
+import random
+import time
+
+from app.services.solicitudes_cdt import calcular_tasa, calcular_tasas, cotizar_ndjson
+from app.services.tasas import np
+
+def _mejor_de(fn, rondas: int = 5) -> float:
+    tiempos = []
+    for _ in range(rondas):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return min(tiempos)
+
+def main():
+    rnd = random.Random(0)
+    resultados = []
+    for n in (1_000, 10_000, 100_000):
+        montos = [rnd.randint(10_000, 500_000_000) for _ in range(n)]
+        plazos = [rnd.randint(1, 60) for _ in range(n)]
+
+        escalar = [calcular_tasa(m, p) for m, p in zip(montos, plazos)]
+        assert calcular_tasas(montos, plazos) == escalar
+
+        t_escalar = _mejor_de(lambda: [calcular_tasa(m, p) for m, p in zip(montos, plazos)])
+        t_vector = _mejor_de(lambda: calcular_tasas(montos, plazos))
+        t_ndjson = _mejor_de(lambda: b"".join(cotizar_ndjson(montos, plazos)))
+        resultados.append({
+            "filas": n,
+            "escalar_ms": round(t_escalar, 2),
+            "vectorizado_ms": round(t_vector, 2),
+            "aceleracion": round(t_escalar / t_vector, 2),
+            "ndjson_completo_ms": round(t_ndjson, 2),
+        })
+    print(json.dumps({"numpy": np is not None, "resultados": resultados}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_login_bcrypt.py
+"""
+Latencia de /auth/login y de una ruta sin auth (GET /) mientras llegan logins
+concurrentes, con bcrypt dentro del event loop ("inline") y en el pool ("pool").
+
+Uso (desde backend/):
+    python -m benchmarks.bench_login_bcrypt --logins 200 --concurrencia 32
+"""
+import argparse
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from app.api import auth as auth_api
+from app.core import database
+from app.main import app
+from app.services.auth import hash_pool, pwd_context, verify_password
+
+CORREO = "bench@neocdt.com"
+CLAVE = "BenchClave123"
+
+class _Coleccion:
+    def __init__(self, docs):
+        self.docs = docs
+    async def find_one(self, query, projection=None):
+        return next((d for d in self.docs if all(d.get(k) == v for k, v in query.items())), None)
+
+def _bd_minima():
+    usuario = {"_id": "0" * 24, "nombre": "Bench", "correo": CORREO,
+               "contraseña": pwd_context.hash(CLAVE), "activo": True}
+    return {"usuarios": _Coleccion([usuario]), "agentes": _Coleccion([])}
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(round(p / 100 * (len(orden) - 1))))]
+
+async def _correr(modo: str, logins: int, concurrencia: int) -> dict:
+    original = auth_api.verify_password_async
+    if modo == "inline":
+        async def inline(plain, hashed):
+            return verify_password(plain, hashed)
+        auth_api.verify_password_async = inline
+
+    lat_login, lat_raiz = [], []
+    restantes = SimpleNamespace(n=logins)
+    terminado = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cliente:
+        async def trabajador():
+            while restantes.n > 0:
+                restantes.n -= 1
+                t0 = time.perf_counter()
+                r = await cliente.post("/auth/login", json={"correo": CORREO, "contraseña": CLAVE})
+                lat_login.append((time.perf_counter() - t0) * 1000)
+                assert r.status_code == 200, r.text
+
+        async def sonda():
+            # Se mide desde el instante programado: si el loop estuvo bloqueado
+            # por bcrypt, ese retraso también cuenta como latencia
+            programado = time.perf_counter()
+            while not terminado.is_set():
+                await asyncio.sleep(max(0.0, programado - time.perf_counter()))
+                await cliente.get("/")
+                lat_raiz.append((time.perf_counter() - programado) * 1000)
+                programado += 0.01
+
+        tarea_sonda = asyncio.create_task(sonda())
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+        terminado.set()
+        await tarea_sonda
+
+    auth_api.verify_password_async = original
+    return {
+        "modo": modo,
+        "logins_por_segundo": round(logins / duracion, 1),
+        "login_p50_ms": round(percentil(lat_login, 50), 1),
+        "login_p99_ms": round(percentil(lat_login, 99), 1),
+        "raiz_p50_ms": round(percentil(lat_raiz, 50), 1),
+        "raiz_p99_ms": round(percentil(lat_raiz, 99), 1),
+        "pool": hash_pool.estadisticas() if modo == "pool" else None,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=32)
+    args = parser.parse_args()
+
+    bd = _bd_minima()
+    app.dependency_overrides[database.get_database] = lambda: bd
+    resultados = [await _correr(modo, args.logins, args.concurrencia) for modo in ("inline", "pool")]
+    hash_pool.cerrar()
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+# benchmarks/bench_serializacion.py
+"""
+Costo de serializar los listados (sin base de datos) para 10/100/1000 items:
+
+- "antes": serializador que arma sus tablas en cada llamada + jsonable_encoder
+  + JSONResponse (cliente) y validación Pydantic del response_model (agente).
+- "despues": services/serializadores.py + a_json, el cuerpo que guarda y
+  devuelve la caché de respuestas.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_serializacion --repeticiones 200
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.schemas.solicitudes_cdt_agente import SolicitudAgenteDB
+from app.services.serializadores import a_json, orjson, solicitud_agente, solicitud_normalizada
+
+def _docs(n: int) -> List[dict]:
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [{
+        "_id": ObjectId(), "usuario_id": ObjectId(), "monto": 1_000_000 + i, "plazo_meses": 12,
+        "tasa": 5.7, "estado": "en_validacion", "fechaCreacion": base + timedelta(minutes=i),
+        "fechaActualizacion": base + timedelta(minutes=i), "eliminada": False,
+    } for i in range(n)]
+
+# --- Implementación anterior (referencia) ---
+def _normalizada_anterior(doc: dict) -> dict:
+    from datetime import datetime
+
+    estado_map = {
+        "borrador": "Borrador",
+        "en_validacion": "En validación",
+        "aprobada": "Aprobada",
+        "rechazada": "Rechazada",
+        "cancelada": "Cancelada",
+    }
+
+    def format_fecha(fecha):
+        if fecha is None:
+            return None
+        if isinstance(fecha, datetime):
+            return fecha.isoformat()
+        return str(fecha)
+
+    return {
+        "id": str(doc["_id"]),
+        "usuario_id": str(doc["usuario_id"]),
+        "monto": int(doc.get("monto", 0)),
+        "plazo_meses": int(doc.get("plazo_meses", 0)),
+        "tasa": float(doc.get("tasa", 0.0)),
+        "estado": estado_map.get(doc.get("estado", "").lower(), doc.get("estado", "Desconocido")),
+        "fechaCreacion": format_fecha(doc.get("fechaCreacion")),
+        "fechaActualizacion": format_fecha(doc.get("fechaActualizacion")),
+        "razon_cancelacion": doc.get("razon_cancelacion"),
+    }
+
+_modelo_agente = TypeAdapter(List[SolicitudAgenteDB])
+
+def cliente_antes(docs):
+    cuerpo = {"items": [_normalizada_anterior(d) for d in docs], "total": len(docs), "next_cursor": None}
+    return JSONResponse(jsonable_encoder(cuerpo)).body
+
+def cliente_despues(docs):
+    cuerpo = {"items": [solicitud_normalizada(d) for d in docs], "total": len(docs), "next_cursor": None}
+    return a_json(cuerpo)
+
+def agente_antes(docs):
+    for d in docs:
+        d["id"] = str(d["_id"])
+        d["usuario_id"] = str(d["usuario_id"])
+    validados = _modelo_agente.validate_python(docs)
+    return JSONResponse(_modelo_agente.dump_python(validados, mode="json")).body
+
+def agente_despues(docs):
+    return a_json([solicitud_agente(d) for d in docs])
+
+def _medir(fn, n: int, repeticiones: int) -> float:
+    """Microsegundos por llamada (mediana de 5 rondas)."""
+    rondas = []
+    for _ in range(5):
+        lotes = [_docs(n) for _ in range(repeticiones)]   # documentos nuevos: "antes" los muta
+        t0 = time.perf_counter()
+        for docs in lotes:
+            fn(docs)
+        rondas.append((time.perf_counter() - t0) / repeticiones * 1e6)
+    return sorted(rondas)[2]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    resultados = []
+    for n in (10, 100, 1000):
+        reps = max(5, args.repeticiones * 10 // max(n, 10))
+        for listado, antes, despues in (("cliente", cliente_antes, cliente_despues),
+                                        ("agente", agente_antes, agente_despues)):
+            t_antes, t_despues = _medir(antes, n, reps), _medir(despues, n, reps)
+            resultados.append({
+                "listado": listado, "items": n,
+                "antes_us": round(t_antes, 1), "despues_us": round(t_despues, 1),
+                "aceleracion": round(t_antes / t_despues, 2),
+            })
+    print(json.dumps({"orjson": orjson is not None, "resultados": resultados}, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+# benchmarks/carga.py
+"""
+Prueba de carga de punta a punta contra la API real (y su MongoDB).
+
+Cada sesión recorre el flujo de NeoCDT:
+    login -> crear solicitud -> listar -> enviar a validación -> agente aprueba/rechaza
+
+- Lazo cerrado (por defecto): `--concurrencia` usuarios virtuales repiten
+  sesiones durante `--duracion` segundos.
+- Lazo abierto (`--tasa N`): llegan N sesiones por segundo (Poisson), con
+  hasta `--concurrencia` en curso; las demás esperan turno. Esa espera se
+  mide desde la llegada (`espera_cupo`) y entra en la latencia de la sesión:
+  si no, bajo sobrecarga los percentiles se verían planos justo cuando el
+  sistema ya no da abasto (omisión coordinada).
+
+El reporte (JSON, claves ordenadas) trae p50/p95/p99/max, throughput y tasa
+de error por endpoint, los mismos percentiles para la sesión completa (desde
+la llegada), más la configuración y el commit, para comparar corridas entre
+versiones con `--comparar`.
+
+Antes de medir se registran `--usuarios` clientes (`<prefijo>_<i>@carga.neocdt.com`;
+si ya existen se reutilizan). El agente debe existir (create_admin_agent_once.py).
+Cada sesión hace login desde la misma IP: la API debe correr con
+LOGIN_LIMITE_HABILITADO=false o con LOGIN_LIMITE_IP_* por encima de la tasa.
+
+Uso (desde backend/):
+    uvicorn app.main:app --workers 4 &                      # con MONGODB_URL apuntando a un mongod local
+    python -m benchmarks.carga --url http://localhost:8000 --concurrencia 50 --duracion 60 --salida antes.json
+    python -m benchmarks.carga --en-proceso --tasa 20 --duracion 30    # la app corre dentro de este proceso
+    python -m benchmarks.carga --comparar antes.json despues.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+CLAVE_USUARIOS = "CargaNeo123"
+PLAZOS = (3, 6, 12, 18, 24, 36)
+
+class FalloPaso(Exception):
+    """Un paso de la sesión no devolvió lo esperado; la sesión se abandona."""
+
+# --- Medición ---
+def percentil(orden: List[float], p: float) -> float:
+    if not orden:
+        return 0.0
+    return orden[min(len(orden) - 1, int(round(p / 100 * (len(orden) - 1))))]
+
+def resumen_latencias(valores: List[float]) -> dict:
+    orden = sorted(valores)
+    return {
+        "n": len(orden),
+        "p50_ms": round(percentil(orden, 50), 2),
+        "p95_ms": round(percentil(orden, 95), 2),
+        "p99_ms": round(percentil(orden, 99), 2),
+        "max_ms": round(orden[-1], 2) if orden else 0.0,
+    }
+
+class Metricas:
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.errores: Dict[str, Counter] = defaultdict(Counter)
+        self.sesiones = Counter()
+        self.sesion_ms: List[float] = []        # desde la llegada hasta el último paso
+        self.espera_cupo_ms: List[float] = []   # lazo abierto: llegada -> inicio de la sesión
+
+    def registrar(self, endpoint: str, ms: float, error: Optional[str] = None) -> None:
+        if error is None:
+            self.latencias[endpoint].append(ms)
+        else:
+            self.errores[endpoint][error] += 1
+
+    def reporte(self, duracion: float) -> dict:
+        endpoints = {}
+        for endpoint in sorted(set(self.latencias) | set(self.errores)):
+            errores = sum(self.errores[endpoint].values())
+            total = len(self.latencias[endpoint]) + errores
+            endpoints[endpoint] = {
+                **resumen_latencias(self.latencias[endpoint]),
+                "n": total,
+                "errores": dict(self.errores[endpoint]),
+                "tasa_error": round(errores / total, 4) if total else 0.0,
+                "rps": round(total / duracion, 2) if duracion else 0.0,
+            }
+        peticiones = sum(e["n"] for e in endpoints.values())
+        reporte = {
+            "duracion_s": round(duracion, 2),
+            "sesiones": dict(self.sesiones),
+            "sesion": resumen_latencias(self.sesion_ms),
+            "peticiones": peticiones,
+            "rps": round(peticiones / duracion, 2) if duracion else 0.0,
+            "endpoints": endpoints,
+        }
+        if self.espera_cupo_ms:
+            reporte["espera_cupo"] = resumen_latencias(self.espera_cupo_ms)
+        return reporte
+
+async def llamar(cliente: httpx.AsyncClient, metricas: Metricas, endpoint: str,
+                 metodo: str, url: str, esperado=(200,), **kwargs) -> httpx.Response:
+    t0 = time.perf_counter()
+    try:
+        r = await cliente.request(metodo, url, **kwargs)
+    except httpx.HTTPError as exc:
+        metricas.registrar(endpoint, 0, f"excepcion:{type(exc).__name__}")
+        raise FalloPaso(endpoint)
+    ms = (time.perf_counter() - t0) * 1000
+    if r.status_code not in esperado:
+        metricas.registrar(endpoint, ms, str(r.status_code))
+        raise FalloPaso(endpoint)
+    metricas.registrar(endpoint, ms)
+    return r
+
+# --- Escenario ---
+def correo_usuario(prefijo: str, i: int) -> str:
+    return f"{prefijo}_{i}@carga.neocdt.com"
+
+async def preparar_usuarios(cliente: httpx.AsyncClient, prefijo: str, n: int) -> List[str]:
+    async def registrar(i):
+        r = await cliente.post("/auth/register", json={
+            "nombre": f"Carga {i}", "correo": correo_usuario(prefijo, i), "contraseña": CLAVE_USUARIOS,
+        })
+        if r.status_code not in (201, 409):
+            raise RuntimeError(f"No se pudo registrar {correo_usuario(prefijo, i)}: {r.status_code} {r.text}")
+    await asyncio.gather(*(registrar(i) for i in range(n)))
+    return [correo_usuario(prefijo, i) for i in range(n)]
+
+async def token(cliente: httpx.AsyncClient, correo: str, clave: str) -> dict:
+    r = await cliente.post("/auth/login", json={"correo": correo, "contraseña": clave})
+    if r.status_code != 200:
+        raise RuntimeError(f"Login de {correo} falló: {r.status_code} {r.text}")
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+async def sesion(cliente: httpx.AsyncClient, metricas: Metricas, correo: str,
+                 agente: dict, rnd: random.Random, prob_rechazo: float) -> None:
+    r = await llamar(cliente, metricas, "POST /auth/login", "POST", "/auth/login",
+                     json={"correo": correo, "contraseña": CLAVE_USUARIOS})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    r = await llamar(cliente, metricas, "POST /solicitudes/", "POST", "/solicitudes/", esperado=(201,),
+                     headers=headers, json={"monto": rnd.randrange(10_000, 50_000_000, 10_000),
+                                            "plazo_meses": rnd.choice(PLAZOS)})
+    solicitud_id = r.json()["id"]
+
+    await llamar(cliente, metricas, "GET /solicitudes/", "GET", "/solicitudes/",
+                 headers=headers, params={"limit": 10})
+    await llamar(cliente, metricas, "PATCH /solicitudes/{id}/estado", "PATCH",
+                 f"/solicitudes/{solicitud_id}/estado", headers=headers, params={"estado": "en_validacion"})
+
+    if rnd.random() < prob_rechazo:
+        await llamar(cliente, metricas, "PUT /solicitudes/agente/{id}/rechazar", "PUT",
+                     f"/solicitudes/agente/{solicitud_id}/rechazar", headers=agente,
+                     json={"motivo": "Rechazo de prueba de carga"})
+    else:
+        await llamar(cliente, metricas, "PUT /solicitudes/agente/{id}/aprobar", "PUT",
+                     f"/solicitudes/agente/{solicitud_id}/aprobar", headers=agente)
+
+async def _sesion_contada(cliente, metricas, correo, agente, rnd, prob_rechazo,
+                          llegada: Optional[float] = None) -> None:
+    """`llegada`: cuándo debía empezar la sesión (lazo abierto); por defecto, ahora."""
+    llegada = time.perf_counter() if llegada is None else llegada
+    try:
+        await sesion(cliente, metricas, correo, agente, rnd, prob_rechazo)
+        metricas.sesiones["completadas"] += 1
+        metricas.sesion_ms.append((time.perf_counter() - llegada) * 1000)
+    except FalloPaso:
+        metricas.sesiones["fallidas"] += 1
+
+async def ejecutar(cliente: httpx.AsyncClient, args: argparse.Namespace) -> dict:
+    """Prepara los datos, corre la carga y devuelve el reporte."""
+    rnd = random.Random(args.semilla)
+    correos = await preparar_usuarios(cliente, args.prefijo, args.usuarios)
+    agente = await token(cliente, args.agente_correo, args.agente_clave)
+
+    metricas = Metricas()
+    inicio = time.perf_counter()
+    fin = inicio + args.duracion
+
+    if args.tasa > 0:
+        # Lazo abierto: las llegadas no esperan a que terminen las sesiones anteriores
+        cupos = asyncio.Semaphore(args.concurrencia)
+        tareas = set()
+
+        async def con_cupo(llegada: float):
+            async with cupos:
+                metricas.espera_cupo_ms.append((time.perf_counter() - llegada) * 1000)
+                await _sesion_contada(cliente, metricas, rnd.choice(correos), agente, rnd,
+                                      args.prob_rechazo, llegada)
+
+        while time.perf_counter() < fin:
+            tarea = asyncio.create_task(con_cupo(time.perf_counter()))
+            tareas.add(tarea)
+            tarea.add_done_callback(tareas.discard)
+            await asyncio.sleep(rnd.expovariate(args.tasa))
+        if tareas:
+            await asyncio.gather(*tareas)
+    else:
+        async def usuario_virtual():
+            while time.perf_counter() < fin:
+                await _sesion_contada(cliente, metricas, rnd.choice(correos), agente, rnd, args.prob_rechazo)
+
+        await asyncio.gather(*(usuario_virtual() for _ in range(args.concurrencia)))
+
+    return metricas.reporte(time.perf_counter() - inicio)
+
+# --- Comparación de corridas ---
+def comparar(antes: dict, despues: dict) -> dict:
+    """Diferencia relativa (despues / antes - 1) por endpoint y métrica."""
+    def delta(a, b):
+        return round(b / a - 1, 4) if a else None
+
+    metricas = ("p50_ms", "p95_ms", "p99_ms")
+    endpoints = {}
+    for nombre in sorted(set(antes["endpoints"]) & set(despues["endpoints"])):
+        a, b = antes["endpoints"][nombre], despues["endpoints"][nombre]
+        endpoints[nombre] = {m: delta(a[m], b[m]) for m in ("p50_ms", "p95_ms", "p99_ms", "rps")}
+        endpoints[nombre]["tasa_error"] = round(b["tasa_error"] - a["tasa_error"], 4)
+    return {
+        "antes": antes.get("commit"),
+        "despues": despues.get("commit"),
+        "rps": delta(antes["rps"], despues["rps"]),
+        "sesion": ({m: delta(antes["sesion"][m], despues["sesion"][m]) for m in metricas}
+                   if "sesion" in antes and "sesion" in despues else None),
+        "endpoints": endpoints,
+    }
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def _main(args: argparse.Namespace) -> int:
+    if args.en_proceso:
+        from app.main import app
+        await app.router.startup()
+        transporte = httpx.ASGITransport(app=app)
+        base_url = "http://carga"
+    else:
+        transporte = None
+        base_url = args.url
+
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, transport=transporte, limits=limites,
+                                     timeout=args.timeout) as cliente:
+            reporte = await ejecutar(cliente, args)
+    finally:
+        if args.en_proceso:
+            await app.router.shutdown()
+
+    reporte.update({
+        "commit": _commit(),
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("agente_clave", "salida", "comparar")},
+    })
+    salida = json.dumps(reporte, indent=2, sort_keys=True, ensure_ascii=False)
+    print(salida)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(salida + "\n")
+    return 1 if reporte["peticiones"] == 0 else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--en-proceso", action="store_true", help="levanta app.main:app dentro de este proceso")
+    parser.add_argument("--concurrencia", type=int, default=20)
+    parser.add_argument("--tasa", type=float, default=0, help="sesiones por segundo (0 = lazo cerrado)")
+    parser.add_argument("--duracion", type=float, default=30)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--prefijo", default="carga")
+    parser.add_argument("--prob-rechazo", type=float, default=0.3)
+    parser.add_argument("--agente-correo", default="admin@neocdt.banco.com")
+    parser.add_argument("--agente-clave", default="admin")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", help="además de imprimirlo, guarda el reporte en este archivo")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DESPUES"), help="compara dos reportes")
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as a, open(args.comparar[1], encoding="utf-8") as b:
+            print(json.dumps(comparar(json.load(a), json.load(b)), indent=2, sort_keys=True, ensure_ascii=False))
+        return 0
+    return asyncio.run(_main(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,15 @@
 # tests/conftest.py
-import sys, os, asyncio, pytest_asyncio, httpx, re
-from types import SimpleNamespace
+import sys, os, asyncio, pytest_asyncio, httpx
 from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from app.main import app
 from app.core import database
+from app.core.cache import cache_respuestas
+from app.core.idempotencia import idempotencia
+from app.core.limites import limitador_login
+from app.core.memoria import BaseMemoria, ColeccionMemoria
 from app.services.auth import pwd_context
 
 @pytest_asyncio.fixture(scope="session")
@@ -15,112 +18,9 @@ def event_loop():
     yield loop
     loop.close()
 
-class _Cursor:
-    def __init__(self, items):
-        self.items = items
-        self._skip = 0
-        self._limit = None
-    def sort(self, key, direction):
-        reverse = direction == -1
-        self.items = sorted(self.items, key=lambda d: d.get(key), reverse=reverse)
-        return self
-    def skip(self, n):
-        self._skip = n; return self
-    def limit(self, n):
-        self._limit = n; return self
-    def __aiter__(self):
-        start = self._skip
-        end = None if self._limit is None else start + self._limit
-        data = self.items[start:end]
-        async def gen():
-            for doc in data:
-                yield doc
-        return gen()
-
-class FakeCollection:
-    def __init__(self):
-        self.data = {}  # str(_id) -> doc
-    def _match(self, doc, query):
-        def cond(k, v, d):
-            if isinstance(v, dict):
-                if "$gte" in v and not (d.get(k) is not None and d[k] >= v["$gte"]): return False
-                if "$lte" in v and not (d.get(k) is not None and d[k] <= v["$lte"]): return False
-                if "$ne"  in v and not (d.get(k) != v["$ne"]): return False
-                if "$regex" in v:
-                    import re as _re
-                    flags = _re.I if v.get("$options") == "i" else 0
-                    return _re.search(v["$regex"], str(d.get(k, "")), flags) is not None
-                return True
-            return d.get(k) == v
-        if "$or" in query:
-            if any(self._match(doc, q) for q in query["$or"]):
-                q2 = {k: v for k, v in query.items() if k != "$or"}
-                return all(cond(k, v, doc) for k, v in q2.items())
-            return False
-        return all(cond(k, v, doc) for k, v in query.items())
-    async def find_one(self, query, projection=None):
-        def _apply_projection(doc, proj):
-            if not proj:
-                return doc
-            # Soporta inclusión (campos con 1) y exclusión simple (campos con 0)
-            include = {k for k, v in proj.items() if v}
-            exclude = {k for k, v in proj.items() if not v}
-
-            if include and exclude:
-                # Manténlo simple: prioriza inclusión si existe
-                exclude = set()
-
-            if include:
-                out = {k: v for k, v in doc.items() if k in include}
-                # _id se incluye por defecto si no se excluye explícitamente
-                if "_id" not in include and proj.get("_id", 1):
-                    out["_id"] = doc.get("_id")
-                return out
-
-            if exclude:
-                out = {k: v for k, v in doc.items() if k not in exclude}
-                # si excluyen _id, respeta
-                if proj.get("_id", 1) == 0 and "_id" in out:
-                    out.pop("_id", None)
-                return out
-
-            return doc
-
-        for doc in self.data.values():
-            if self._match(doc, query):
-                return _apply_projection(doc, projection)
-        return None
-    async def insert_one(self, doc):
-        _id = ObjectId()
-        doc["_id"] = _id
-        self.data[str(_id)] = doc
-        return SimpleNamespace(inserted_id=_id)
-    async def update_one(self, filtro, update):
-        for _id, doc in self.data.items():
-            if self._match(doc, filtro):
-                if "$set" in update: doc.update(update["$set"])
-                return SimpleNamespace(modified_count=1)
-        return SimpleNamespace(modified_count=0)
-    async def update_many(self, filtro, update):
-        n = 0
-        for _id, doc in self.data.items():
-            if self._match(doc, filtro):
-                if "$set" in update: doc.update(update["$set"])
-                n += 1
-        return SimpleNamespace(modified_count=n)
-    def find(self, query=None):
-        items = [doc for doc in self.data.values() if self._match(doc, query or {})]
-        return _Cursor(items)
-    async def count_documents(self, query):
-        return sum(1 for doc in self.data.values() if self._match(doc, query))
-
-class FakeDB:
-    def __init__(self):
-        self.collections = {"usuarios": FakeCollection(),
-                            "agentes": FakeCollection(),
-                            "solicitudes_cdt": FakeCollection()}
-    def __getitem__(self, name):
-        return self.collections[name]
+# La base simulada es el motor en memoria de la aplicación (MONGODB_BACKEND=memoria)
+FakeDB = BaseMemoria
+FakeCollection = ColeccionMemoria
 
 @pytest_asyncio.fixture(autouse=True)
 async def fake_database_dependency():
@@ -128,6 +28,10 @@ async def fake_database_dependency():
 
     # Exponerla para otros tests
     app.state.test_db = fake_db
+    # Cada test parte de una caché de respuestas vacía
+    cache_respuestas.limpiar()
+    limitador_login.limpiar()
+    idempotencia.limpiar()
 
     # Datos semilla
     u1_id = ObjectId(); a1_id = ObjectId()
@@ -175,3 +79,16 @@ async def client():
     transport = httpx.ASGITransport(app=app)
     async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
+
+async def _encabezados(client, correo, clave):
+    r = await client.post("/auth/login", json={"correo": correo, "contraseña": clave})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+# Authorization de los usuarios semilla
+@pytest_asyncio.fixture
+async def headers_cliente(client):
+    return await _encabezados(client, "jorge_andres.medina@uao.edu.co", "MedinaInge519")
+
+@pytest_asyncio.fixture
+async def headers_agente(client):
+    return await _encabezados(client, "admin@neocdt.banco.com", "admin")
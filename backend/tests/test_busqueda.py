@@ -0,0 +1,46 @@
+import pytest
+
+from app.services.busqueda import claves_busqueda, filtro_busqueda, palabras, reindexar
+
+def test_claves_y_filtro_normalizan_y_escapan():
+    assert palabras("Ingresos NO verificables, según análisis") == ["ingresos", "no", "verificables", "segun", "analisis"]
+    doc = {"monto": 12_000_000, "motivo_rechazo": "Documentación incompleta"}
+    assert claves_busqueda(doc) == ["12000000", "alto", "documentacion", "incompleta"]
+
+    # Metacaracteres de regex nunca llegan a MongoDB: solo palabras ancladas
+    filtro = filtro_busqueda("(x+)+$ .*docu")
+    assert filtro == {"$and": [
+        {"claves_busqueda": {"$regex": "^x"}},
+        {"claves_busqueda": {"$regex": "^docu"}},
+    ]}
+    # Las palabras que nombran un estado también buscan por el campo estado (indexado)
+    assert filtro_busqueda("validación") == {"$or": [
+        {"estado": {"$in": ["en_validacion"]}},
+        {"claves_busqueda": {"$regex": "^validacion"}},
+    ]}
+    assert filtro_busqueda("!!!") is None
+
+@pytest.mark.asyncio
+async def test_listado_busca_por_estado_motivo_y_monto(client, headers_cliente, headers_agente):
+    from app.main import app
+    db = app.state.test_db
+    assert await reindexar(db) == 3   # datos semilla sin claves
+    assert await reindexar(db) == 0
+
+    r = await client.post("/solicitudes/", json={"monto": 15_000_000, "plazo_meses": 12}, headers=headers_cliente)
+    nueva = r.json()["id"]
+    await client.patch(f"/solicitudes/{nueva}/estado", params={"estado": "en_validacion"}, headers=headers_cliente)
+    await client.put(f"/solicitudes/agente/{nueva}/rechazar", json={"motivo": "Ingresos no verificables"},
+                     headers=headers_agente)
+
+    async def buscar(q):
+        r = await client.get("/solicitudes/", params={"q": q}, headers=headers_cliente)
+        assert r.status_code == 200
+        return sorted(item["estado"] for item in r.json()["items"])
+
+    assert await buscar("valid") == ["En validación"]
+    assert await buscar("ingresos verif") == ["Rechazada"]
+    assert await buscar("alto") == ["Rechazada"]
+    assert await buscar("bajo") == ["Borrador", "Cancelada", "En validación"]
+    assert await buscar("rechazada bajo") == []
+    assert await buscar(".*") == []
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import BackendMemoria, BackendRedis, CacheRespuestas, cache_consultas
+
+@pytest.mark.asyncio
+async def test_peticiones_concurrentes_comparten_un_calculo():
+    cache = CacheRespuestas(BackendMemoria(100), ttl=5)
+    llamadas = 0
+
+    async def calcular():
+        nonlocal llamadas
+        llamadas += 1
+        await asyncio.sleep(0.01)
+        return b"[]", {}
+
+    resultados = await asyncio.gather(*(cache.obtener_o_calcular("k", ["cola"], calcular) for _ in range(20)))
+    assert llamadas == 1
+    assert sorted({origen for _, origen in resultados}) == ["coalesced", "miss"]
+    assert (await cache.obtener_o_calcular("k", ["cola"], calcular))[1] == "hit"
+
+@pytest.mark.asyncio
+async def test_invalidar_descarta_incluso_lo_calculado_durante_la_escritura():
+    cache = CacheRespuestas(BackendMemoria(100), ttl=5)
+    liberar = asyncio.Event()
+
+    async def lento():
+        await liberar.wait()
+        return b"viejo", {}
+
+    async def nuevo():
+        return b"nuevo", {}
+
+    en_curso = asyncio.ensure_future(cache.obtener_o_calcular("k", ["usuario:1"], lento))
+    await asyncio.sleep(0)
+    await cache.invalidar("usuario:1")      # una escritura termina mientras se calcula
+    liberar.set()
+    assert (await en_curso)[0][0] == b"viejo"
+    assert await cache.obtener_o_calcular("k", ["usuario:1"], nuevo) == ((b"nuevo", {}), "miss")
+
+@pytest.mark.asyncio
+async def test_ttl_y_lru_del_backend_en_memoria(monkeypatch):
+    import app.core.cache as cache_mod
+    ahora = [1000.0]
+    monkeypatch.setattr(cache_mod.time, "monotonic", lambda: ahora[0])
+    backend = BackendMemoria(2)
+    await backend.guardar("a", (b"1", {}), ttl=5)
+    await backend.guardar("b", (b"2", {}), ttl=5)
+    await backend.guardar("c", (b"3", {}), ttl=5)
+    assert await backend.obtener("a") is None          # expulsada por LRU
+    ahora[0] += 6
+    assert await backend.obtener("b") is None          # vencida
+    assert len(backend) == 1
+
+class _RedisFalso:
+    def __init__(self):
+        self.datos = {}
+    async def mget(self, claves):
+        return [self.datos.get(c) for c in claves]
+    async def get(self, clave):
+        return self.datos.get(clave)
+    async def set(self, clave, valor, px):
+        self.datos[clave] = valor
+    def pipeline(self, transaction=False):
+        redis = self
+        class _Pipe:
+            async def __aenter__(self): self.ops = []; return self
+            async def __aexit__(self, *exc): return False
+            def incr(self, clave): self.ops.append(clave)
+            async def execute(self):
+                for c in self.ops:
+                    redis.datos[c] = str(int(redis.datos.get(c, 0)) + 1).encode()
+        return _Pipe()
+
+@pytest.mark.asyncio
+async def test_backend_redis_comparte_versiones_y_entradas():
+    backend = BackendRedis.__new__(BackendRedis)
+    backend.cliente, backend.prefijo = _RedisFalso(), "t:"
+    replica_a = CacheRespuestas(backend, ttl=5)
+    replica_b = CacheRespuestas(backend, ttl=5)
+
+    async def calcular():
+        return b'{"x":1}', {"X-Has-More": "false"}
+
+    await replica_a.obtener_o_calcular("k", ["cola"], calcular)
+    assert await replica_b.obtener_o_calcular("k", ["cola"], calcular) == (
+        (b'{"x":1}', {"X-Has-More": "false"}), "hit")
+    await replica_b.invalidar("cola")
+    assert (await replica_a.obtener_o_calcular("k", ["cola"], calcular))[1] == "miss"
+
+@pytest.mark.asyncio
+async def test_listado_y_cola_se_invalidan_al_escribir(client, headers_cliente, headers_agente):
+    aciertos = cache_consultas.valor(resultado="hit")
+
+    r1 = await client.get("/solicitudes/", headers=headers_cliente)
+    r2 = await client.get("/solicitudes/", headers=headers_cliente)
+    assert (r1.headers["X-Cache"], r2.headers["X-Cache"]) == ("MISS", "HIT")
+    assert r1.json() == r2.json()
+    assert cache_consultas.valor(resultado="hit") == aciertos + 1
+
+    cola = await client.get("/solicitudes/agente/pendientes", headers=headers_agente)
+    assert cola.headers["X-Has-More"] == "false"
+    assert (await client.get("/solicitudes/agente/pendientes", headers=headers_agente)).headers["X-Cache"] == "HIT"
+
+    r = await client.post("/solicitudes/", json={"monto": 500_000, "plazo_meses": 6}, headers=headers_cliente)
+    nueva = r.json()["id"]
+    r3 = await client.get("/solicitudes/", headers=headers_cliente)
+    assert r3.headers["X-Cache"] == "MISS"
+    assert r3.json()["total"] == r1.json()["total"] + 1
+
+    await client.patch(f"/solicitudes/{nueva}/estado", params={"estado": "en_validacion"}, headers=headers_cliente)
+    cola2 = await client.get("/solicitudes/agente/pendientes", headers=headers_agente)
+    assert cola2.headers["X-Cache"] == "MISS"
+    assert len(cola2.json()) == len(cola.json()) + 1
+
+    me = [await client.get("/auth/me", headers=headers_cliente) for _ in range(2)]
+    assert [r.headers["X-Cache"] for r in me] == ["MISS", "HIT"]
+    assert me[1].json()["correo"] == "jorge_andres.medina@uao.edu.co"
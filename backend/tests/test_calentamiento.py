@@ -0,0 +1,32 @@
+import pytest
+
+from app.core.calentamiento import calentar, preparacion
+from app.core.memoria import BaseMemoria
+from app.main import app
+from app.services.auth import hash_pool, verify_password
+
+class _BaseCaida(BaseMemoria):
+    async def command(self, comando, *args, **kwargs):
+        raise ConnectionError("sin servidor")
+
+@pytest.mark.asyncio
+async def test_calentamiento_ejecuta_todos_los_pasos():
+    estado = await calentar(BaseMemoria(), hash_pool, verify_password)
+    assert estado.listo and estado.terminado
+    assert set(estado.pasos) == {"ping", "conexiones", "bcrypt", "jwt"}
+    assert not any("error" in p for p in estado.pasos.values())
+    assert estado.duracion_ms >= estado.pasos["bcrypt"]["ms"]
+
+@pytest.mark.asyncio
+async def test_ready_espera_a_mongodb_y_se_apaga_al_cerrar(client):
+    estado = await calentar(_BaseCaida(), hash_pool, verify_password)
+    assert not estado.listo and "error" in estado.pasos["ping"]
+    assert "bcrypt" in estado.pasos and "conexiones" not in estado.pasos
+
+    # /ready vuelve a intentar el ping con la base de la aplicación (que responde)
+    r = await client.get("/ready")
+    assert r.status_code == 200 and r.json()["listo"] is True
+
+    preparacion.cerrar()
+    assert (await client.get("/ready")).status_code == 503
+    preparacion.reiniciar()
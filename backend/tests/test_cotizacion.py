@@ -0,0 +1,52 @@
+import json
+import random
+
+import pytest
+
+from app.services import tasas
+from app.services.solicitudes_cdt import calcular_tasa, calcular_tasas
+
+def _iguales_bit_a_bit(a, b):
+    return len(a) == len(b) and all(type(x) is type(y) and repr(x) == repr(y) for x, y in zip(a, b))
+
+def test_calcular_tasas_coincide_con_escalar():
+    pytest.importorskip("numpy")
+    rnd = random.Random(13)
+    montos = [rnd.randint(10_000, 500_000_000) for _ in range(50_000)]
+    plazos = [rnd.randint(1, 360) for _ in range(50_000)]
+    # Grilla densa de valores pequeños: muchos casos cerca de ,5 en el segundo decimal
+    montos += [m for m in range(10_000, 2_000_000, 2_500) for _ in range(1, 25)]
+    plazos += [p for _ in range(10_000, 2_000_000, 2_500) for p in range(1, 25)]
+
+    esperado = [calcular_tasa(m, p) for m, p in zip(montos, plazos)]
+    assert _iguales_bit_a_bit(calcular_tasas(montos, plazos), esperado)
+    assert 12 in esperado  # el tope se aplica y conserva el tipo
+
+def test_calcular_tasas_sin_numpy(monkeypatch):
+    monkeypatch.setattr(tasas, "np", None)
+    montos, plazos = [1_000_000, 90_000_000_000], [12, 24]
+    assert calcular_tasas(montos, plazos) == [calcular_tasa(1_000_000, 12), 12]
+
+@pytest.mark.asyncio
+async def test_endpoint_cotizar_grilla_ndjson(client):
+    login = await client.post("/auth/login", json={
+        "correo": "jorge_andres.medina@uao.edu.co", "contraseña": "MedinaInge519"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    montos = list(range(10_000, 10_000 + 300 * 1_000, 1_000))
+    r = await client.post("/solicitudes/cotizar", headers=headers,
+                          json={"montos": montos, "plazos_meses": [6, 12], "grilla": True})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    filas = [json.loads(linea) for linea in r.text.splitlines()]
+    assert len(filas) == 600
+    assert filas[1] == {"monto": 10_000, "plazo_meses": 12, "tasa": calcular_tasa(10_000, 12)}
+
+    r = await client.post("/solicitudes/cotizar", headers=headers,
+                          json={"montos": [20_000, 30_000], "plazos_meses": [6]})
+    assert r.status_code == 422
+    r = await client.post("/solicitudes/cotizar", headers=headers,
+                          json={"montos": [500], "plazos_meses": [6]})
+    assert r.status_code == 422
+    r = await client.post("/solicitudes/cotizar", json={"montos": [20_000], "plazos_meses": [6]})
+    assert r.status_code in (401, 403)
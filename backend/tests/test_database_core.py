@@ -2,7 +2,7 @@ import pytest
 from app.core import database
 
 class DummyClient:
-    def __init__(self, url): self.url = url
+    def __init__(self, url, **kwargs): self.url = url; self.kwargs = kwargs
     def __getitem__(self, name): return {"_db_name": name}
     def close(self): self.closed = True
 
@@ -23,3 +23,31 @@ async def test_get_client_and_database_caching(monkeypatch):
     db = await agen.__anext__()
     assert isinstance(db, dict)
     assert db["_db_name"]  # existe
+
+def test_opciones_cliente_desde_settings(monkeypatch):
+    monkeypatch.setattr(database.settings, "MONGODB_MAX_POOL_SIZE", 50)
+    monkeypatch.setattr(database.settings, "MONGODB_WAIT_QUEUE_TIMEOUT_MS", 2000)
+    monkeypatch.setattr(database.settings, "MONGODB_COMPRESSORS", "zstd, zlib")
+
+    opciones = database.opciones_cliente()
+    assert opciones["maxPoolSize"] == 50
+    assert opciones["waitQueueTimeoutMS"] == 2000
+    assert opciones["compressors"] == ["zstd", "zlib"]
+    assert "zlibCompressionLevel" in opciones
+    assert "maxIdleTimeMS" not in opciones
+    assert len(opciones["event_listeners"]) == 2
+
+def test_coleccion_lectura_aplica_preferencia():
+    from pymongo import ReadPreference
+
+    class Coleccion:
+        def with_options(self, **kwargs):
+            self.opciones = kwargs
+            return self
+
+    db = {"solicitudes_cdt": Coleccion()}
+    assert database.coleccion_lectura(db, "solicitudes_cdt") is db["solicitudes_cdt"]
+    col = database.coleccion_lectura(db, "solicitudes_cdt", "secondaryPreferred")
+    assert col.opciones["read_preference"] == ReadPreference.SECONDARY_PREFERRED
+    with pytest.raises(ValueError):
+        database.coleccion_lectura(db, "solicitudes_cdt", "cualquiera")
@@ -0,0 +1,54 @@
+import pytest
+
+from app.services.estadisticas import COLECCION, ID_GLOBAL, obtener_resumen, reconciliar
+
+@pytest.mark.asyncio
+async def test_contadores_siguen_creaciones_transiciones_y_eliminaciones(client, headers_cliente, headers_agente):
+    from app.main import app
+    db = app.state.test_db
+
+    await reconciliar(db)   # parte de los datos semilla
+    base = await obtener_resumen(db)
+    assert base["total"] == 3
+    assert base["por_estado"] == {"borrador": 1, "en_validacion": 1, "cancelada": 1}
+
+    r = await client.post("/solicitudes/", json={"monto": 2_000_000, "plazo_meses": 12}, headers=headers_cliente)
+    nueva = r.json()["id"]
+    await client.patch(f"/solicitudes/{nueva}/estado", params={"estado": "en_validacion"}, headers=headers_cliente)
+    await client.put(f"/solicitudes/agente/{nueva}/aprobar", headers=headers_agente)
+    await client.delete(f"/solicitudes/{nueva}", headers=headers_cliente)
+
+    r = await client.get("/solicitudes/agente/estadisticas", headers=headers_agente)
+    assert r.status_code == 200
+    js = r.json()
+    assert js["total"] == 4
+    assert js["eliminadas"] == 1
+    assert js["por_estado"] == {"borrador": 1, "en_validacion": 1, "cancelada": 1, "aprobada": 1}
+    assert js["monto_total"] == base["monto_total"] + 2_000_000
+    assert js["por_mes"][0]["solicitudes"] >= 1
+
+    # Los contadores incrementales coinciden con lo que recalcula la agregación
+    resultado = await reconciliar(db)
+    assert resultado["deriva"] == {"total": 0, "por_estado": {}}
+
+@pytest.mark.asyncio
+async def test_reconciliacion_corrige_deriva(client):
+    from app.main import app
+    db = app.state.test_db
+    await reconciliar(db)
+    stats = db[COLECCION].data
+    stats[ID_GLOBAL]["total"] += 7
+    stats[ID_GLOBAL]["por_estado"]["aprobada"] = 2
+    stats["mes:1999-01"] = {"_id": "mes:1999-01", "solicitudes": 5, "monto_total": 1, "suma_tasa": 1}
+
+    resultado = await reconciliar(db)
+    assert resultado["deriva"] == {"total": -7, "por_estado": {"aprobada": -2}}
+    resumen = await obtener_resumen(db)
+    assert resumen["total"] == 3
+    assert "aprobada" not in resumen["por_estado"]
+    assert "1999-01" not in [m["mes"] for m in resumen["por_mes"]]
+
+@pytest.mark.asyncio
+async def test_estadisticas_solo_para_agentes(client, headers_cliente):
+    r = await client.get("/solicitudes/agente/estadisticas", headers=headers_cliente)
+    assert r.status_code == 403
@@ -0,0 +1,164 @@
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+
+from app.services.eventos import DifusorCambios, flujo_sse, suscriptores_desconectados
+
+USUARIO = ObjectId()
+
+def _cambio(n, usuario_id=USUARIO, estado="borrador"):
+    return {
+        "_id": {"_data": f"token{n:04d}"},
+        "operationType": "update",
+        "fullDocument": {
+            "_id": ObjectId(), "usuario_id": usuario_id, "monto": 1_000_000,
+            "plazo_meses": 12, "tasa": 5.7, "estado": estado,
+        },
+    }
+
+async def _leer(flujo, n):
+    return [await asyncio.wait_for(flujo.__anext__(), 1) for _ in range(n)]
+
+@pytest.mark.asyncio
+async def test_cliente_recibe_solo_las_suyas_y_agente_todas():
+    difusor = DifusorCambios(tamano_buffer=10, tamano_cola=10)
+    cliente = difusor.suscribir(str(USUARIO))
+    agente = difusor.suscribir(None)
+
+    difusor.publicar(_cambio(1))
+    difusor.publicar(_cambio(2, usuario_id=ObjectId(), estado="en_validacion"))
+    assert cliente.cola.qsize() == 1
+    assert agente.cola.qsize() == 2
+
+    flujo = flujo_sse(cliente, difusor, keepalive=0.05)
+    retry, evento, keepalive = await _leer(flujo, 3)
+    assert retry.startswith(b"retry:")
+    cabecera, datos = evento.split(b"\ndata: ")
+    assert cabecera == b"id: token0001\nevent: solicitud"
+    assert json.loads(datos)["estado"] == "Borrador"   # forma del listado del cliente
+    assert keepalive == b": keepalive\n\n"
+
+    await flujo.aclose()
+    assert cliente not in difusor.suscriptores
+
+@pytest.mark.asyncio
+async def test_consumidor_lento_se_desconecta_sin_crecer():
+    difusor = DifusorCambios(tamano_buffer=10, tamano_cola=2)
+    lento = difusor.suscribir(None)
+    antes = suscriptores_desconectados.valor()
+
+    for n in range(5):
+        difusor.publicar(_cambio(n))
+    assert lento.cola.qsize() == 2
+    assert lento not in difusor.suscriptores
+    assert suscriptores_desconectados.valor() == antes + 1
+
+    # Entrega lo que alcanzó a encolar y cierra; el cliente reanuda desde token0001
+    mensajes = [m async for m in flujo_sse(lento, difusor, keepalive=0.05)]
+    assert [m.split(b"\n")[0] for m in mensajes[1:]] == [b"id: token0000", b"id: token0001"]
+
+    difusor.tamano_cola = 10
+    reanudado = difusor.suscribir(None, "token0001")
+    assert [reanudado.cola.get_nowait()[0] for _ in range(3)] == ["token0002", "token0003", "token0004"]
+
+@pytest.mark.asyncio
+async def test_last_event_id_fuera_del_buffer_pide_reiniciar():
+    difusor = DifusorCambios(tamano_buffer=2, tamano_cola=10)
+    for n in range(5):
+        difusor.publicar(_cambio(n))
+    suscriptor = difusor.suscribir(str(USUARIO), "token0000")
+    flujo = flujo_sse(suscriptor, difusor, keepalive=0.05)
+    _, mensaje = await _leer(flujo, 2)
+    assert mensaje == b"event: reiniciar\ndata: {}\n\n"
+    await flujo.aclose()
+
+class _Stream:
+    def __init__(self, cambios, error=None):
+        self.cambios, self.error = cambios, error
+    async def __aenter__(self): return self
+    async def __aexit__(self, *exc): return False
+    def __aiter__(self): return self
+    async def __anext__(self):
+        if self.cambios:
+            return self.cambios.pop(0)
+        if self.error:
+            raise self.error
+        await asyncio.sleep(3600)
+
+@pytest.mark.asyncio
+async def test_change_stream_se_reanuda_con_el_ultimo_token(monkeypatch):
+    import app.services.eventos as eventos
+    llamadas = []
+    streams = [_Stream([_cambio(1)], error=RuntimeError("red caída")), _Stream([_cambio(2)])]
+
+    class _Coleccion:
+        def watch(self, pipeline, **kwargs):
+            llamadas.append(kwargs["resume_after"])
+            return streams.pop(0)
+
+    monkeypatch.setattr(eventos.settings, "EVENTOS_REINTENTO_MAX_SEGUNDOS", 0)
+    difusor = DifusorCambios(tamano_buffer=10, tamano_cola=10)
+    agente = difusor.suscribir(None)
+    difusor.iniciar({"solicitudes_cdt": _Coleccion()})
+    try:
+        primero = await asyncio.wait_for(agente.cola.get(), 1)
+        segundo = await asyncio.wait_for(agente.cola.get(), 1)
+    finally:
+        await difusor.detener()
+    assert [primero[0], segundo[0]] == ["token0001", "token0002"]
+    assert llamadas == [None, {"_data": "token0001"}]
+
+@pytest.mark.asyncio
+async def test_token_fuera_del_historial_reinicia_desde_ahora(monkeypatch):
+    from pymongo.errors import OperationFailure
+    import app.services.eventos as eventos
+    llamadas = []
+
+    class _Coleccion:
+        def watch(self, pipeline, **kwargs):
+            llamadas.append(kwargs["resume_after"])
+            if kwargs["resume_after"] is not None:
+                raise OperationFailure("Resume token no encontrado en el historial", 286)
+            return _Stream([_cambio(2)])
+
+    monkeypatch.setattr(eventos.settings, "EVENTOS_REINTENTO_MAX_SEGUNDOS", 0)
+    difusor = DifusorCambios(tamano_buffer=10, tamano_cola=10)
+    difusor.publicar(_cambio(1))
+    agente = difusor.suscribir(None)
+    difusor.iniciar({"solicitudes_cdt": _Coleccion()})
+    try:
+        reinicio = await asyncio.wait_for(agente.cola.get(), 1)
+        siguiente = await asyncio.wait_for(agente.cola.get(), 1)
+    finally:
+        await difusor.detener()
+    assert reinicio == ("", {})
+    assert siguiente[0] == "token0002"
+    assert llamadas == [{"_data": "token0001"}, None]
+    assert [token for token, _ in difusor.buffer] == ["token0002"]
+
+@pytest.mark.asyncio
+async def test_eventos_requiere_token(client):
+    r = await client.get("/solicitudes/eventos")
+    assert r.status_code == 401
+
+@pytest.mark.asyncio
+async def test_token_de_eventos_solo_sirve_para_el_stream(client, headers_cliente):
+    from fastapi import HTTPException
+    from app.api.solicitudes_cdt import _principal_eventos
+
+    r = await client.post("/solicitudes/eventos/token", headers=headers_cliente)
+    assert r.status_code == 200
+    token = r.json()["token"]
+
+    # EventSource lo envía como ?token=
+    principal = await _principal_eventos(None, token)
+    assert principal.rol == "cliente"
+    # No reemplaza al token de sesión...
+    r = await client.get("/solicitudes/", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 401
+    # ...ni el token de sesión puede viajar en la URL
+    with pytest.raises(HTTPException) as exc:
+        await _principal_eventos(None, headers_cliente["Authorization"].split()[1])
+    assert exc.value.status_code == 401
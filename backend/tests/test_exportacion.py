@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.services.exportacion import COLUMNAS, exportar_solicitudes
+
+@pytest.mark.asyncio
+async def test_exportar_ndjson_y_csv_con_filtros(client, headers_cliente, headers_agente):
+
+    r = await client.get("/solicitudes/agente/exportar", headers=headers_agente)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert "attachment" in r.headers["content-disposition"]
+    filas = [json.loads(l) for l in r.text.splitlines()]
+    assert len(filas) == 3
+    assert set(filas[0]) == set(COLUMNAS)
+
+    r = await client.get("/solicitudes/agente/exportar", headers=headers_agente,
+                         params={"formato": "csv", "estado": "BORRADOR"})
+    filas = list(csv.reader(io.StringIO(r.text)))
+    assert filas[0] == COLUMNAS
+    assert len(filas) == 2 and filas[1][COLUMNAS.index("estado")] == "borrador"
+
+    r = await client.get("/solicitudes/agente/exportar", headers=headers_agente, params={"usuario_id": "x"})
+    assert r.status_code == 400
+
+    r = await client.get("/solicitudes/agente/exportar", headers=headers_cliente)
+    assert r.status_code == 403
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.getenv("MONGODB_TEST_URL"), reason="requiere un mongod local (MONGODB_TEST_URL)")
+async def test_exportar_un_millon_con_memoria_constante():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    cliente = AsyncIOMotorClient(os.environ["MONGODB_TEST_URL"])
+    db = cliente[f"neocdt_export_{os.getpid()}"]
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    usuario = ObjectId()
+    try:
+        for inicio in range(0, 1_000_000, 10_000):
+            await db["solicitudes_cdt"].insert_many([{
+                "usuario_id": usuario, "monto": 1_000_000 + i, "plazo_meses": 12, "tasa": 5.7,
+                "estado": "aprobada", "eliminada": False,
+                "fechaCreacion": base + timedelta(seconds=i), "fechaActualizacion": base,
+            } for i in range(inicio, inicio + 10_000)])
+
+        muestras, bytes_totales, bloques = [], 0, 0
+        async for bloque in exportar_solicitudes(db, {}, "ndjson", batch_size=1000):
+            bytes_totales += len(bloque)
+            bloques += 1
+            if bloques % 100 == 0:
+                muestras.append(_rss_mb())
+
+        assert bytes_totales > 100 * 2 ** 20          # ~1M líneas exportadas
+        referencia = muestras[len(muestras) // 10]    # tras calentar el cursor
+        assert max(muestras) - referencia < 32, muestras
+    finally:
+        await cliente.drop_database(db.name)
+        cliente.close()
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from app.core.idempotencia import COLECCION, consultas_idempotencia, huella, idempotencia
+from app.main import app
+
+@pytest.mark.asyncio
+async def test_reintento_de_crear_devuelve_la_misma_solicitud(client, headers_cliente):
+    db = app.state.test_db
+    antes = len(db["solicitudes_cdt"].data)
+    cabeceras = {**headers_cliente, "Idempotency-Key": "movil-123"}
+    cuerpo = {"monto": 500_000, "plazo_meses": 6}
+
+    r1 = await client.post("/solicitudes/", json=cuerpo, headers=cabeceras)
+    r2 = await client.post("/solicitudes/", json=cuerpo, headers=cabeceras)
+    assert (r1.status_code, r2.status_code) == (201, 201)
+    assert r1.json() == r2.json()
+    assert "Idempotent-Replayed" not in r1.headers and r2.headers["Idempotent-Replayed"] == "true"
+    assert len(db["solicitudes_cdt"].data) == antes + 1
+
+    # Otra réplica (LRU vacío) la encuentra en MongoDB
+    idempotencia.limpiar()
+    r3 = await client.post("/solicitudes/", json=cuerpo, headers=cabeceras)
+    assert r3.json() == r1.json() and len(db["solicitudes_cdt"].data) == antes + 1
+
+    # Misma clave con otro cuerpo: 422; sin clave se crea otra
+    r4 = await client.post("/solicitudes/", json={**cuerpo, "monto": 600_000}, headers=cabeceras)
+    assert r4.status_code == 422
+    await client.post("/solicitudes/", json=cuerpo, headers=headers_cliente)
+    assert len(db["solicitudes_cdt"].data) == antes + 2
+
+@pytest.mark.asyncio
+async def test_decision_del_agente_no_se_repite(client, headers_agente):
+    agente = {**headers_agente, "Idempotency-Key": "k1"}
+    db = app.state.test_db
+    sid = next(k for k, d in db["solicitudes_cdt"].data.items() if d["estado"] == "en_validacion")
+
+    r1 = await client.put(f"/solicitudes/agente/{sid}/aprobar", headers=agente)
+    r2 = await client.put(f"/solicitudes/agente/{sid}/aprobar", headers=agente)
+    assert r1.status_code == r2.status_code == 200
+    assert r2.json() == r1.json() and r1.json()["estado_anterior"] == "en_validacion"
+    # Sin la clave el segundo intento sí choca con el estado actual
+    r3 = await client.put(f"/solicitudes/agente/{sid}/aprobar", headers={"Authorization": agente["Authorization"]})
+    assert r3.status_code == 400
+
+@pytest.mark.asyncio
+async def test_reintentos_concurrentes_y_errores_transitorios():
+    db = app.state.test_db
+    llamadas = 0
+    liberar = asyncio.Event()
+
+    class Peticion:
+        method, headers = "POST", {"idempotency-key": "k"}
+        url = type("U", (), {"path": "/x", "query": ""})()
+        async def body(self):
+            return b"{}"
+
+    async def lento():
+        nonlocal llamadas
+        llamadas += 1
+        await liberar.wait()
+        return b'{"ok":true}'
+
+    tareas = [asyncio.ensure_future(idempotencia.respuesta(Peticion(), db, "u1", lento)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    liberar.set()
+    respuestas = await asyncio.gather(*tareas)
+    assert llamadas == 1 and {r.body for r in respuestas} == {b'{"ok":true}'}
+    assert consultas_idempotencia.valor(resultado="coalesced") >= 2
+
+    # Reserva en curso de otra réplica: 409; abandonada (vencida): se toma
+    db[COLECCION].data["u2:k"] = {"_id": "u2:k", "huella": huella(Peticion(), b"{}"), "estado": "en_curso",
+                                  "expira": datetime.now(timezone.utc) + timedelta(seconds=30)}
+    with pytest.raises(HTTPException) as exc:
+        await idempotencia.respuesta(Peticion(), db, "u2", lento)
+    assert exc.value.status_code == 409
+    db[COLECCION].data["u2:k"]["expira"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert (await idempotencia.respuesta(Peticion(), db, "u2", lento)).status_code == 200
+
+    # Un 503 libera la reserva: el reintento vuelve a ejecutar
+    async def caido():
+        raise HTTPException(status_code=503, detail="ocupado")
+    with pytest.raises(HTTPException):
+        await idempotencia.respuesta(Peticion(), db, "u3", caido)
+    assert "u3:k" not in db[COLECCION].data
+    assert (await idempotencia.respuesta(Peticion(), db, "u3", lento)).status_code == 200
+
+    # Respuesta vencida que el monitor TTL aún no borró: no se repite
+    db[COLECCION].data["u4:k"] = {"_id": "u4:k", "huella": "otra", "estado": "completa", "codigo": 200,
+                                  "cuerpo": b'"vieja"', "expira": datetime.now(timezone.utc) - timedelta(seconds=1)}
+    r = await idempotencia.respuesta(Peticion(), db, "u4", lento)
+    assert r.body == b'{"ok":true}' and "Idempotent-Replayed" not in r.headers
+    assert db[COLECCION].data["u4:k"]["estado"] == "completa"
+
+    # Otra réplica reserva la clave justo después de que el TTL la borró: 409, no 500
+    async def duplicada(*args, **kwargs):
+        raise DuplicateKeyError("E11000")
+    db[COLECCION].insert_one = duplicada
+    with pytest.raises(HTTPException) as exc:
+        await idempotencia.respuesta(Peticion(), db, "u5", lento)
+    assert exc.value.status_code == 409 and exc.value.headers["Retry-After"] == "1"
+
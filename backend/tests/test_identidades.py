@@ -0,0 +1,63 @@
+import pytest
+from bson import ObjectId
+from app.services.identidades import buscar_por_correo, buscar_por_id, migrar_identidades, pipeline_identidad
+
+class _ContarAgregaciones:
+    def __init__(self, coleccion):
+        self.coleccion = coleccion
+        self.llamadas = 0
+    def __getattr__(self, nombre):
+        return getattr(self.coleccion, nombre)
+    def aggregate(self, pipeline):
+        self.llamadas += 1
+        return self.coleccion.aggregate(pipeline)
+
+@pytest.mark.asyncio
+async def test_agente_y_cliente_se_resuelven_en_una_consulta():
+    from app.main import app
+    db = app.state.test_db
+    usuarios = _ContarAgregaciones(db.collections["usuarios"])
+    db.collections["usuarios"] = usuarios
+
+    agente = await buscar_por_correo(db, "admin@neocdt.banco.com")
+    assert agente["rol"] == "agente" and agente["tipo_coleccion"] == "agentes"
+
+    cliente = await buscar_por_correo(db, "jorge_andres.medina@uao.edu.co")
+    assert cliente["rol"] == "cliente" and cliente["tipo_coleccion"] == "usuarios"
+
+    assert await buscar_por_correo(db, "nadie@correo.com") is None
+    assert usuarios.llamadas == 3
+
+    por_id = await buscar_por_id(db, str(agente["_id"]))
+    assert por_id["correo"] == "admin@neocdt.banco.com"
+    assert "contraseña" not in por_id
+    assert await buscar_por_id(db, "no-es-un-id") is None
+
+@pytest.mark.asyncio
+async def test_migracion_completa_rol_y_reporta_duplicados():
+    from app.main import app
+    db = app.state.test_db
+    _id = ObjectId()
+    db["agentes"].data[str(_id)] = {"_id": _id, "nombre": "Doble",
+                                    "correo": "jorge_andres.medina@uao.edu.co", "activo": True}
+
+    resumen = await migrar_identidades(db)
+    assert "agentes.correo_unico" in resumen["indices_creados"]
+    assert resumen["agentes_con_rol_completado"] == 1
+    assert db["agentes"].data[str(_id)]["rol"] == "agente"
+    assert resumen["correos_en_ambas_colecciones"] == ["jorge_andres.medina@uao.edu.co"]
+
+@pytest.mark.asyncio
+async def test_correo_en_ambas_colecciones_resuelve_a_usuarios():
+    from app.main import app
+    db = app.state.test_db
+    _id = ObjectId()
+    db["agentes"].data[str(_id)] = {"_id": _id, "nombre": "Doble", "rol": "agente",
+                                    "correo": "jorge_andres.medina@uao.edu.co", "activo": True}
+
+    doc = await buscar_por_correo(db, "jorge_andres.medina@uao.edu.co")
+    assert doc["tipo_coleccion"] == "usuarios" and doc["rol"] == "cliente"
+    assert "_prioridad" not in doc
+    # La precedencia la fija el $sort, no el orden de salida de $unionWith
+    etapas = [next(iter(e)) for e in pipeline_identidad({"correo": "x"})]
+    assert etapas.index("$sort") < etapas.index("$limit")
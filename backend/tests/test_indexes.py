@@ -0,0 +1,31 @@
+import pytest
+from pymongo import IndexModel
+from app.core.indexes import (
+    CONSULTAS, Consulta, asegurar_indices, indices_faltantes, verificar_cobertura,
+)
+
+def test_todas_las_consultas_tienen_indice():
+    assert verificar_cobertura() == []
+
+def test_detecta_consulta_sin_indice():
+    consulta = Consulta("prueba", "solicitudes_cdt", igualdad=("monto",))
+    assert verificar_cobertura(consultas=CONSULTAS + [consulta]) == [consulta]
+
+    # El orden debe seguir a la igualdad en el índice
+    indices = {"solicitudes_cdt": [IndexModel([("fechaCreacion", -1), ("usuario_id", 1)])]}
+    listado = Consulta("listado", "solicitudes_cdt", igualdad=("usuario_id",),
+                       orden=(("fechaCreacion", -1),))
+    assert verificar_cobertura(indices, [listado]) == [listado]
+
+@pytest.mark.asyncio
+async def test_asegurar_indices_es_idempotente():
+    from app.main import app
+    db = app.state.test_db
+
+    assert "solicitudes_cdt.usuario_fecha" in await indices_faltantes(db)
+    creados = await asegurar_indices(db)
+    assert "usuarios.correo_unico" in creados
+    assert "solicitudes_cdt.estado_fecha" in creados
+
+    assert await asegurar_indices(db) == []
+    assert await indices_faltantes(db) == []
@@ -0,0 +1,67 @@
+import pytest
+
+import app.core.limites as limites
+from app.core.limites import BackendMemoria, BackendMongo, LimitadorLogin, Politica, intentos_rechazados
+from app.core.memoria import BaseMemoria
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [BackendMemoria(100), BackendMongo()])
+async def test_cubeta_admite_la_rafaga_y_recarga_al_ritmo(backend):
+    db = BaseMemoria()
+    politica = Politica(rafaga=3, por_minuto=6)   # una ficha cada 10 s
+    admitidos = [await backend.consumir(db, "k", politica, 1000.0) for _ in range(4)]
+    assert admitidos[:3] == [0.0, 0.0, 0.0]
+    assert admitidos[3] == pytest.approx(10.0)
+    # Consultar sin registrar no gasta fichas
+    assert await backend.consumir(db, "k", politica, 1010.0, registrar=False) == 0.0
+    assert await backend.consumir(db, "k", politica, 1010.0) == 0.0
+    assert await backend.consumir(db, "k", politica, 1010.0) == pytest.approx(10.0)
+    # Tras mucho tiempo la cubeta vuelve a estar llena, sin acumular de más
+    assert [await backend.consumir(db, "k", politica, 5000.0) for _ in range(4)][-1] == pytest.approx(10.0)
+
+@pytest.mark.asyncio
+async def test_login_limitado_por_ip_antes_de_bcrypt(client, monkeypatch):
+    monkeypatch.setattr(limites.limitador_login, "por_ip", Politica(rafaga=2, por_minuto=1))
+    verificaciones = 0
+
+    async def verificar(plain, hashed):
+        nonlocal verificaciones
+        verificaciones += 1
+        return False
+    monkeypatch.setattr("app.api.auth.verify_password_async", verificar)
+    rechazos = intentos_rechazados.valor(motivo="ip")
+
+    codigos = []
+    for _ in range(3):
+        r = await client.post("/auth/login", json={"correo": "jorge_andres.medina@uao.edu.co",
+                                                   "contraseña": "x"})
+        codigos.append(r.status_code)
+    assert codigos == [401, 401, 429]
+    assert r.headers["Retry-After"] == "60"
+    assert verificaciones == 2
+    assert intentos_rechazados.valor(motivo="ip") == rechazos + 1
+
+@pytest.mark.asyncio
+async def test_fallos_por_correo_bloquean_la_cuenta_pero_no_otras(client, monkeypatch):
+    monkeypatch.setattr(limites.limitador_login, "por_correo", Politica(rafaga=2, por_minuto=1))
+    correo = "jorge_andres.medina@uao.edu.co"
+    # Los aciertos no gastan fichas del correo
+    for _ in range(3):
+        r = await client.post("/auth/login", json={"correo": correo, "contraseña": "MedinaInge519"})
+        assert r.status_code == 200
+    for _ in range(2):
+        r = await client.post("/auth/login", json={"correo": correo, "contraseña": "mala"})
+        assert r.status_code == 401
+    r = await client.post("/auth/token", data={"username": correo.upper(), "password": "MedinaInge519"})
+    assert r.status_code == 429
+    r = await client.post("/auth/login", json={"correo": "admin@neocdt.banco.com", "contraseña": "admin"})
+    assert r.status_code == 200
+
+@pytest.mark.asyncio
+async def test_backend_caido_deja_pasar():
+    class Caido:
+        async def consumir(self, *args):
+            raise ConnectionError("sin servidor")
+    limitador = LimitadorLogin(Caido(), Politica(1, 1), Politica(1, 1))
+    await limitador.verificar(None, "1.2.3.4", "a@b.co")
+    await limitador.verificar(None, "1.2.3.4", "a@b.co")
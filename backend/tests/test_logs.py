@@ -0,0 +1,35 @@
+import io
+import json
+import logging
+from app.core.config import settings
+from app.core.logs import configurar_logging, detener_logging
+
+class _Caro:
+    """Objeto cuyo formateo se cuenta para comprobar la evaluación perezosa."""
+    def __init__(self):
+        self.formateos = 0
+    def __str__(self):
+        self.formateos += 1
+        return "doc"
+
+def test_json_por_cola_y_niveles_por_modulo():
+    salida = io.StringIO()
+    configurar_logging("INFO", "app.ruidoso=ERROR", "json", destino=salida)
+    try:
+        caro = _Caro()
+        logging.getLogger("app.services.x").debug("Documento %s", caro)
+        logging.getLogger("app.ruidoso").warning("silenciado")
+        logging.getLogger("app.services.x").info("Creada %s", caro, extra={"usuario": "u1"})
+    finally:
+        detener_logging()  # vacía la cola antes de leer
+
+    lineas = [json.loads(l) for l in salida.getvalue().splitlines()]
+    assert caro.formateos == 1  # el debug deshabilitado nunca se formateó
+    assert len(lineas) == 1
+    assert lineas[0]["mensaje"] == "Creada doc"
+    assert lineas[0]["nivel"] == "INFO"
+    assert lineas[0]["logger"] == "app.services.x"
+    assert lineas[0]["usuario"] == "u1"
+
+    logging.getLogger("app.ruidoso").setLevel(logging.NOTSET)
+    configurar_logging(settings.LOG_LEVEL, settings.LOG_LEVELS, settings.LOG_FORMAT)
@@ -2,6 +2,7 @@ import pytest
 from app import main as main_mod
 
 class DummyClient:
+    def __getitem__(self, name): return {}
     def close(self): self.closed = True
 
 @pytest.mark.asyncio
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.core.indexes import asegurar_indices
+from app.core.memoria import BaseMemoria, ClienteMemoria
+
+async def _coleccion_indexada():
+    col = BaseMemoria()["solicitudes_cdt"]
+    await col.create_indexes([
+        IndexModel([("estado", ASCENDING), ("fechaCreacion", DESCENDING)], name="estado_fecha"),
+        IndexModel([("monto", ASCENDING)], name="monto"),
+        IndexModel([("claves", ASCENDING)], name="claves"),
+    ])
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    await col.insert_many([
+        {"estado": ["borrador", "en_validacion", "aprobada"][i % 3], "monto": i * 1000,
+         "fechaCreacion": base + timedelta(hours=i), "claves": [f"palabra{i % 7}", "cdt"]}
+        for i in range(300)
+    ])
+    return col
+
+@pytest.mark.asyncio
+async def test_consultas_usan_indices_y_coinciden_con_un_recorrido_completo():
+    col = await _coleccion_indexada()
+    consultas = [
+        {"estado": "aprobada"},
+        {"estado": {"$in": ["borrador", "aprobada"]}, "monto": {"$gte": 50_000}},
+        {"monto": {"$gt": 10_000, "$lte": 20_000}},
+        {"claves": {"$regex": "^palabra3"}},
+        {"$or": [{"estado": "borrador"}, {"monto": {"$lt": 5000}}]},
+        {"$and": [{"monto": {"$gte": 100_000}}, {"estado": {"$ne": "borrador"}}]},
+    ]
+    for filtro in consultas:
+        plan = await col.find(filtro).explain()
+        stats = plan["executionStats"]
+        assert plan["queryPlanner"]["winningPlan"]["stage"] != "COLLSCAN", filtro
+        assert stats["totalDocsExamined"] < 300, filtro
+
+        # Mismo resultado que sin índices
+        sin_indices = BaseMemoria()["c"]
+        for doc in col.data.values():
+            sin_indices.data[str(doc["_id"])] = doc
+        esperado = {d["_id"] for d in await sin_indices.find(filtro).to_list(None)}
+        assert {d["_id"] for d in await col.find(filtro).to_list(None)} == esperado
+        assert await col.count_documents(filtro) == len(esperado)
+
+    recientes = await col.find({"estado": "aprobada"}, {"fechaCreacion": 1, "_id": 0}) \
+        .sort("fechaCreacion", -1).limit(3).to_list(None)
+    assert [d["fechaCreacion"].hour for d in recientes] == [11, 8, 5]
+    assert set(recientes[0]) == {"fechaCreacion"}
+
+@pytest.mark.asyncio
+async def test_rangos_y_prefijos_examinan_solo_las_claves_del_rango():
+    col = BaseMemoria()["c"]
+    await col.create_index("monto")
+    await col.create_index("codigo")
+    await col.insert_many([{"monto": i, "codigo": f"c{i:05d}"} for i in range(20_000)])
+
+    for filtro, esperado in [
+        ({"monto": {"$gte": 10, "$lt": 20}}, set(range(10, 20))),
+        ({"monto": {"$gt": 19_995}}, set(range(19_996, 20_000))),
+        ({"codigo": {"$regex": "^c0001"}}, set(range(10, 20))),
+    ]:
+        plan = await col.find(filtro).explain()
+        assert plan["queryPlanner"]["winningPlan"]["stage"] == "IXSCAN", filtro
+        assert plan["executionStats"]["totalKeysExamined"] == len(esperado), filtro
+        assert {d["monto"] for d in await col.find(filtro).to_list(None)} == esperado
+
+@pytest.mark.asyncio
+async def test_indice_se_mantiene_al_actualizar_y_borrar():
+    col = await _coleccion_indexada()
+    doc = await col.find_one({"monto": 4000})   # en_validacion
+    await col.update_one({"_id": doc["_id"]}, {"$set": {"monto": 999_999}, "$addToSet": {"claves": "nueva"}})
+    assert await col.count_documents({"monto": 4000}) == 0
+    assert (await col.find_one({"monto": 999_999}))["_id"] == doc["_id"]
+    assert await col.count_documents({"claves": "nueva"}) == 1
+
+    borrados = await col.delete_many({"estado": "borrador"})
+    assert borrados.deleted_count == 100
+    assert col.indices["estado_fecha"].buscar("borrador") == set()
+    # Las lecturas son copias: modificarlas no toca lo guardado
+    (await col.find_one({"monto": 999_999}))["monto"] = 1
+    assert await col.count_documents({"monto": 999_999}) == 1
+
+@pytest.mark.asyncio
+async def test_unicidad_upsert_y_find_one_and_update():
+    db = BaseMemoria()
+    await asegurar_indices(db)   # los índices reales de la aplicación
+    await db["usuarios"].insert_one({"correo": "a@x.co", "intentos": 0})
+    with pytest.raises(DuplicateKeyError):
+        await db["usuarios"].insert_one({"correo": "a@x.co"})
+
+    r = await db["usuarios"].update_one({"correo": "b@x.co"}, {"$set": {"nombre": "B"},
+                                        "$setOnInsert": {"intentos": 0}}, upsert=True)
+    assert r.upserted_id is not None and r.matched_count == 0
+    nuevo = await db["usuarios"].find_one({"_id": r.upserted_id})
+    assert nuevo == {"_id": r.upserted_id, "correo": "b@x.co", "nombre": "B", "intentos": 0}
+
+    despues = await db["usuarios"].find_one_and_update(
+        {"correo": "a@x.co"}, {"$inc": {"intentos": 2}}, return_document=ReturnDocument.AFTER)
+    assert despues["intentos"] == 2
+    with pytest.raises(DuplicateKeyError):
+        await db["usuarios"].update_one({"correo": "b@x.co"}, {"$set": {"correo": "a@x.co"}})
+
+@pytest.mark.asyncio
+async def test_bulk_write_informa_conteos_y_errores():
+    col = BaseMemoria()["c"]
+    await col.create_index([("k", ASCENDING)], unique=True)
+    ids = (await col.insert_many([{"k": i, "v": 0} for i in range(3)])).inserted_ids
+    r = await col.bulk_write([
+        UpdateOne({"k": 0}, {"$inc": {"v": 1}}),
+        UpdateOne({"k": 9}, {"$set": {"v": 5}}, upsert=True),
+        ReplaceOne({"_id": ids[2]}, {"k": 2, "v": 7}),
+    ])
+    assert (r.matched_count, r.modified_count, r.upserted_count) == (2, 2, 1)
+    assert await col.count_documents({"v": {"$gt": 0}}) == 3
+
+    with pytest.raises(BulkWriteError) as exc:
+        await col.bulk_write([UpdateOne({"k": 1}, {"$set": {"k": 0}}), UpdateOne({"k": 1}, {"$set": {"v": 3}})])
+    assert exc.value.details["writeErrors"][0]["index"] == 0
+    assert (await col.find_one({"k": 1}))["v"] == 0   # ordered: se detiene en el primer error
+
+@pytest.mark.asyncio
+async def test_cliente_carga_semilla_y_emite_cambios(tmp_path):
+    semilla = tmp_path / "semilla.json"
+    semilla.write_text('{"agentes": [{"_id": {"$oid": "650000000000000000000001"}, "correo": "x@y.co"}]}')
+    db = ClienteMemoria(str(semilla), "neocdt").get_database("neocdt")
+    assert (await db["agentes"].find_one({"correo": "x@y.co"}))["_id"] == ObjectId("650000000000000000000001")
+    assert await db.command("ping") == {"ok": 1.0}
+
+    flujo = db["solicitudes_cdt"].watch(full_document="updateLookup")
+    r = await db["solicitudes_cdt"].insert_one({"estado": "borrador"})
+    await db["solicitudes_cdt"].update_one({"_id": r.inserted_id}, {"$set": {"estado": "en_validacion"}})
+    primero = await flujo.__anext__()
+    segundo = await flujo.__anext__()
+    assert (primero["operationType"], segundo["operationType"]) == ("insert", "update")
+    assert segundo["fullDocument"]["estado"] == "en_validacion"
+
+    reanudado = db["solicitudes_cdt"].watch(resume_after=primero["_id"])
+    assert (await reanudado.__anext__())["_id"] == segundo["_id"]
+    await flujo.close()
+    await reanudado.close()
@@ -0,0 +1,76 @@
+import pytest
+from types import SimpleNamespace
+
+from app.core import metrics
+from app.core.metrics import ComandosMongoListener, Registro
+
+def test_histograma_expone_buckets_acumulados():
+    reg = Registro()
+    h = reg.histograma("latencia", "Latencia", ("ruta",), buckets=(0.1, 1.0))
+    h.observe(0.05, ruta="/a")
+    h.observe(0.5, ruta="/a")
+
+    texto = reg.exponer()
+    assert "# TYPE latencia histogram" in texto
+    assert 'latencia_bucket{ruta="/a",le="0.1"} 1' in texto
+    assert 'latencia_bucket{ruta="/a",le="1.0"} 2' in texto
+    assert 'latencia_bucket{ruta="/a",le="+Inf"} 2' in texto
+    assert 'latencia_count{ruta="/a"} 2' in texto
+
+def test_registro_es_idempotente_y_escapa_etiquetas():
+    reg = Registro()
+    c1 = reg.contador("eventos_total", "Eventos", ("tipo",))
+    c2 = reg.contador("eventos_total", "Eventos", ("tipo",))
+    assert c1 is c2
+    c1.inc(tipo='con "comillas"')
+    assert 'eventos_total{tipo="con \\"comillas\\""} 1.0' in reg.exponer()
+
+def test_listener_mongo_cuenta_por_coleccion_y_operacion():
+    listener = ComandosMongoListener()
+    antes = metrics.mongo_comandos.valor(coleccion="solicitudes_cdt", operacion="find", resultado="ok")
+
+    listener.started(SimpleNamespace(
+        command={"find": "solicitudes_cdt", "filter": {}}, command_name="find", request_id=1, operation_id=1))
+    listener.succeeded(SimpleNamespace(command_name="find", request_id=1, operation_id=1, duration_micros=2500))
+
+    listener.started(SimpleNamespace(
+        command={"getMore": 123, "collection": "solicitudes_cdt"}, command_name="getMore", request_id=2, operation_id=1))
+    listener.failed(SimpleNamespace(command_name="getMore", request_id=2, operation_id=1, duration_micros=100))
+
+    assert metrics.mongo_comandos.valor(coleccion="solicitudes_cdt", operacion="find", resultado="ok") == antes + 1
+    assert metrics.mongo_comandos.valor(coleccion="solicitudes_cdt", operacion="getMore", resultado="error") >= 1
+    assert metrics.mongo_duracion.conteo(coleccion="solicitudes_cdt", operacion="find") >= 1
+
+@pytest.mark.asyncio
+async def test_endpoint_metrics_usa_plantilla_de_ruta(client):
+    login = await client.post("/auth/login", json={
+        "correo": "jorge_andres.medina@uao.edu.co", "contraseña": "MedinaInge519"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    await client.get("/solicitudes/", headers=headers)
+    await client.delete("/solicitudes/000000000000000000000000", headers=headers)
+
+    r = await client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    texto = r.text
+    assert 'http_requests_total{metodo="GET",ruta="/solicitudes/",estado="200"}' in texto
+    assert 'ruta="/solicitudes/{solicitud_id}"' in texto
+    assert "000000000000000000000000" not in texto
+    assert "http_requests_in_flight" in texto
+    assert "bcrypt_pool_pendientes" in texto
+
+def test_listener_pool_conexiones():
+    from app.core.metrics import PoolMongoListener
+    listener = PoolMongoListener()
+    en_uso = metrics.pool_en_uso.valor()
+    esperas = metrics.pool_espera.conteo()
+
+    listener.connection_created(SimpleNamespace())
+    listener.connection_checked_out(SimpleNamespace(duration=0.002))
+    assert metrics.pool_en_uso.valor() == en_uso + 1
+    assert metrics.pool_espera.conteo() == esperas + 1
+
+    listener.connection_checked_in(SimpleNamespace())
+    listener.connection_check_out_failed(SimpleNamespace(reason="timeout", duration=1.0))
+    assert metrics.pool_en_uso.valor() == en_uso
+    assert metrics.pool_fallos.valor(motivo="timeout") >= 1
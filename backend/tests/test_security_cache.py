@@ -0,0 +1,41 @@
+import time
+import pytest
+from fastapi import HTTPException
+from app.core import security
+from app.core.security import CacheTokens, token_cache, verificar_token
+from app.schemas.auth import Principal
+from app.services.auth import create_access_token
+
+def test_token_verificado_se_sirve_desde_cache(monkeypatch):
+    token = create_access_token({"sub": "656565656565656565656565", "correo": "a@b.co", "rol": "agente"})
+    llamadas = []
+    original = security.jwt.decode
+    def contar(*args, **kwargs):
+        llamadas.append(1)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(security.jwt, "decode", contar)
+
+    p1 = verificar_token(token)
+    p2 = verificar_token(token)
+    assert p1 == p2 == Principal(id="656565656565656565656565", correo="a@b.co", rol="agente")
+    assert len(llamadas) == 1
+
+def test_token_invalido_no_se_cachea():
+    n = len(token_cache)
+    with pytest.raises(HTTPException) as exc:
+        verificar_token("abc.def.ghi")
+    assert exc.value.status_code == 401
+    assert len(token_cache) == n
+
+def test_cache_acotada_y_con_expiracion():
+    cache = CacheTokens(max_entradas=2)
+    p = Principal(id="x")
+    cache.guardar(b"a", p, time.time() + 60)
+    cache.guardar(b"b", p, time.time() + 60)
+    cache.obtener(b"a")                       # "a" pasa a ser la más reciente
+    cache.guardar(b"c", p, time.time() + 60)
+    assert cache.obtener(b"b") is None        # expulsada por LRU
+    assert cache.obtener(b"a") == p
+
+    cache.guardar(b"vieja", p, time.time() - 1)
+    assert cache.obtener(b"vieja") is None
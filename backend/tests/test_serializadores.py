@@ -0,0 +1,43 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.schemas.solicitudes_cdt_agente import SolicitudAgenteDB
+from app.services import serializadores
+from app.services.serializadores import a_json, solicitud_agente, solicitud_normalizada
+
+def _doc(**extra):
+    fecha = datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    doc = {"_id": ObjectId(), "usuario_id": ObjectId(), "monto": 2_000_000, "plazo_meses": 12,
+           "tasa": 5.9, "estado": "en_validacion", "fechaCreacion": fecha, "fechaActualizacion": fecha}
+    doc.update(extra)
+    return doc
+
+def test_solicitud_normalizada_estados_y_fechas():
+    doc = _doc()
+    out = solicitud_normalizada(doc)
+    assert out["estado"] == "En validación"
+    assert out["fechaCreacion"] == doc["fechaCreacion"].isoformat()
+    assert out["id"] == str(doc["_id"])
+    assert "_id" in doc  # no muta el documento
+
+    assert solicitud_normalizada(_doc(estado="otro"))["estado"] == "otro"
+    sin_estado = _doc()
+    del sin_estado["estado"]
+    assert solicitud_normalizada(sin_estado)["estado"] == "Desconocido"
+
+def test_solicitud_agente_igual_a_pydantic():
+    doc = _doc()
+    rapido = json.loads(a_json([solicitud_agente(doc)]))
+    modelo = SolicitudAgenteDB(**solicitud_agente(doc)).model_dump(mode="json")
+    assert rapido == [modelo]
+
+def test_respaldo_sin_orjson_produce_mismo_json(monkeypatch):
+    datos = {"items": [solicitud_agente(_doc())], "total": 1, "next_cursor": None}
+    con_orjson = a_json(datos)
+    monkeypatch.setattr(serializadores, "orjson", None)
+    assert json.loads(a_json(datos)) == json.loads(con_orjson)
+    with pytest.raises(TypeError):
+        a_json({"x": object()})
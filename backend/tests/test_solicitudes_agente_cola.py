@@ -0,0 +1,65 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+
+def _sembrar_cola(db, n):
+    usuario = next(iter(db["usuarios"].data.values()))["_id"]
+    base = datetime.now(timezone.utc) - timedelta(days=30)
+    for i in range(n):
+        _id = ObjectId()
+        db["solicitudes_cdt"].data[str(_id)] = {
+            "_id": _id, "usuario_id": usuario, "monto": 100000 + i,
+            "plazo_meses": 6, "tasa": 6.0, "estado": "aprobada" if i % 2 else "en_validacion",
+            "fechaCreacion": base + timedelta(days=i), "fechaActualizacion": base,
+            "eliminada": False, "motivo_rechazo": None,
+        }
+
+@pytest.mark.asyncio
+async def test_cola_paginada_mas_antiguas_primero(client, headers_agente):
+    from app.main import app
+    _sembrar_cola(app.state.test_db, 5)
+
+    r1 = await client.get("/solicitudes/agente/pendientes?limit=4", headers=headers_agente)
+    assert r1.status_code == 200
+    assert r1.headers["X-Has-More"] == "true"
+    items = r1.json()
+    assert len(items) == 4
+    fechas = [it["fechaCreacion"] for it in items]
+    assert fechas == sorted(fechas)
+    assert "motivo_rechazo" not in items[0]
+
+    r2 = await client.get("/solicitudes/agente/pendientes?limit=4&page=2", headers=headers_agente)
+    assert r2.headers["X-Has-More"] == "false"
+    ids = {it["id"] for it in items} | {it["id"] for it in r2.json()}
+    assert len(ids) == 6  # 5 sembradas + 1 en_validacion de conftest
+
+@pytest.mark.asyncio
+async def test_cola_sin_paginar_devuelve_todo(client, headers_agente):
+    from app.main import app
+    _sembrar_cola(app.state.test_db, 120)
+
+    # El panel pide la cola sin parámetros y no lee X-Has-More
+    r = await client.get("/solicitudes/agente/pendientes", headers=headers_agente)
+    assert r.headers["X-Has-More"] == "false"
+    items = r.json()
+    assert len(items) == 121
+    assert sum(it["estado"] == "en_validacion" for it in items) == 61
+
+    r2 = await client.get("/solicitudes/agente/pendientes?page=2", headers=headers_agente)
+    assert len(r2.json()) == 50 and r2.headers["X-Has-More"] == "true"
+
+@pytest.mark.asyncio
+async def test_cola_filtra_por_estado_y_fecha(client, headers_agente):
+    from app.main import app
+    _sembrar_cola(app.state.test_db, 5)
+
+    r = await client.get("/solicitudes/agente/pendientes?estado=aprobada", headers=headers_agente)
+    assert [it["estado"] for it in r.json()] == ["aprobada", "aprobada"]
+
+    hasta = (datetime.now(timezone.utc) - timedelta(days=10)).isoformat()
+    r2 = await client.get("/solicitudes/agente/pendientes",
+                          params={"hasta": hasta}, headers=headers_agente)
+    assert len(r2.json()) == 5
+
+    r3 = await client.get("/solicitudes/agente/pendientes?estado=borrador", headers=headers_agente)
+    assert r3.status_code == 400
@@ -0,0 +1,49 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_paginacion_por_cursor_recorre_todo_sin_repetir(client):
+    login = await client.post("/auth/login", json={
+        "correo": "jorge_andres.medina@uao.edu.co", "contraseña": "MedinaInge519"})
+    token = login.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for monto in (110000, 120000, 130000, 140000):
+        r = await client.post("/solicitudes/", headers=headers,
+                              json={"monto": monto, "plazo_meses": 6})
+        assert r.status_code == 201
+
+    # Primera página por page/limit: trae next_cursor
+    r1 = await client.get("/solicitudes/?limit=3", headers=headers)
+    js = r1.json()
+    assert js["total"] == 7
+    assert len(js["items"]) == 3
+    assert js["next_cursor"]
+
+    vistos = [it["id"] for it in js["items"]]
+    cursor = js["next_cursor"]
+    while cursor:
+        r = await client.get(f"/solicitudes/?limit=3&cursor={cursor}&conteo=ninguno",
+                             headers=headers)
+        assert r.status_code == 200
+        js = r.json()
+        assert js["total"] is None
+        vistos.extend(it["id"] for it in js["items"])
+        cursor = js["next_cursor"]
+
+    assert len(vistos) == 7
+    assert len(set(vistos)) == 7
+
+@pytest.mark.asyncio
+async def test_cursor_invalido_y_conteo_estimado(client):
+    login = await client.post("/auth/login", json={
+        "correo": "jorge_andres.medina@uao.edu.co", "contraseña": "MedinaInge519"})
+    token = login.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    r = await client.get("/solicitudes/?cursor=no-es-un-cursor", headers=headers)
+    assert r.status_code == 400
+
+    r2 = await client.get("/solicitudes/?conteo=estimado", headers=headers)
+    assert r2.status_code == 200
+    assert r2.json()["total"] == 3
+    assert r2.json()["total_estimado"] is False
@@ -0,0 +1,58 @@
+import pytest
+from bson import ObjectId
+
+@pytest.mark.asyncio
+async def test_crear_lote_con_resultados_por_elemento(client, headers_cliente):
+    from app.main import app
+    antes = len(app.state.test_db["solicitudes_cdt"].data)
+
+    r = await client.post("/solicitudes/lote", headers=headers_cliente, json={"solicitudes": [
+        {"monto": 1_000_000, "plazo_meses": 12},
+        {"monto": 5_000, "plazo_meses": 6},
+        {"monto": 20_000_000, "plazo_meses": 24},
+    ]})
+    assert r.status_code == 207
+    js = r.json()
+    assert js["creadas"] == 2
+    assert [it["estado"] for it in js["resultados"]] == [201, 400, 201]
+    assert js["resultados"][0]["solicitud"]["estado"] == "Borrador"
+    assert js["resultados"][1]["detalle"] == "Monto mínimo es 10000"
+    assert len(app.state.test_db["solicitudes_cdt"].data) == antes + 2
+
+    r = await client.post("/solicitudes/lote", headers=headers_cliente,
+                          json={"solicitudes": [{"monto": 20_000, "plazo_meses": 6}] * 501})
+    assert r.status_code == 422
+
+@pytest.mark.asyncio
+async def test_decisiones_lote_respetan_reglas_de_estado(client, headers_cliente, headers_agente):
+    from app.main import app
+    db = app.state.test_db
+
+    por_estado = {d["estado"]: str(d["_id"]) for d in db["solicitudes_cdt"].data.values()}
+    r = await client.post("/solicitudes/lote", headers=headers_cliente, json={"solicitudes": [
+        {"monto": 1_000_000, "plazo_meses": 12}]})
+    nueva = r.json()["resultados"][0]["solicitud"]["id"]
+    await client.patch(f"/solicitudes/{nueva}/estado", params={"estado": "en_validacion"}, headers=headers_cliente)
+
+    decisiones = [
+        {"id": por_estado["en_validacion"], "accion": "aprobar"},
+        {"id": nueva, "accion": "rechazar", "motivo": "Documentos incompletos"},
+        {"id": por_estado["borrador"], "accion": "aprobar"},
+        {"id": str(ObjectId()), "accion": "aprobar"},
+        {"id": "no-es-un-id", "accion": "aprobar"},
+        {"id": por_estado["en_validacion"], "accion": "rechazar", "motivo": "Repetida"},
+        {"id": por_estado["cancelada"], "accion": "rechazar"},
+    ]
+    r = await client.post("/solicitudes/agente/decisiones", headers=headers_agente, json={"decisiones": decisiones})
+    assert r.status_code == 207
+    js = r.json()
+    assert [it["estado"] for it in js] == [200, 200, 400, 404, 400, 400, 400]
+    assert js[0]["resultado"]["estado_anterior"] == "en_validacion"
+    assert js[0]["resultado"]["estado_nuevo"] == "aprobada"
+    assert js[1]["resultado"]["comentario"] == "Documentos incompletos"
+    assert js[2]["detalle"] == "Solo se pueden aprobar solicitudes en validación"
+    assert db["solicitudes_cdt"].data[nueva]["motivo_rechazo"] == "Documentos incompletos"
+    assert db["solicitudes_cdt"].data[por_estado["borrador"]]["estado"] == "borrador"
+
+    r = await client.post("/solicitudes/agente/decisiones", headers=headers_cliente, json={"decisiones": decisiones})
+    assert r.status_code == 403
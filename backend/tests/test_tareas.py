@@ -0,0 +1,62 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from app.core.tareas import REPLICA_ID, TareaPeriodica, adquirir_lease
+from app.services.solicitudes_cdt import actualizar_solicitudes_vencidas
+
+def _sembrar_borradores(db, n, horas=30):
+    usuario = next(iter(db["usuarios"].data.values()))["_id"]
+    for _ in range(n):
+        _id = ObjectId()
+        db["solicitudes_cdt"].data[str(_id)] = {
+            "_id": _id, "usuario_id": usuario, "monto": 100000, "plazo_meses": 6,
+            "tasa": 6.0, "estado": "borrador", "eliminada": False,
+            "fechaCreacion": datetime.now(timezone.utc) - timedelta(hours=horas),
+            "fechaActualizacion": datetime.now(timezone.utc) - timedelta(hours=horas),
+        }
+
+@pytest.mark.asyncio
+async def test_barrido_por_lotes_respeta_max_lotes():
+    from app.main import app
+    db = app.state.test_db
+    _sembrar_borradores(db, 4)  # + 1 borrador de 2 días en conftest
+
+    res = await actualizar_solicitudes_vencidas(db, lote=2, max_lotes=2)
+    assert res == {"procesadas": 4, "lotes": 2}
+    quedan = [d for d in db["solicitudes_cdt"].data.values() if d["estado"] == "borrador"]
+    assert len(quedan) == 1
+
+    res2 = await actualizar_solicitudes_vencidas(db, lote=2)
+    assert res2 == {"procesadas": 1, "lotes": 1}
+
+@pytest.mark.asyncio
+async def test_lease_solo_lo_tiene_una_replica():
+    from app.main import app
+    db = app.state.test_db
+
+    assert await adquirir_lease(db, "barrido", "replica-a", 60) is True
+    assert await adquirir_lease(db, "barrido", "replica-b", 60) is False
+    assert await adquirir_lease(db, "barrido", "replica-a", 60) is True  # renovación
+
+    db["tareas_lease"].data["barrido"]["expira"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert await adquirir_lease(db, "barrido", "replica-b", 60) is True
+
+@pytest.mark.asyncio
+async def test_tarea_registra_conteos_y_duracion():
+    from app.main import app
+    db = app.state.test_db
+
+    async def sweep(db):
+        return await actualizar_solicitudes_vencidas(db, lote=10)
+    tarea = TareaPeriodica("barrido_prueba", sweep, intervalo=60, duracion_lease=30)
+
+    registro = await tarea.ejecutar_una_vez(db)
+    assert registro["procesadas"] == 1
+    assert registro["replica"] == REPLICA_ID
+    assert registro["duracion_ms"] >= 0
+    guardados = list(db["tareas_ejecuciones"].data.values())
+    assert guardados[0]["tarea"] == "barrido_prueba"
+
+    # Otra réplica con el lease tomado no ejecuta
+    db["tareas_lease"].data["barrido_prueba"]["dueno"] = "otra-replica"
+    assert await tarea.ejecutar_una_vez(db) is None
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from app.core.tareas import TareaPeriodica
+from app.services import tasas
+from app.services.tasas import TABLA_INICIAL, TablaTasas, publicar_tabla, registro_tasas
+
+TABLA_ESCALONADA = {
+    "descripcion": "Plazos largos pagan menos por año; montos grandes más por millón",
+    "base": 4.5,
+    "tope": 11.5,
+    "plazo": {"unidad": 12, "tramos": [{"desde": 0, "factor": 0.6}, {"desde": 24, "factor": 0.3}]},
+    "monto": {"unidad": 1_000_000, "tramos": [{"desde": 50_000_000, "factor": 0.1}, {"desde": 0, "factor": 0.25}]},
+}
+
+@pytest.fixture(autouse=True)
+def _restaurar_tabla():
+    original = registro_tasas.tabla
+    yield
+    registro_tasas.tabla = original
+
+def _formula_original(monto, plazo_meses):
+    tasa = 5 + (plazo_meses / 12) * 0.5 + (monto / 1_000_000) * 0.2
+    return round(min(tasa, 12), 2)
+
+def test_tabla_inicial_reproduce_la_formula():
+    tabla = TablaTasas.desde_documento(TABLA_INICIAL)
+    rnd = random.Random(7)
+    for _ in range(20_000):
+        m, p = rnd.randint(10_000, 400_000_000), rnd.randint(1, 120)
+        esperado = _formula_original(m, p)
+        obtenido = tabla.calcular(m, p)
+        assert type(obtenido) is type(esperado) and repr(obtenido) == repr(esperado)
+
+def test_tramos_son_continuos_y_lote_coincide():
+    pytest.importorskip("numpy")
+    tabla = TablaTasas.desde_documento({"_id": 9, **TABLA_ESCALONADA})
+    # 24 meses: 2 años a 0.6; 36 meses: + 1 año a 0.3
+    assert tabla.plazo.aporte(24) == pytest.approx(1.2)
+    assert tabla.plazo.aporte(36) == pytest.approx(1.5)
+    assert tabla.monto.aporte(60_000_000) == pytest.approx(50 * 0.25 + 10 * 0.1)
+
+    rnd = random.Random(3)
+    montos = [rnd.randint(10_000, 120_000_000) for _ in range(5_000)]
+    plazos = [rnd.randint(1, 72) for _ in range(5_000)]
+    escalar = [tabla.calcular(m, p) for m, p in zip(montos, plazos)]
+    assert [repr(x) for x in tabla.calcular_lote(montos, plazos)] == [repr(x) for x in escalar]
+
+def test_tabla_invalida():
+    with pytest.raises(ValueError):
+        TablaTasas.desde_documento({"_id": 1, **TABLA_ESCALONADA,
+                                    "plazo": {"unidad": 12, "tramos": [{"desde": 6, "factor": 0.5}]}})
+
+@pytest.mark.asyncio
+async def test_publicar_refrescar_y_sellar_version(client):
+    from app.main import app
+    db = app.state.test_db
+
+    assert (await registro_tasas.refrescar(db))["cambio"] is False   # sin versiones: queda la 0
+    v1 = await publicar_tabla(db, TABLA_INICIAL)
+    v2 = await publicar_tabla(db, TABLA_ESCALONADA)
+    assert (v1, v2) == (1, 2)
+    assert [d["_id"] for d in db["tablas_tasas"].data.values() if d["activa"]] == [2]
+
+    assert await registro_tasas.refrescar(db) == {"version": 2, "cambio": True}
+    assert registro_tasas.tabla.base == 4.5
+
+    login = await client.post("/auth/login", json={
+        "correo": "jorge_andres.medina@uao.edu.co", "contraseña": "MedinaInge519"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    r = await client.post("/solicitudes/", json={"monto": 1_000_000, "plazo_meses": 12}, headers=headers)
+    assert r.status_code == 201
+    assert r.json()["tasa_version"] == 2
+    assert r.json()["tasa"] == registro_tasas.tabla.calcular(1_000_000, 12)
+
+    r = await client.post("/solicitudes/cotizar", headers=headers,
+                          json={"montos": [1_000_000], "plazos_meses": [12]})
+    assert r.headers["X-Tasa-Version"] == "2"
+
+@pytest.mark.asyncio
+async def test_tarea_sin_lease_corre_en_cada_replica():
+    from app.main import app
+    db = app.state.test_db
+
+    async def refrescar(_db):
+        return {"ok": True}
+
+    tarea = TareaPeriodica("refresco_local", refrescar, intervalo=1, duracion_lease=None, registrar=False)
+    assert (await tarea.ejecutar_una_vez(db))["ok"] is True
+    assert await tarea.ejecutar_una_vez(db) is not None
+    assert not db["tareas_lease"].data and not db["tareas_ejecuciones"].data
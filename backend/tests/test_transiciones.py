@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.schemas.solicitudes_cdt_agente import RechazoRequest
+from app.services.solicitudes_cdt_agente import aprobar_solicitud, rechazar_solicitud
+from app.services.transiciones import transicionar, transicionar_o_error
+
+def _en_estado(db, estado):
+    return next(d for d in db["solicitudes_cdt"].data.values() if d["estado"] == estado)
+
+@pytest.mark.asyncio
+async def test_transicion_respeta_el_grafo_de_estados():
+    from app.main import app
+    db = app.state.test_db
+    borrador = _en_estado(db, "borrador")
+
+    # borrador -> aprobada no está permitido
+    assert await transicionar(db, {"_id": borrador["_id"]}, "aprobada") is None
+    assert borrador["estado"] == "borrador"
+
+    res = await transicionar(db, {"_id": borrador["_id"]}, "en_validacion")
+    assert res.estado_anterior == "borrador"
+    assert res.solicitud["estado"] == "en_validacion"
+    assert db["solicitudes_cdt"].data[str(borrador["_id"])]["estado"] == "en_validacion"
+
+    cancelada = _en_estado(db, "cancelada")
+    with pytest.raises(HTTPException) as exc:
+        await transicionar_o_error(db, {"_id": cancelada["_id"]}, "en_validacion", detalle="no")
+    assert exc.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_aprobar_y_rechazar_concurrentes_solo_uno_gana():
+    from app.main import app
+    db = app.state.test_db
+    sid = str(_en_estado(db, "en_validacion")["_id"])
+
+    resultados = await asyncio.gather(
+        aprobar_solicitud(db, sid, "agente-1"),
+        rechazar_solicitud(db, sid, "agente-2", RechazoRequest(motivo="Duplicada")),
+        return_exceptions=True,
+    )
+    ganadores = [r for r in resultados if isinstance(r, dict)]
+    perdedores = [r for r in resultados if isinstance(r, HTTPException)]
+    assert len(ganadores) == 1 and len(perdedores) == 1
+    assert perdedores[0].status_code == 400
+    assert db["solicitudes_cdt"].data[sid]["estado"] == ganadores[0]["estado_nuevo"]
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import pytest
+from app.core.workers import PoolAcotado, PoolSaturado
+
+@pytest.mark.asyncio
+async def test_pool_rechaza_cuando_la_cola_esta_llena():
+    pool = PoolAcotado("prueba", workers=1, max_cola=1)
+    liberar = threading.Event()
+
+    t1 = asyncio.ensure_future(pool.ejecutar(liberar.wait, 5))
+    t2 = asyncio.ensure_future(pool.ejecutar(liberar.wait, 5))
+    await asyncio.sleep(0.05)
+    assert pool.estadisticas()["en_cola"] == 1
+
+    with pytest.raises(PoolSaturado):
+        await pool.ejecutar(liberar.wait, 5)
+
+    liberar.set()
+    await asyncio.gather(t1, t2)
+    stats = pool.estadisticas()
+    assert stats["rechazadas"] == 1
+    assert stats["completadas"] == 2
+    assert stats["pendientes"] == 0
+
+    with pytest.raises(ZeroDivisionError):
+        await pool.ejecutar(divmod, 1, 0)
+    stats = pool.estadisticas()
+    assert stats["completadas"] == 2
+    assert stats["fallidas"] == 1
+    pool.cerrar()
+
+@pytest.mark.asyncio
+async def test_login_responde_503_con_pool_saturado(client, monkeypatch):
+    from app.services import auth as auth_service
+
+    async def saturado(*args):
+        raise PoolSaturado("lleno")
+    monkeypatch.setattr(auth_service.hash_pool, "ejecutar", saturado)
+
+    r = await client.post("/auth/login", json={
+        "correo": "jorge_andres.medina@uao.edu.co", "contraseña": "MedinaInge519"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"